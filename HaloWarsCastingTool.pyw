@@ -2,23 +2,17 @@
 import logging
 
 import hwctool
+import hwctool.settings.logfiles
 
 # create logger with 'spam_application'
 logger = logging.getLogger('hwctool')
 logger.setLevel(logging.DEBUG)
-# create file handler which logs even debug messages
-fh = logging.FileHandler(hwctool.settings.getLogFile(), 'w')
-# create console handler with a higher log level
-# create formatter and add it to the handlers
-formatter = logging.Formatter(
-    '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-fh.setFormatter(formatter)
-# add the handlers to the logger
-logger.addHandler(fh)
+# write the log to a rotating file in a background thread
+listener = hwctool.settings.logfiles.setup(
+    logger, hwctool.settings.getLogFile(), console=False)
 
 if __name__ == '__main__':
     try:
         hwctool.main()
     finally:
-        fh.close()
-        logger.removeHandler(fh)
+        hwctool.settings.logfiles.stop(logger, listener)
@@ -0,0 +1,133 @@
+"""Compare the bytes of a delta data update with the full archive.
+
+Usage: python benchmarks/delta_update.py [--output file]
+
+A release that only changes one style sheet is published to a local
+stand-in update server. The benchmark counts the bytes a client with the
+previous release downloads via the content-addressed manifest and compares
+them with the size of the full HWCT-data archive. The manifest is signed
+with a temporary app key; a manifest changed after signing has to be
+rejected.
+"""
+import argparse
+import copy
+import http.server
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+basedir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, basedir)
+
+import build_data  # noqa: E402
+import hwctool.tasks.updater as updater  # noqa: E402
+
+
+class CountingHandler(http.server.SimpleHTTPRequestHandler):
+    """Serve the update directory and count the bytes sent."""
+
+    bytes_sent = 0
+    requests = 0
+
+    def send_header(self, keyword, value):
+        if keyword.lower() == 'content-length':
+            CountingHandler.bytes_sent += int(value)
+            CountingHandler.requests += 1
+        super().send_header(keyword, value)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def createServer(directory):
+    """Start the stand-in update server in a thread."""
+    server = http.server.ThreadingHTTPServer(
+        ('localhost', 0),
+        lambda *args: CountingHandler(*args, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def createKeys():
+    """Return a temporary app private and public key."""
+    from nacl.signing import SigningKey
+    from pyupdater.utils.encoding import UnpaddedBase64Encoder
+    key = SigningKey.generate()
+    return (key.encode(UnpaddedBase64Encoder).decode(),
+            key.verify_key.encode(UnpaddedBase64Encoder))
+
+
+def update(url, profile, index_file, app_key):
+    """Run a delta update and return the transferred bytes."""
+    CountingHandler.bytes_sent = 0
+    CountingHandler.requests = 0
+    start = time.perf_counter()
+    changed = updater.deltaUpdate('new', profile, index_file, app_key,
+                                  urls=[url])
+    return {'changed_files': changed,
+            'bytes': CountingHandler.bytes_sent,
+            'requests': CountingHandler.requests,
+            'seconds': time.perf_counter() - start}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', help='write the results as json')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        release = os.path.join(tmp, 'release', 'casting_html')
+        shutil.copytree(os.path.join(basedir, 'casting_html'), release)
+        css = os.path.join(release, 'src', 'css', 'score', 'Default.css')
+        with open(css, 'a') as f:
+            f.write('\n.box { border-radius: 6px; }\n')
+
+        www = os.path.join(tmp, 'www')
+        os.makedirs(www)
+        private_key, app_key = createKeys()
+        manifest = build_data.make_manifest(release, www, 'new', private_key)
+        tampered = copy.deepcopy(manifest)
+        entry = next(iter(tampered['files'].values()))
+        entry['sha256'] = '0' * 64
+        try:
+            updater.verifyManifest(tampered, app_key)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError('A tampered manifest was accepted.')
+        archive = os.path.join(tmp, 'HWCT-data')
+        build_data.make_tarfile(archive, release)
+
+        profile = os.path.join(tmp, 'profile')
+        shutil.copytree(os.path.join(basedir, 'casting_html'),
+                        os.path.join(profile, 'casting_html'))
+        index_file = os.path.join(tmp, 'dataindex.json')
+
+        server = createServer(www)
+        url = 'http://localhost:{}/'.format(server.server_address[1])
+        try:
+            results = {'benchmark': 'delta_update',
+                       'full_archive_bytes': os.path.getsize(archive),
+                       'style_release': update(url, profile, index_file,
+                                               app_key),
+                       'unchanged_release': update(url, profile,
+                                                   index_file, app_key)}
+        finally:
+            server.shutdown()
+
+        with open(os.path.join(profile, 'casting_html', 'src', 'css',
+                               'score', 'Default.css')) as f:
+            assert f.read().endswith('border-radius: 6px; }\n')
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
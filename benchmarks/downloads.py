@@ -0,0 +1,164 @@
+"""Measure the download manager against a local HTTP stand-in.
+
+Usage: python benchmarks/downloads.py [--files 16] [--size 1048576]
+
+The stand-in server supports range requests, adds a latency to every
+request and can drop the first connection of each file halfway through to
+exercise resuming. The benchmark reports the duration for one and for
+several workers and the bytes sent for interrupted downloads.
+"""
+import argparse
+import gettext
+import hashlib
+import http.server
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtCore import QCoreApplication, QEventLoop  # noqa: E402
+
+from hwctool.tasks.downloader import DownloadManager  # noqa: E402
+
+
+class RangeHandler(http.server.BaseHTTPRequestHandler):
+    """Serve generated files with range support."""
+
+    files = dict()
+    latency = 0.0
+    drop = False
+    dropped = set()
+    bytes_sent = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        data = self.files.get(self.path)
+        if data is None:
+            self.send_error(404)
+            return
+        start = 0
+        match = re.match(r'bytes=(\d+)-', self.headers.get('Range', ''))
+        if match:
+            start = int(match.group(1))
+            if start >= len(data):
+                self.send_response(416)
+                self.send_header('Content-Range',
+                                 'bytes */{}'.format(len(data)))
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes {}-{}/{}'.format(
+                start, len(data) - 1, len(data)))
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(data) - start))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+
+        body = data[start:]
+        with self.lock:
+            drop = self.drop and self.path not in self.dropped
+            if drop:
+                self.dropped.add(self.path)
+        if drop:
+            body = body[:len(body) // 2]
+        try:
+            self.wfile.write(body)
+        except ConnectionError:
+            return
+        with self.lock:
+            RangeHandler.bytes_sent += len(body)
+        if drop:
+            self.close_connection = True
+            self.connection.shutdown(2)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run(app, url, files, target, workers, corrupt=False):
+    """Download all files and return the duration and the results."""
+    manager = DownloadManager(max_workers=workers, timeout=5, retries=3)
+    results = {'finished': 0, 'failed': 0}
+    manager.finished.connect(
+        lambda id, file: results.__setitem__(
+            'finished', results['finished'] + 1))
+    manager.failed.connect(
+        lambda id, error: results.__setitem__(
+            'failed', results['failed'] + 1))
+    loop = QEventLoop()
+    manager.allFinished.connect(loop.quit)
+
+    RangeHandler.bytes_sent = 0
+    RangeHandler.dropped = set()
+    start = time.perf_counter()
+    items = []
+    for path, data in files.items():
+        sha256 = hashlib.sha256(data).hexdigest()
+        if corrupt:
+            sha256 = '0' * 64
+        items.append((url + path, os.path.join(target, path.strip('/')),
+                      sha256))
+    manager.downloadAll(items)
+    loop.exec_()
+    results['seconds'] = time.perf_counter() - start
+    results['bytes_sent'] = RangeHandler.bytes_sent
+    manager.shutdown()
+
+    if not corrupt:
+        for path, data in files.items():
+            with open(os.path.join(target, path.strip('/')), 'rb') as f:
+                assert f.read() == data
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=16)
+    parser.add_argument('--size', type=int, default=1024 * 1024)
+    parser.add_argument('--latency', type=float, default=0.1)
+    parser.add_argument('--output', help='write the results as json')
+    args = parser.parse_args()
+
+    gettext.NullTranslations().install()
+    app = QCoreApplication(sys.argv)
+    files = {'/map{}.png'.format(idx): os.urandom(args.size)
+             for idx in range(args.files)}
+    RangeHandler.files = files
+    RangeHandler.latency = args.latency
+    server = http.server.ThreadingHTTPServer(('localhost', 0), RangeHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = 'http://localhost:{}'.format(server.server_address[1])
+
+    results = {'benchmark': 'downloads', 'files': args.files,
+               'size': args.size, 'latency_s': args.latency}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            results['one_worker'] = run(
+                app, url, files, os.path.join(tmp, 'a'), 1)
+            results['four_workers'] = run(
+                app, url, files, os.path.join(tmp, 'b'), 4)
+            RangeHandler.drop = True
+            results['resumed'] = run(
+                app, url, files, os.path.join(tmp, 'c'), 4)
+            RangeHandler.drop = False
+            results['bad_checksum'] = run(
+                app, url, files, os.path.join(tmp, 'd'), 4, corrupt=True)
+    finally:
+        server.shutdown()
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
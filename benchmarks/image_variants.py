@@ -0,0 +1,133 @@
+"""Compare the images loaded by the browser sources with their variants.
+
+Usage: python benchmarks/image_variants.py [--output file]
+
+The browser sources keep every displayed image decoded in memory, thus
+the decoded size (width * height * 4 bytes) of the race logos and map
+images is reported for the original files and for the generated variants,
+together with the file sizes and the time to create the variants. Then
+one image per scope is replaced: reported are the time the change blocks
+the calling thread, the time until its variant is ready and if the
+variant of the replaced image was removed from the cache.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+basedir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, basedir)
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtGui import (QColor, QImage, QLinearGradient,  # noqa: E402
+                         QPainter)
+from PyQt5.QtWidgets import QApplication  # noqa: E402
+
+from hwctool.settings.assetIndex import AssetIndex  # noqa: E402
+from hwctool.settings.imageCache import ImageCache  # noqa: E402
+
+
+def measure(files):
+    """Return the decoded and the file size of a list of images."""
+    decoded = 0
+    size = 0
+    for file in files:
+        image = QImage(file)
+        decoded += image.width() * image.height() * 4
+        size += os.path.getsize(file)
+    return {'images': len(files), 'decoded_bytes': decoded,
+            'file_bytes': size}
+
+
+def createMaps(directory, count=8):
+    """Create full HD stand-ins for the map images of a profile."""
+    os.makedirs(directory, exist_ok=True)
+    for idx in range(count):
+        image = QImage(1920, 1080, QImage.Format_RGB32)
+        painter = QPainter(image)
+        gradient = QLinearGradient(0, 0, 1920, 1080)
+        gradient.setColorAt(0, QColor.fromHsv(idx * 40, 200, 200))
+        gradient.setColorAt(1, QColor.fromHsv((idx * 40 + 120) % 360, 200, 80))
+        painter.fillRect(image.rect(), gradient)
+        painter.end()
+        image.save(os.path.join(directory, 'Map {}.jpg'.format(idx)),
+                   'JPG', 90)
+
+
+def replace(assets, images, scope, name, other):
+    """Replace the image of an asset by another one."""
+    old = images.getFile(scope, name)
+    shutil.copyfile(other, os.path.join(assets.getDir(scope),
+                                        assets.find(scope, name)))
+    start = time.perf_counter()
+    assets.update(scope)
+    blocking = time.perf_counter() - start
+    images.wait()
+    ready = time.perf_counter() - start
+    return {'replace_blocking_ms': blocking * 1000,
+            'replace_ready_ms': ready * 1000,
+            'stale_removed': not os.path.exists(old)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', help='write the results as json')
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    results = {'benchmark': 'image_variants'}
+    with tempfile.TemporaryDirectory() as tmp:
+        base = os.path.join(tmp, 'casting_html')
+        shutil.copytree(os.path.join(basedir, 'casting_html', 'src', 'img'),
+                        os.path.join(base, 'src', 'img'))
+        createMaps(os.path.join(base, 'src', 'img', 'maps'))
+
+        assets = AssetIndex()
+        images = ImageCache(assets, base, 'src/img/cache')
+        for scope, extensions, size in [('races', ['.png'], 360),
+                                        ('maps', ['.jpg', '.png'], 640)]:
+            assets.addScope(scope, os.path.join(base, 'src', 'img', scope),
+                            extensions)
+            images.addScope(scope, size, size)
+
+        for scope in ['races', 'maps']:
+            # The variants are created when the assets of a scope change.
+            start = time.perf_counter()
+            assets.update(scope)
+            images.wait()
+            created = time.perf_counter() - start
+            names = assets.names(scope)
+            if not names:
+                continue
+            originals = [os.path.join(assets.getDir(scope),
+                                      assets.find(scope, name))
+                         for name in names]
+            variants = [images.getFile(scope, name) for name in names]
+            start = time.perf_counter()
+            for name in names:
+                images.getURL(scope, name)
+            lookup = (time.perf_counter() - start) / len(names)
+            results[scope] = {'original': measure(originals),
+                              'variant': measure(variants),
+                              'create_s': created,
+                              'lookup_us': lookup * 1e6}
+
+        for scope in ['races', 'maps']:
+            names = sorted(assets.names(scope))
+            if len(names) > 1:
+                results[scope].update(replace(
+                    assets, images, scope, names[0], os.path.join(
+                        assets.getDir(scope), assets.find(scope, names[-1]))))
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""Measure the latency of the intro hotkeys from key down to sent message.
+
+Usage: python benchmarks/intro_latency.py [--clients 4] [--presses 500]
+
+The websocket server of a temporary profile is started and intro browser
+sources are stood in by websocket clients. A thread in the role of the
+keyboard hook triggers the prepared intros and the benchmark reports the
+duration of the hook callbacks and the time from key down until the
+message was sent. It fails if the 99th percentile of the latency exceeds
+the limit (1 ms).
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+script = os.path.abspath(__file__)
+basedir = os.path.dirname(os.path.dirname(script))
+sys.path.insert(0, basedir)
+
+
+async def listen(url, presses):
+    """Receive intros like a browser source and echo their state."""
+    import websockets
+    received = 0
+    async with websockets.connect(url) as websocket:
+        while received < presses:
+            message = json.loads(await websocket.recv())
+            if message['event'] == 'SHOW_INTRO':
+                received += 1
+                await websocket.send(message['state'])
+    return received
+
+
+def runClients(url, clients, presses):
+    """Connect the browser sources (child process)."""
+    async def listenAll():
+        return await asyncio.gather(
+            *[listen(url, presses) for idx in range(clients)])
+    print(sum(asyncio.run(listenAll())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=4)
+    parser.add_argument('--presses', type=int, default=500)
+    parser.add_argument('--limit', type=float, default=1.0,
+                        help='maximal 99th percentile in ms')
+    parser.add_argument('--output', help='write the results as json')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        runClients(args.child, args.clients, args.presses)
+        return
+
+    from suite import createMatch, leave, setup
+    setup()
+
+    from PyQt5.QtCore import QCoreApplication
+    import hwctool.settings
+    from hwctool.tasks.websocket import WebsocketThread
+
+    app = QCoreApplication(sys.argv)
+    thread = WebsocketThread(createMatch())
+    thread.start()
+    time.sleep(0.5)
+
+    port = int(hwctool.settings.profileManager.currentID(), 16)
+    url = 'ws://localhost:{}/intro'.format(port)
+    # The clients run in another process to not compete for the GIL.
+    clients = subprocess.Popen(
+        [sys.executable, script, '--child', url,
+         '--clients', str(args.clients), '--presses', str(args.presses)],
+        stdout=subprocess.PIPE, universal_newlines=True)
+    timeout = time.time() + 10
+    while len(thread.connected.get('intro', [])) < args.clients:
+        if time.time() > timeout:
+            print('The clients did not connect.')
+            leave(1)
+        time.sleep(0.05)
+    time.sleep(0.2)
+
+    data = {'name': 'pressure', 'team': 'Anders', 'race': 'Anders',
+            'logo': 'src/img/races/Anders.png', 'display': 'block',
+            'color': 'red', 'tts': None, 'volume': 5, 'tts_volume': 5,
+            'display_time': 3.0, 'animation': 'default'}
+    thread.setIntroPayloads({0: data, 1: dict(data, color='blue')})
+
+    # Press the hotkeys of both players like the keyboard hook does,
+    # including a repeated key down event of a held key.
+    import keyboard
+    hook = getattr(thread, '_WebsocketThread__callback_on_hook')
+    callbacks = [lambda key_time: thread.showIntro(0, key_time),
+                 lambda key_time: thread.showIntro(1, key_time)]
+    for press in range(args.presses):
+        scan_code = 59 + press % 2
+        for event_type in [keyboard.KEY_DOWN, keyboard.KEY_DOWN,
+                           keyboard.KEY_UP]:
+            event = keyboard.KeyboardEvent(event_type, scan_code,
+                                           is_keypad=False)
+            hook(scan_code, False, event, callbacks[press % 2])
+        time.sleep(0.002)
+    try:
+        received = int(clients.communicate(timeout=10)[0])
+    except (subprocess.TimeoutExpired, ValueError):
+        clients.kill()
+        received = 0
+
+    stats = thread.getIntroLatency()
+    results = {'benchmark': 'intro_latency',
+               'clients': args.clients,
+               'presses': args.presses,
+               'received': received,
+               'hook': thread.getHookDuration(),
+               'send': stats}
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    error = ''
+    if results['received'] != args.clients * args.presses:
+        error = 'Not all intros were received.'
+    elif stats['p99_ms'] >= args.limit:
+        error = 'Latency of {:.3f} ms exceeds {} ms.'.format(
+            stats['p99_ms'], args.limit)
+    print(error or 'OK')
+    leave(1 if error else 0)
+
+
+if __name__ == '__main__':
+    main()
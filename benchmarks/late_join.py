@@ -0,0 +1,123 @@
+"""Measure how fast a browser source gets all data when it joins late.
+
+Usage: python benchmarks/late_join.py [--joins 200] [--output file]
+
+While the map scores of a match with the maximal number of sets change
+in the main thread, like edits in the user interface, browser sources in
+a child process connect one after another to the score path and wait
+for ALL_DATA. Without snapshots the handler computes the score data on
+the thread of the event loop, with snapshots it sends the encoded state
+that is published after each change. Reported are the percentiles of the
+time from the start of the connection to ALL_DATA, of the time the
+handler spends on the state of a new client (metrics websocket.join) and
+the time to publish a snapshot.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+script = os.path.abspath(__file__)
+basedir = os.path.dirname(os.path.dirname(script))
+sys.path.insert(0, basedir)
+
+
+def runClients(url, joins):
+    """Join one after another and print the durations (child)."""
+    import websockets
+
+    async def join():
+        start = time.perf_counter()
+        async with websockets.connect(url, max_size=None) as websocket:
+            while True:
+                message = json.loads(await websocket.recv())
+                if message['event'] == 'ALL_DATA':
+                    return time.perf_counter() - start
+
+    async def run():
+        return [await join() for idx in range(joins)]
+    print(json.dumps(asyncio.run(run())))
+
+
+def run(thread, controller, url, publish, args):
+    """Change the match while the clients join."""
+    import hwctool.tasks.metrics as metrics
+    metrics.reset()
+    match = controller.matchData
+    no_sets = match.getNoSets()
+    thread.snapshots.clear()
+    child = subprocess.Popen(
+        [sys.executable, script, '--child', url, '--joins', str(args.joins)],
+        stdout=subprocess.PIPE, universal_newlines=True)
+    publishing = []
+    idx = 0
+    while child.poll() is None:
+        match.setMapScore(idx % no_sets, 1 if (idx // no_sets) % 2 else -1,
+                          overwrite=True)
+        idx += 1
+        if publish:
+            start = time.perf_counter()
+            thread.publishSnapshot('score', controller.getSnapshot('score'))
+            publishing.append(time.perf_counter() - start)
+        time.sleep(args.interval)
+    durations = sorted(json.loads(child.communicate()[0]))
+    join = metrics.snapshot()['histograms']['websocket.join']
+    results = {'joins': len(durations),
+               'p50_ms': durations[len(durations) // 2] * 1000,
+               'p99_ms': durations[int(len(durations) * 0.99)] * 1000,
+               'handler_p50_us': join['p50'] * 1e6,
+               'handler_p99_us': join['p99'] * 1e6}
+    if publishing:
+        results['publish_us'] = statistics.median(publishing) * 1e6
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--joins', type=int, default=200)
+    parser.add_argument('--interval', type=float, default=0.02,
+                        help='seconds between the changes')
+    parser.add_argument('--output', help='write the results as json')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        runClients(args.child, args.joins)
+        return
+
+    from suite import createMatch, leave, setup
+    setup()
+
+    from PyQt5.QtWidgets import QApplication
+    import hwctool.settings
+    import hwctool.tasks.metrics
+    from hwctool.tasks.websocket import WebsocketThread
+
+    hwctool.tasks.metrics.enable()
+    app = QApplication(sys.argv)
+    controller = createMatch()
+    thread = WebsocketThread(controller)
+    thread.start()
+    time.sleep(0.5)
+
+    port = int(hwctool.settings.profileManager.currentID(), 16)
+    url = 'ws://localhost:{}/score'.format(port)
+    results = {'benchmark': 'late_join',
+               'no_sets': controller.matchData.getNoSets(),
+               'interval_s': args.interval,
+               'computed': run(thread, controller, url, False, args),
+               'snapshot': run(thread, controller, url, True, args)}
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    leave()
+
+
+if __name__ == '__main__':
+    main()
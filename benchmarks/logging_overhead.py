@@ -0,0 +1,78 @@
+"""Measure the time a log call blocks the calling thread.
+
+Usage: python benchmarks/logging_overhead.py [--messages 20000]
+
+Messages like the websocket sends are logged with a payload of the size
+of the score data, once with a synchronous file handler as before and
+once through the queue of hwctool.settings.logfiles, with and without
+sampling.
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+script = os.path.abspath(__file__)
+basedir = os.path.dirname(os.path.dirname(script))
+sys.path.insert(0, basedir)
+
+
+def run(logger, messages, payload):
+    """Log the messages and return the mean duration of a call."""
+    start = time.perf_counter()
+    for idx in range(messages):
+        logger.info("Sending data to '%s': %s", 'score', payload)
+    return (time.perf_counter() - start) / messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--output', help='write the results as json')
+    args = parser.parse_args()
+
+    from hwctool.settings import logfiles
+
+    payload = {'event': 'CHANGE_SCORE', 'data': {
+        'score': [idx % 2 for idx in range(15)],
+        'sets': [{'map': 'Map {}'.format(idx), 'score_color': '#00ff00',
+                  'border_color': '#ffffff', 'opacity': 1.0}
+                 for idx in range(15)]}}
+    directory = tempfile.mkdtemp()
+    formatter = logging.Formatter(
+        '%(asctime)s, %(name)s, %(levelname)s: %(message)s')
+    results = {'benchmark': 'logging_overhead',
+               'messages': args.messages}
+
+    logger = logging.getLogger('benchmark.sync')
+    logger.setLevel(logging.DEBUG)
+    fh = logging.FileHandler(os.path.join(directory, 'sync.log'), 'w')
+    fh.setFormatter(formatter)
+    logger.addHandler(fh)
+    results['sync_us'] = run(logger, args.messages, payload) * 1e6
+    fh.close()
+
+    for name, rate in [('queue', 0), ('sampled', 20)]:
+        logger = logging.getLogger('benchmark.' + name)
+        logger.setLevel(logging.DEBUG)
+        listener = logfiles.setup(
+            logger, os.path.join(directory, name + '.log'),
+            console=False, rate=rate)
+        results[name + '_us'] = run(logger, args.messages, payload) * 1e6
+        start = time.perf_counter()
+        logfiles.stop(logger, listener)
+        results[name + '_drain_s'] = time.perf_counter() - start
+    shutil.rmtree(directory, True)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+"""Measure the updates of the map icons browser source.
+
+Usage: python benchmarks/map_icons.py [--rounds 600] [--interval 0.005]
+                                      [--output file]
+
+The temporary profile gets a map image per set of a match with the
+maximal number of sets, the maps are set via the stored match data.
+First the lookup of the map images and the data of the map icons are
+timed with and without the cache of the lookups.
+Then the sets are changed one after another at a high rate, like rapid
+edits of all sets, while a browser source in a child process applies
+the messages to its state. Each change is sent either as all data or as
+the sets that changed. Reported are the time per update in the main
+thread, the bytes received per update and if the state of the browser
+source matches the match at the end.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+script = os.path.abspath(__file__)
+basedir = os.path.dirname(os.path.dirname(script))
+sys.path.insert(0, basedir)
+
+
+def runClient(url, idle):
+    """Apply the messages like the browser source (child)."""
+    import websockets
+
+    async def run():
+        state = dict()
+        received = 0
+        messages = 0
+        async with websockets.connect(url, max_size=None) as websocket:
+            while True:
+                timeout = idle if messages else 10
+                try:
+                    message = await asyncio.wait_for(websocket.recv(),
+                                                     timeout)
+                except asyncio.TimeoutError:
+                    break
+                received += len(message)
+                messages += 1
+                message = json.loads(message)
+                if message['event'] == 'ALL_DATA':
+                    state = message['data']
+                elif message['event'] == 'CHANGE_SETS':
+                    state.update(message['data'])
+        return {'bytes': received, 'messages': messages, 'state': state}
+    print(json.dumps(asyncio.run(run())))
+
+
+def addMaps(number):
+    """Add map images to the profile and return their names."""
+    from PyQt5.QtGui import QColor, QImage
+    import hwctool.settings
+    directory = hwctool.settings.assets.getDir('maps')
+    os.makedirs(directory, exist_ok=True)
+    for idx in range(number):
+        image = QImage(1280, 720, QImage.Format_RGB32)
+        image.fill(QColor.fromHsv(idx * 360 // number, 200, 200))
+        image.save(os.path.join(directory, 'Map_{}.png'.format(idx + 1)))
+    hwctool.settings.assets.update('maps')
+    hwctool.settings.images.wait()
+    return sorted(hwctool.settings.assets.names('maps'))
+
+
+def setMaps(match, names):
+    """Set the maps of the sets via the stored match data."""
+    import hwctool.settings
+    match.writeJsonFile()
+    file = hwctool.settings.getJsonFile('matchdata')
+    with open(file, 'r', encoding='utf-8-sig') as f:
+        data = json.load(f)
+    for idx, item in enumerate(data['sets']):
+        item['map'] = names[idx % len(names)]
+    with open(file, 'w', encoding='utf-8-sig') as f:
+        json.dump(data, f)
+    match.readJsonFile()
+
+
+def measure(func, number):
+    start = time.perf_counter()
+    for idx in range(number):
+        func()
+    return (time.perf_counter() - start) / number * 1e6
+
+
+def lookups(controller):
+    """Time the lookups of the map images with and without the cache."""
+    match = controller.matchData
+    name = match.getMap(0)
+
+    def cold(func):
+        def call():
+            controller._mapImages.clear()
+            func()
+        return call
+    return {'map_img_us': measure(cold(lambda: controller.getMapImg(name)),
+                                  2000),
+            'map_img_cached_us': measure(
+                lambda: controller.getMapImg(name), 2000),
+            'map_icons_data_us': measure(cold(match.getMapIconsData), 200),
+            'map_icons_data_cached_us': measure(match.getMapIconsData, 200)}
+
+
+def run(controller, thread, url, delta, args):
+    """Change the sets one after another while the client applies them."""
+    match = controller.matchData
+    no_sets = match.getNoSets()
+    controller._mapIcons = None
+    child = subprocess.Popen(
+        [sys.executable, script, '--child', url],
+        stdout=subprocess.PIPE, universal_newlines=True)
+    time.sleep(1)
+    durations = []
+    for idx in range(args.rounds):
+        set_idx = idx % no_sets
+        match.setMapScore(set_idx, 0 if (idx // no_sets) % 2 else -1,
+                          overwrite=True)
+        match.setPlayer(0, set_idx, 'Player {}'.format(idx))
+        start = time.perf_counter()
+        if delta:
+            controller.sendMapIcons()
+        else:
+            thread.sendData2Path('mapicons', 'ALL_DATA',
+                                 match.getMapIconsData())
+        durations.append(time.perf_counter() - start)
+        time.sleep(args.interval)
+    result = json.loads(child.communicate()[0])
+    durations.sort()
+    expected = json.loads(json.dumps(match.getMapIconsData()))
+    return {'updates': args.rounds,
+            'update_p50_us': durations[len(durations) // 2] * 1e6,
+            'update_p99_us': durations[int(len(durations) * 0.99)] * 1e6,
+            'messages': result['messages'],
+            'bytes_per_update': result['bytes'] // args.rounds,
+            'consistent': result['state'] == expected}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=600)
+    parser.add_argument('--interval', type=float, default=0.005,
+                        help='seconds between the changes')
+    parser.add_argument('--output', help='write the results as json')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        runClient(args.child, 1.0)
+        return
+
+    from suite import leave, setup
+    setup()
+
+    from PyQt5.QtWidgets import QApplication
+    import hwctool.settings
+    from hwctool.controller import MainController
+    from hwctool.tasks.websocket import WebsocketThread
+
+    app = QApplication(sys.argv)
+    maps = addMaps(hwctool.settings.max_no_sets)
+    import suite
+
+    class Controller(suite.Controller):
+        sendMapIcons = MainController.sendMapIcons
+
+    suite.Controller = Controller
+    controller = suite.createMatch()
+    setMaps(controller.matchData, maps)
+    thread = WebsocketThread(controller)
+    controller.websocketThread = thread
+    thread.start()
+    time.sleep(0.5)
+
+    port = int(hwctool.settings.profileManager.currentID(), 16)
+    url = 'ws://localhost:{}/mapicons'.format(port)
+    results = {'benchmark': 'map_icons',
+               'no_sets': controller.matchData.getNoSets(),
+               'interval_s': args.interval,
+               'lookups': lookups(controller),
+               'all_data': run(controller, thread, url, False, args),
+               'changed_sets': run(controller, thread, url, True, args)}
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    leave()
+
+
+if __name__ == '__main__':
+    main()
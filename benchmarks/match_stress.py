@@ -0,0 +1,182 @@
+"""Stress the match data with changes and reads from four threads.
+
+Usage: python benchmarks/match_stress.py [--duration 3] [--switch 1e-5]
+                                         [--output file]
+
+The main thread changes the match like the user interface: map scores,
+swaps of the teams and the number of sets. Three threads read it like
+the websocket server (score data), the text files (teams and score) and
+the automatic requests (placeholders). Each read is checked against
+invariants of the changes, e.g. the team that wins all sets has no lost
+set after a swap, and every set of the number of sets exists. The reads
+run unprotected and through matchData.read. Reported are the operations
+per second of each thread, the inconsistent reads and the retries. A
+short switch interval of the interpreter makes changes interleave with
+reads much more often than in the tool.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+script = os.path.abspath(__file__)
+basedir = os.path.dirname(os.path.dirname(script))
+sys.path.insert(0, basedir)
+
+TEAMS = ['Alpha', 'Beta']
+
+
+def setup(controller):
+    """Prepare a match where Alpha wins every decided set."""
+    match = controller.matchData
+    match.resetSwap()
+    match.setSolo(False)
+    for idx, team in enumerate(TEAMS):
+        match.setTeam(idx, team, team[0])
+    for idx in range(match.getNoSets()):
+        match.setMapScore(idx, 0, overwrite=True)
+
+
+def change(match, max_no_sets, rng):
+    """Apply a random change that keeps the invariants."""
+    value = rng.random()
+    if value < 0.6:
+        set_idx = rng.randrange(match.getNoSets())
+        match.setMapScore(set_idx, rng.choice([0, -1]), overwrite=True,
+                          applySwap=True)
+    elif value < 0.8:
+        match.swapTeams()
+    else:
+        match.setNoSets(rng.randint(3, max_no_sets))
+
+
+def alpha(swapped):
+    """Return the index of Alpha."""
+    return 1 if swapped else 0
+
+
+def readScore(match):
+    data = match.getScoreData()
+    return match.getNoSets(), match.isSwapped(), data
+
+
+def checkScore(result):
+    no_sets, swapped, data = result
+    idx = alpha(swapped)
+    return (len(data['sets']) == no_sets and
+            data['team{}'.format(idx + 1)] == TEAMS[0] and
+            data['score{}'.format(2 - idx)] == 0 and
+            bool(data['logo1']) and bool(data['logo2']))
+
+
+def readFiles(match):
+    return ([match.getTeamOrPlayer(idx) for idx in range(2)],
+            [match.getTeamTag(idx) for idx in range(2)],
+            match.getScore(), match.isSwapped())
+
+
+def checkFiles(result):
+    teams, tags, score, swapped = result
+    idx = alpha(swapped)
+    return (teams[idx] == TEAMS[0] and teams[1 - idx] == TEAMS[1] and
+            tags == [team[0] for team in teams] and score[1 - idx] == 0)
+
+
+def readPlaceholders(match, placeholders):
+    return placeholders.replace('(Team1) vs (Team2) (Score)'), \
+        match.isSwapped()
+
+
+def checkPlaceholders(result):
+    text, swapped = result
+    teams, score = text.split(' ', 3)[::2], text.rsplit(' ', 1)[1]
+    idx = alpha(swapped)
+    return (teams[idx] == TEAMS[0] and teams[1 - idx] == TEAMS[1] and
+            score.split(':')[1 - idx] == '0')
+
+
+def run(controller, protected, args):
+    """Change and read the match for the duration."""
+    import hwctool.settings
+    import hwctool.tasks.metrics as metrics
+    match = controller.matchData
+    setup(controller)
+    metrics.reset()
+    readers = {
+        'score': (lambda: readScore(match), checkScore),
+        'files': (lambda: readFiles(match), checkFiles),
+        'placeholders': (lambda: readPlaceholders(
+            match, controller.placeholders), checkPlaceholders)}
+    stop = threading.Event()
+    results = dict()
+
+    def read(name, func, check):
+        reads = 0
+        inconsistent = 0
+        errors = 0
+        while not stop.is_set():
+            try:
+                result = match.read(func) if protected else func()
+                if not check(result):
+                    inconsistent += 1
+            except Exception:
+                errors += 1
+            reads += 1
+        results[name] = {'reads_per_s': reads / args.duration,
+                         'inconsistent': inconsistent,
+                         'errors': errors}
+
+    threads = [threading.Thread(target=read, args=(name,) + reader)
+               for name, reader in readers.items()]
+    for thread in threads:
+        thread.start()
+    rng = random.Random(0)
+    changes = 0
+    end = time.perf_counter() + args.duration
+    while time.perf_counter() < end:
+        change(match, hwctool.settings.max_no_sets, rng)
+        changes += 1
+    stop.set()
+    for thread in threads:
+        thread.join()
+    counters = metrics.snapshot()['counters']
+    results['changes_per_s'] = changes / args.duration
+    results['retries'] = counters.get('matchdata.retries', 0)
+    results['locked_reads'] = counters.get('matchdata.locked_reads', 0)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--duration', type=float, default=3,
+                        help='seconds per run')
+    parser.add_argument('--switch', type=float, default=1e-5,
+                        help='switch interval of the interpreter')
+    parser.add_argument('--output', help='write the results as json')
+    args = parser.parse_args()
+
+    from suite import createMatch, setup
+    setup()
+
+    import hwctool.tasks.metrics
+
+    hwctool.tasks.metrics.enable()
+    controller = createMatch()
+    sys.setswitchinterval(args.switch)
+
+    results = {'benchmark': 'match_stress',
+               'duration_s': args.duration,
+               'switch_interval_s': args.switch,
+               'unprotected': run(controller, False, args),
+               'read': run(controller, True, args)}
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
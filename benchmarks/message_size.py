@@ -0,0 +1,122 @@
+"""Measure the bytes per message of the browser sources by encoding.
+
+Usage: python benchmarks/message_size.py [--output file]
+
+A match of a temporary profile with the maximal number of sets is played
+set by set. Per set the score browser source gets the changes of a map
+score and all data, like after an edit of the match. The messages are
+encoded as json and compact json and compressed like permessage-deflate
+does with context takeover, for the window of the config and the largest
+window. Reported are the total and mean bytes of the frame payloads, the
+bytes of all data for a new connection (cold) and the time to encode a
+message.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import zlib
+from uuid import uuid4
+
+script = os.path.abspath(__file__)
+basedir = os.path.dirname(os.path.dirname(script))
+sys.path.insert(0, basedir)
+
+
+class Deflate:
+    """Compress the messages of a connection like permessage-deflate."""
+
+    def __init__(self, bits):
+        self.compressor = zlib.compressobj(wbits=-bits, memLevel=5)
+
+    def __call__(self, message):
+        data = self.compressor.compress(message.encode())
+        data += self.compressor.flush(zlib.Z_SYNC_FLUSH)
+        # The empty block at the end is not transmitted.
+        return len(data) - 4
+
+
+def play(match):
+    """Return the messages of a match that is played set by set."""
+    import hwctool.settings
+    messages = []
+    for set_idx in range(match.getNoSets()):
+        match.setMapScore(set_idx, -1 if set_idx % 3 else 1, overwrite=True)
+        score = match.getScore()
+        for idx in range(2):
+            messages.append(('CHANGE_TEXT', {'id': 'score{}'.format(idx + 1),
+                                             'text': str(score[idx])}))
+            messages.append(('CHANGE_SCORE', {
+                'teamid': idx + 1, 'setid': set_idx + 1,
+                'color': match.getScoreIconColor(idx, set_idx)}))
+        img = hwctool.settings.getRaceImg(match.getRace(0, set_idx))
+        messages.append(('CHANGE_IMAGE', {'id': 'logo1', 'img': img}))
+        messages.append(('ALL_DATA', match.getScoreData()))
+        messages.append(('ALL_DATA', match.getMapIconsData()))
+    return messages
+
+
+def measure(messages, encode, bits):
+    """Return the bytes of the messages by encoding and compression."""
+    raw = []
+    compressed = {key: [] for key in bits}
+    deflates = {key: Deflate(value) for key, value in bits.items()}
+    durations = []
+    cold = {key: [] for key in bits}
+    for event, data in messages:
+        state = str(uuid4())
+        start = time.perf_counter()
+        message = encode(event, data, state)
+        durations.append(time.perf_counter() - start)
+        raw.append(len(message.encode()))
+        for key, deflate in deflates.items():
+            compressed[key].append(deflate(message))
+            if event == 'ALL_DATA':
+                cold[key].append(Deflate(bits[key])(message))
+    full = [idx for idx, (event, data) in enumerate(messages)
+            if event == 'ALL_DATA']
+
+    def summary(sizes):
+        return {'total_bytes': sum(sizes),
+                'full_update_bytes': sum(sizes[idx] for idx in full) //
+                len(full),
+                'mean_bytes': sum(sizes) // len(sizes)}
+    results = {'raw': summary(raw),
+               'encode_us': sum(durations) / len(durations) * 1e6}
+    for key, sizes in compressed.items():
+        results[key] = summary(sizes)
+        results[key]['cold_full_update_bytes'] = \
+            sum(cold[key]) // len(cold[key])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', help='write the results as json')
+    args = parser.parse_args()
+
+    from suite import createMatch, setup
+    setup()
+
+    import hwctool.settings
+    from hwctool.tasks import encoding
+
+    match = createMatch().matchData
+    messages = play(match)
+    window = hwctool.settings.config.parser.getint("Websocket", "window_bits")
+    bits = {'deflate_{}'.format(window): window, 'deflate_15': 15}
+
+    results = {'benchmark': 'message_size',
+               'no_sets': match.getNoSets(),
+               'messages': len(messages),
+               'json': measure(messages, encoding.encode, bits),
+               'compact': measure(messages, encoding.encodeCompact, bits)}
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
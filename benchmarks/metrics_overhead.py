@@ -0,0 +1,114 @@
+"""Measure the overhead of the performance metrics.
+
+Usage: python benchmarks/metrics_overhead.py [--rounds 15] [--updates 2000]
+
+Map scores of a match in a temporary profile are changed repeatedly while
+a handler encodes the score data for the browser sources, like the
+controller does. The fastest round with disabled and with enabled
+metrics is compared, together with the cost of a single measurement.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+script = os.path.abspath(__file__)
+basedir = os.path.dirname(os.path.dirname(script))
+sys.path.insert(0, basedir)
+
+
+def workload(match, updates):
+    """Change map scores and return the duration."""
+    start = time.perf_counter()
+    for idx in range(updates):
+        match.setMapScore(idx % 5, 1 if (idx // 5) % 2 else -1,
+                          overwrite=True)
+    return time.perf_counter() - start
+
+
+def timerCost(metrics, number=100000):
+    """Return the duration of an empty timed block."""
+    start = time.perf_counter()
+    for idx in range(number):
+        with metrics.timer('benchmark.timer'):
+            pass
+    return (time.perf_counter() - start) / number
+
+
+def clockCost(metrics, number=100000):
+    """Return the duration of an empty measurement like a signal."""
+    start = time.perf_counter()
+    for idx in range(number):
+        begin = metrics.clock()
+        if begin:
+            metrics.stop('benchmark.clock', begin)
+    metrics.collect()
+    return (time.perf_counter() - start) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=15)
+    parser.add_argument('--updates', type=int, default=2000)
+    parser.add_argument('--output', help='write the results as json')
+    args = parser.parse_args()
+
+    from suite import setup
+    setup()
+
+    import hwctool.tasks.metrics as metrics
+    from hwctool.matchdata import matchData
+
+    match = matchData(None)
+    match.setCustom(5)
+
+    def handler(*args):
+        json.dumps({'score': match.getScore(),
+                    'sets': [[match.getScoreIconColor(team, idx)
+                              for team in range(2)]
+                             for idx in range(match.getNoSets())]})
+    match.dataChanged.connect(handler)
+
+    durations = {'disabled': [], 'enabled': []}
+    for round in range(args.rounds):
+        # Alternate the order to not favour one of the modes.
+        modes = list(durations)
+        for mode in modes if round % 2 else reversed(modes):
+            metrics.enable(mode == 'enabled')
+            durations[mode].append(workload(match, args.updates))
+
+    # The fastest round is the least disturbed by other processes.
+    disabled = min(durations['disabled'])
+    enabled = min(durations['enabled'])
+    metrics.enable(False)
+    timer_disabled = timerCost(metrics)
+    clock_disabled = clockCost(metrics)
+    metrics.enable(True)
+    timer_enabled = timerCost(metrics)
+    clock_enabled = clockCost(metrics)
+    signals = metrics.snapshot()['histograms']['signal.score']['count']
+
+    results = {'benchmark': 'metrics_overhead',
+               'updates': args.updates,
+               'disabled_s': disabled,
+               'enabled_s': enabled,
+               'overhead_percent': (enabled - disabled) / disabled * 100,
+               'timer_disabled_us': timer_disabled * 1e6,
+               'timer_enabled_us': timer_enabled * 1e6,
+               'clock_disabled_us': clock_disabled * 1e6,
+               'clock_enabled_us': clock_enabled * 1e6,
+               # The cost of the measurements relative to the workload,
+               # which is not hidden by the noise of the machine.
+               'estimated_overhead_percent':
+                   (clock_enabled - clock_disabled) * signals /
+                   args.rounds / disabled * 100,
+               'signals': metrics.snapshot()['histograms']}
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""Measure how fast a changed race logo reaches a browser source.
+
+Usage: python benchmarks/race_assets.py [--changes 20] [--timeout 60]
+                                        [--output file]
+
+A browser source in a child process is connected to the score path
+while race logos are added to the temporary profile one after another,
+like a user that copies them into the races folder. Each change rescans
+the races, creates the sprite atlas again and sends it to the browser
+source, like the main controller. Reported are the percentiles of the
+time of a change in the main thread, the atlases the browser source
+received and if its last atlas has all race logos. A change that does
+not finish within the timeout, e.g. a deadlock of the atlas and the
+websocket server, ends the benchmark with the tracebacks of all threads.
+"""
+import argparse
+import asyncio
+import faulthandler
+import json
+import os
+import subprocess
+import sys
+import time
+
+script = os.path.abspath(__file__)
+basedir = os.path.dirname(os.path.dirname(script))
+sys.path.insert(0, basedir)
+
+
+def runClient(url, idle):
+    """Receive the atlases like the browser source (child)."""
+    import websockets
+
+    async def run():
+        atlases = 0
+        sprites = []
+        async with websockets.connect(url, max_size=None) as websocket:
+            while True:
+                try:
+                    message = await asyncio.wait_for(websocket.recv(),
+                                                     idle)
+                except asyncio.TimeoutError:
+                    break
+                message = json.loads(message)
+                if message['event'] == 'LOAD_ATLAS':
+                    atlases += 1
+                    sprites = sorted(message['data'].get('sprites', []))
+        return {'atlases': atlases, 'sprites': sprites}
+    print(json.dumps(asyncio.run(run())))
+
+
+def addRace(idx):
+    """Add a race logo to the profile."""
+    from PyQt5.QtGui import QColor, QImage
+    import hwctool.settings
+    directory = hwctool.settings.assets.getDir('races')
+    os.makedirs(directory, exist_ok=True)
+    image = QImage(512, 512, QImage.Format_ARGB32)
+    image.fill(QColor.fromHsv(idx * 37 % 360, 200, 200))
+    image.save(os.path.join(directory, 'Race_{}.png'.format(idx + 1)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--changes', type=int, default=20)
+    parser.add_argument('--timeout', type=float, default=60,
+                        help='seconds until a change counts as deadlock')
+    parser.add_argument('--output', help='write the results as json')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        runClient(args.child, 2.0)
+        return
+
+    from suite import createMatch, leave, setup
+    setup()
+
+    from PyQt5.QtWidgets import QApplication
+    import hwctool.settings
+    from hwctool.tasks.websocket import WebsocketThread
+
+    app = QApplication(sys.argv)
+    controller = createMatch()
+    thread = WebsocketThread(controller)
+    hwctool.settings.images.atlasChanged.connect(thread.sendAtlas)
+    thread.start()
+    time.sleep(0.5)
+
+    port = int(hwctool.settings.profileManager.currentID(), 16)
+    url = 'ws://localhost:{}/score'.format(port)
+    child = subprocess.Popen(
+        [sys.executable, script, '--child', url],
+        stdout=subprocess.PIPE, universal_newlines=True)
+    timeout = time.time() + 10
+    while not thread.connected.get('score'):
+        if time.time() > timeout:
+            child.kill()
+            sys.exit('The browser source did not connect.')
+        time.sleep(0.05)
+
+    durations = []
+    for idx in range(args.changes):
+        addRace(idx)
+        faulthandler.dump_traceback_later(args.timeout, exit=True)
+        start = time.perf_counter()
+        hwctool.settings.assets.update('races')
+        durations.append(time.perf_counter() - start)
+        faulthandler.cancel_dump_traceback_later()
+        app.processEvents()
+    result = json.loads(child.communicate()[0])
+    expected = sorted(hwctool.settings.getRaceAtlas()['sprites'])
+    durations.sort()
+    results = {'benchmark': 'race_assets',
+               'changes': args.changes,
+               'change_p50_ms': durations[len(durations) // 2] * 1000,
+               'change_max_ms': durations[-1] * 1000,
+               'atlases': result['atlases'],
+               'complete': result['sprites'] == expected}
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    leave()
+
+
+if __name__ == '__main__':
+    main()
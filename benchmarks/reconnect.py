@@ -0,0 +1,142 @@
+"""Measure how fast browser sources recover after a lost connection.
+
+Usage: python benchmarks/reconnect.py [--clients 20] [--rounds 10]
+                                      [--gap 0.5] [--output file]
+
+Changes of the score are sent at a fixed interval with a time stamp.
+Clients in a child process drop their connection for about the gap and
+connect again, either with the sequence number of their last message
+(resume) or without (snapshot). The recovery time is measured from the
+start of the connection to the first change that was sent after it,
+i.e. until the client is up to date, together with the bytes received
+in between. The delay of the browser sources before they reconnect is
+not part of the measurement.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+script = os.path.abspath(__file__)
+basedir = os.path.dirname(os.path.dirname(script))
+sys.path.insert(0, basedir)
+
+
+async def client(url, resume, rounds, gap, results):
+    """Drop and restore the connection of a browser source."""
+    import websockets
+    seq = None
+    for idx in range(rounds + 1):
+        start = time.time()
+        target = url
+        if resume and seq is not None:
+            target = '{}?seq={}'.format(url, seq)
+        received = 0
+        async with websockets.connect(target, max_size=None) as websocket:
+            while True:
+                message = await websocket.recv()
+                received += len(message)
+                data = json.loads(message)
+                seq = data.get('seq', seq)
+                if data['data'].get('sent', 0) >= start:
+                    break
+        if idx:
+            # The first connection of a client is not a recovery.
+            results.append((time.time() - start, received))
+        await asyncio.sleep(gap * random.uniform(0.5, 1.5))
+
+
+def runClients(url, resume, clients, rounds, gap):
+    """Connect the browser sources and print the results (child)."""
+    results = []
+
+    async def run():
+        await asyncio.gather(*[client(url, resume, rounds, gap, results)
+                               for idx in range(clients)])
+    asyncio.run(run())
+    print(json.dumps(results))
+
+
+def run(thread, url, resume, args):
+    """Send changes while the clients reconnect."""
+    command = [sys.executable, script, '--child', url,
+               '--clients', str(args.clients), '--rounds', str(args.rounds),
+               '--gap', str(args.gap)]
+    if resume:
+        command.append('--resume')
+    child = subprocess.Popen(command, stdout=subprocess.PIPE,
+                             universal_newlines=True)
+    idx = 0
+    while child.poll() is None:
+        idx += 1
+        thread.sendData2Path('score', 'CHANGE_TEXT', {
+            'id': 'score1', 'text': str(idx), 'sent': time.time()})
+        time.sleep(args.interval)
+    try:
+        results = json.loads(child.communicate()[0])
+    except ValueError:
+        return {'error': 'The clients failed.'}
+    durations = sorted(result[0] for result in results)
+    received = [result[1] for result in results]
+    return {'recoveries': len(results),
+            'p50_ms': durations[len(durations) // 2] * 1000,
+            'p99_ms': durations[int(len(durations) * 0.99)] * 1000,
+            'mean_bytes': statistics.mean(received)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=20)
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--gap', type=float, default=0.5,
+                        help='seconds without connection')
+    parser.add_argument('--interval', type=float, default=0.02,
+                        help='seconds between the changes')
+    parser.add_argument('--resume', action='store_true',
+                        help=argparse.SUPPRESS)
+    parser.add_argument('--output', help='write the results as json')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        runClients(args.child, args.resume, args.clients, args.rounds,
+                   args.gap)
+        return
+
+    from suite import createMatch, leave, setup
+    setup()
+
+    from PyQt5.QtWidgets import QApplication
+    import hwctool.settings
+    from hwctool.tasks.websocket import WebsocketThread
+
+    app = QApplication(sys.argv)
+    controller = createMatch()
+    thread = WebsocketThread(controller)
+    thread.start()
+    time.sleep(0.5)
+
+    port = int(hwctool.settings.profileManager.currentID(), 16)
+    url = 'ws://localhost:{}/score'.format(port)
+    results = {'benchmark': 'reconnect',
+               'clients': args.clients,
+               'gap_s': args.gap,
+               'interval_s': args.interval,
+               'replay_size': thread.replay_size,
+               'snapshot': run(thread, url, False, args),
+               'resume': run(thread, url, True, args)}
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    leave()
+
+
+if __name__ == '__main__':
+    main()
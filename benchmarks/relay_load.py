@@ -0,0 +1,198 @@
+"""Measure the frame latency of many browser sources with and without relays.
+
+Usage: python benchmarks/relay_load.py [--clients 200] [--relays 2]
+                                       [--messages 200] [--output file]
+
+The score data of a match with the maximal number of sets is sent with a
+time stamp at a fixed interval, like a busy production. The clients run
+in several child processes and connect either directly to the websocket
+server of the tool or evenly to relay processes (hwctool/tasks/relay.py).
+Reported are the percentiles of the time from the call of sendData2Path
+to the receipt by a client, the duration of sendData2Path itself and the
+lag of the sending thread, which stands in for the user interface.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+script = os.path.abspath(__file__)
+basedir = os.path.dirname(os.path.dirname(script))
+sys.path.insert(0, basedir)
+
+
+def percentiles(values, scale=1000):
+    """Return the percentiles of durations in seconds as ms."""
+    values = sorted(values)
+    if not values:
+        return dict()
+    return {'p50_ms': values[len(values) // 2] * scale,
+            'p99_ms': values[int(len(values) * 0.99)] * scale,
+            'max_ms': values[-1] * scale}
+
+
+def runClients(urls, messages, timeout):
+    """Connect the browser sources and print the latencies (child)."""
+    import websockets
+
+    async def receive(websocket, latencies):
+        received = 0
+        while received < messages:
+            message = json.loads(await websocket.recv())
+            if message['event'] == 'BENCHMARK':
+                latencies.append(time.time() - message['data']['sent'])
+                received += 1
+
+    async def run():
+        connections = [await websockets.connect(url, max_size=None)
+                       for url in urls]
+        print('ready', flush=True)
+        latencies = []
+        try:
+            await asyncio.wait_for(asyncio.gather(
+                *[receive(websocket, latencies)
+                  for websocket in connections]), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return latencies
+
+    print(json.dumps(asyncio.run(run())), flush=True)
+
+
+def startRelays(upstream, ports, limits):
+    """Start relay processes for the score path."""
+    relay = os.path.join(basedir, 'hwctool', 'tasks', 'relay.py')
+    return [subprocess.Popen(
+        [sys.executable, relay, '--upstream', upstream,
+         '--port', str(port), '--path', 'score',
+         '--limits', json.dumps(limits)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        for port in ports]
+
+
+def waitFor(condition, timeout=15):
+    """Wait until a condition is met."""
+    timeout = time.time() + timeout
+    while not condition():
+        if time.time() > timeout:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def run(thread, controller, urls, args):
+    """Send the score data to the clients and collect the latencies."""
+    children = []
+    for idx in range(args.processes):
+        child_urls = urls[idx::args.processes]
+        if not child_urls:
+            continue
+        children.append(subprocess.Popen(
+            [sys.executable, script, '--child', json.dumps(child_urls),
+             '--messages', str(args.messages)],
+            stdout=subprocess.PIPE, universal_newlines=True))
+    for child in children:
+        child.stdout.readline()
+    time.sleep(0.5)
+
+    data = controller.matchData.getScoreData()
+    durations = []
+    lags = []
+    due = time.perf_counter()
+    for idx in range(args.messages):
+        due += args.interval
+        begin = time.perf_counter()
+        thread.sendData2Path('score', 'BENCHMARK',
+                             {'sent': time.time(), 'score': data})
+        end = time.perf_counter()
+        durations.append(end - begin)
+        if due > end:
+            time.sleep(due - end)
+        lags.append(max(0.0, time.perf_counter() - due))
+
+    latencies = []
+    for child in children:
+        try:
+            output = child.communicate(timeout=args.timeout + 5)[0]
+            latencies += json.loads(output.splitlines()[-1])
+        except (subprocess.TimeoutExpired, ValueError, IndexError):
+            child.kill()
+    results = {'clients': len(urls),
+               'messages': args.messages,
+               'received': len(latencies),
+               'expected': len(urls) * args.messages}
+    results['latency'] = percentiles(latencies)
+    results['send'] = percentiles(durations, 1e6)
+    results['send'] = {key.replace('_ms', '_us'): value
+                       for key, value in results['send'].items()}
+    results['lag'] = percentiles(lags)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--relays', type=int, default=2)
+    parser.add_argument('--processes', type=int, default=4,
+                        help='child processes of the clients')
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--interval', type=float, default=0.02,
+                        help='seconds between the messages')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--output', help='write the results as json')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        runClients(json.loads(args.child), args.messages, args.timeout)
+        return
+
+    from suite import createMatch, leave, setup
+    setup()
+
+    from PyQt5.QtWidgets import QApplication
+    import hwctool.settings
+    from hwctool.tasks.websocket import WebsocketThread
+
+    app = QApplication(sys.argv)
+    controller = createMatch()
+    thread = WebsocketThread(controller)
+    thread.start()
+    time.sleep(0.5)
+
+    port = int(hwctool.settings.profileManager.currentID(), 16)
+    upstream = 'ws://localhost:{}'.format(port)
+    results = {'benchmark': 'relay_load',
+               'interval_s': args.interval,
+               'relays': args.relays}
+
+    urls = [upstream + '/score'] * args.clients
+    results['direct'] = run(thread, controller, urls, args)
+    waitFor(lambda: not thread.connected.get('score'))
+
+    ports = [port + 1 + idx for idx in range(args.relays)]
+    relays = startRelays(upstream, ports, thread.getLimits())
+    try:
+        if waitFor(lambda: len(thread.connected.get('score', [])) >=
+                   args.relays):
+            urls = ['ws://localhost:{}/score'.format(
+                ports[idx % args.relays]) for idx in range(args.clients)]
+            results['relay'] = run(thread, controller, urls, args)
+        else:
+            results['relay'] = {'error': 'The relays did not connect.'}
+    finally:
+        for relay in relays:
+            relay.terminate()
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    leave()
+
+
+if __name__ == '__main__':
+    main()
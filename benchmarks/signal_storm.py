@@ -0,0 +1,77 @@
+"""Count the signals of the match data for operations on many fields.
+
+Usage: python benchmarks/signal_storm.py [--output file]
+
+A match of a temporary profile with the maximal number of sets and
+distinct players per set is changed by setSolo, resetData, swapTeams and
+setCustom. Every emission of dataChanged, metaChangedSignal and
+changeSetCommitted is counted, since each of them makes the controller
+send messages to the browser sources and queue text files.
+"""
+import argparse
+import json
+import os
+import sys
+
+script = os.path.abspath(__file__)
+basedir = os.path.dirname(os.path.dirname(script))
+sys.path.insert(0, basedir)
+
+
+def prepare(match, no_sets):
+    """Set up a team match with distinct players and some scores."""
+    match.setCustom(no_sets, False, False)
+    for idx in range(no_sets):
+        for team in range(2):
+            match.setPlayer(team, idx, 'Player {}-{}'.format(team, idx),
+                            'Anders' if team else 'Cutter')
+    for idx in range(3):
+        match.setMapScore(idx, -1 if idx % 2 else 1, overwrite=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', help='write the results as json')
+    args = parser.parse_args()
+
+    from suite import setup
+    setup()
+
+    import hwctool.settings
+    from hwctool.matchdata import matchData
+
+    match = matchData(None)
+    no_sets = hwctool.settings.max_no_sets
+    counts = {'dataChanged': 0, 'metaChangedSignal': 0,
+              'changeSetCommitted': 0}
+
+    def counter(name):
+        def count(*args):
+            counts[name] += 1
+        return count
+
+    for name in counts:
+        # Older versions of the match data have no change sets.
+        if hasattr(match, name):
+            getattr(match, name).connect(counter(name))
+
+    operations = [('setSolo', lambda: match.setSolo(True)),
+                  ('resetData', lambda: match.resetData()),
+                  ('swapTeams', lambda: match.swapTeams()),
+                  ('setCustom', lambda: match.setCustom(no_sets))]
+    results = {'benchmark': 'signal_storm', 'no_sets': no_sets}
+    for name, operation in operations:
+        prepare(match, no_sets)
+        for key in counts:
+            counts[key] = 0
+        operation()
+        results[name] = dict(counts, total=sum(counts.values()))
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
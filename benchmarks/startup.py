@@ -0,0 +1,105 @@
+"""Measure the cold start import time of Halo Wars Casting Tool.
+
+Usage: python benchmarks/startup.py [--runs 5] [--top 15] [--output file]
+
+Every run imports the modules needed to show the main window in a fresh
+interpreter with ``-X importtime`` and reports the median cumulative time
+together with the most expensive modules.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+basedir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+entry_modules = ['hwctool.controller', 'hwctool.view.main']
+
+
+def importModules():
+    """Import the modules of the main window (child process)."""
+    sys.path.insert(0, basedir)
+    for module in entry_modules:
+        __import__(module)
+
+
+def parseImportTime(output):
+    """Parse the output of -X importtime into {module: (self, cumulative)}."""
+    modules = dict()
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        try:
+            self_us, cumulative_us, name = line[12:].split('|')
+            modules[name.strip()] = (int(self_us), int(cumulative_us))
+        except ValueError:
+            continue
+    return modules
+
+
+def measure():
+    """Import the entry modules in a fresh interpreter."""
+    start = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', os.path.abspath(__file__),
+         '--child'],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True, cwd=basedir)
+    wall = time.perf_counter() - start
+    if process.returncode != 0:
+        raise RuntimeError(process.stderr.strip().splitlines()[-1])
+    modules = parseImportTime(process.stderr)
+    total = sum(modules[module][1] for module in entry_modules
+                if module in modules)
+    return wall, total, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--output', help='write the results as json')
+    parser.add_argument('--child', action='store_true',
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        importModules()
+        return
+
+    walls = []
+    totals = []
+    selfs = dict()
+    for _ in range(args.runs):
+        wall, total, modules = measure()
+        walls.append(wall * 1000)
+        totals.append(total / 1000)
+        for name, (self_us, _) in modules.items():
+            selfs.setdefault(name, []).append(self_us / 1000)
+
+    top = sorted(((statistics.median(times), name)
+                  for name, times in selfs.items()), reverse=True)
+    top = top[:args.top]
+
+    print('Imports: {:.1f} ms (median of {} runs),'
+          ' process: {:.1f} ms'.format(statistics.median(totals), args.runs,
+                                       statistics.median(walls)))
+    for duration, name in top:
+        print('  {:8.2f} ms  {}'.format(duration, name))
+
+    if args.output:
+        results = {'benchmark': 'startup',
+                   'runs': args.runs,
+                   'import_ms': statistics.median(totals),
+                   'process_ms': statistics.median(walls),
+                   'top_modules': [{'module': name, 'self_ms': duration}
+                                   for duration, name in top]}
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
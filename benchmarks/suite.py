@@ -0,0 +1,359 @@
+"""Run the benchmarks of the hot paths and compare them between commits.
+
+Usage: python benchmarks/suite.py [--output file] [--compare file]
+                                  [--only name] [--clients 8]
+
+Qt runs in offscreen mode, such that the suite works headless. A match of
+a temporary profile with the maximal number of sets is used for:
+
+  set_map_score   matchData.setMapScore including the signal emission
+  score_data      matchData.getScoreData
+  map_icons_data  matchData.getMapIconsData
+  placeholders    PlaceholderList.replace with the placeholders of the
+                  controller
+  history         HistoryManager inserts and lookups
+  broadcast       WebsocketThread.sendData2Path to local clients, which
+                  run in another process
+
+The results are written as json. With --compare the results of an older
+run are shown next to the new ones and the suite fails if a benchmark got
+slower than the threshold.
+"""
+import argparse
+import asyncio
+import atexit
+import builtins
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+script = os.path.abspath(__file__)
+basedir = os.path.dirname(os.path.dirname(script))
+sys.path.insert(0, basedir)
+home = None
+
+
+def setup():
+    """Load the settings of a temporary profile, Qt runs offscreen.
+
+    hwctool must not be imported before, as the settings take the base
+    directory from the main module. The profile is removed at the exit.
+    """
+    global home
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    home = tempfile.mkdtemp()
+    atexit.register(shutil.rmtree, home, True)
+    os.environ['HOME'] = home
+    os.environ['XDG_DATA_HOME'] = os.path.join(home, 'data')
+    builtins._ = lambda string: string
+    import __main__
+    __main__.__file__ = os.path.join(basedir, 'HaloWarsCastingTool.py')
+
+    import hwctool.settings
+    hwctool.settings.loadSettings()
+
+
+def leave(code=0):
+    """Remove the temporary profile and exit.
+
+    The websocket server is not shut down: this unhooks the keyboard,
+    which is not available on every machine.
+    """
+    sys.stdout.flush()
+    if home:
+        shutil.rmtree(home, True)
+    os._exit(code)
+
+
+def measure(func, number, repeat=5):
+    """Return the duration of a call of a function in microseconds."""
+    durations = []
+    for idx in range(repeat):
+        start = time.perf_counter()
+        for idx in range(number):
+            func()
+        durations.append((time.perf_counter() - start) / number * 1e6)
+    return {'number': number,
+            'best_us': min(durations),
+            'median_us': statistics.median(durations)}
+
+
+class Controller:
+    """Provide the match data and map images like the main controller."""
+
+    def mainController(name):
+        """Use a method of the main controller, imported after setup."""
+        def method(self, *args, **kwargs):
+            from hwctool.controller import MainController
+            return getattr(MainController, name)(self, *args, **kwargs)
+        return method
+
+    getMapImg = mainController('getMapImg')
+    getSnapshot = mainController('getSnapshot')
+    placeholderSetup = mainController('placeholderSetup')
+
+    def __init__(self):
+        from hwctool.matchdata import matchData
+        self.matchData = matchData(self)
+        self.placeholders = self.placeholderSetup()
+        self._mapImages = dict()
+
+    def displayWarning(self, msg):
+        pass
+
+
+def createMatch():
+    """Return a match with the maximal number of sets."""
+    import hwctool.settings
+    maps = sorted(hwctool.settings.assets.names('maps')) or ['TBD']
+    controller = Controller()
+    match = controller.matchData
+    no_sets = hwctool.settings.max_no_sets
+    match.setCustom(no_sets, False, True)
+    match.setTeam(0, 'Team Spirit', 'TS')
+    match.setTeam(1, 'Halo Legends', 'HL')
+    for idx in range(no_sets):
+        match.setMap(idx, maps[idx % len(maps)])
+        for team in range(2):
+            match.setPlayer(team, idx, 'Player {}-{}'.format(team, idx))
+    match.setLeague('Benchmark League')
+    match.setURL('https://example.com/match/1')
+    return controller
+
+
+def benchSetMapScore(controller):
+    """Change map scores while a handler encodes the score data."""
+    match = controller.matchData
+    no_sets = match.getNoSets()
+    state = {'idx': 0}
+
+    def handler(*args):
+        json.dumps(match.getScoreData())
+    match.dataChanged.connect(handler)
+
+    def update():
+        idx = state['idx']
+        state['idx'] = idx + 1
+        match.setMapScore(idx % no_sets, 1 if (idx // no_sets) % 2 else -1,
+                          overwrite=True)
+    try:
+        return measure(update, 500)
+    finally:
+        match.dataChanged.disconnect(handler)
+        for idx in range(no_sets):
+            match.setMapScore(idx, 0, overwrite=True)
+
+
+def benchScoreData(controller):
+    """Generate the data of the score browser source."""
+    return measure(controller.matchData.getScoreData, 2000)
+
+
+def benchMapIconsData(controller):
+    """Generate the data of the map icons."""
+    return measure(controller.matchData.getMapIconsData, 500)
+
+
+def benchPlaceholders(controller):
+    """Replace the placeholders of a title."""
+    placeholders = controller.placeholders
+    title = '(Team1) vs (Team2) - (Score) - Best of (BestOf) - (League)' \
+        ' (URL)'
+    return measure(lambda: placeholders.replace(title), 5000)
+
+
+def benchHistory(controller):
+    """Insert players and teams and look up their races and logos."""
+    from hwctool.settings.history import HistoryManager
+    history = HistoryManager()
+    players = ['Player {}'.format(idx) for idx in range(150)]
+    state = {'idx': 0}
+
+    def insert():
+        idx = state['idx']
+        state['idx'] = idx + 1
+        history.insertPlayer(players[idx % 150], 'Random')
+        history.insertTeam('Team {}'.format(idx % 150))
+
+    def lookup():
+        idx = state['idx']
+        state['idx'] = idx + 7
+        history.getRace(players[idx % 150])
+        history.getLogo('Team {}'.format(idx % 150))
+
+    results = {'insert': measure(insert, 2000)}
+    results['lookup'] = measure(lookup, 2000)
+    results['lists'] = measure(
+        lambda: (history.getPlayerList(), history.getTeamList()), 2000)
+    return results
+
+
+async def listen(url, messages):
+    """Receive messages like a browser source."""
+    import websockets
+    received = 0
+    async with websockets.connect(url) as websocket:
+        while received < messages:
+            message = json.loads(await websocket.recv())
+            if message['event'] == 'BENCHMARK':
+                received += 1
+    return received
+
+
+def runClients(url, clients, messages):
+    """Connect the browser sources (child process)."""
+    async def listenAll():
+        return await asyncio.gather(
+            *[listen(url, messages) for idx in range(clients)])
+    print(sum(asyncio.run(listenAll())))
+
+
+def benchBroadcast(controller, clients, messages=200):
+    """Broadcast the score data to local clients."""
+    import hwctool.settings
+    from hwctool.tasks.websocket import WebsocketThread
+    thread = WebsocketThread(controller)
+    thread.start()
+    time.sleep(0.5)
+
+    port = int(hwctool.settings.profileManager.currentID(), 16)
+    url = 'ws://localhost:{}/score'.format(port)
+    # The clients run in another process to not compete for the GIL.
+    child = subprocess.Popen(
+        [sys.executable, script, '--child', url, '--clients', str(clients),
+         '--messages', str(messages)],
+        stdout=subprocess.PIPE, universal_newlines=True)
+    timeout = time.time() + 10
+    while len(thread.connected.get('score', [])) < clients:
+        if time.time() > timeout:
+            child.kill()
+            return {'error': 'The clients did not connect.'}
+        time.sleep(0.05)
+    time.sleep(0.2)
+
+    data = controller.matchData.getScoreData()
+    durations = []
+    start = time.perf_counter()
+    for idx in range(messages):
+        begin = time.perf_counter()
+        thread.sendData2Path('score', 'BENCHMARK', data)
+        durations.append((time.perf_counter() - begin) * 1e6)
+    try:
+        received = int(child.communicate(timeout=30)[0])
+    except (subprocess.TimeoutExpired, ValueError):
+        child.kill()
+        received = 0
+    total = time.perf_counter() - start
+    return {'clients': clients,
+            'messages': messages,
+            'received': received,
+            'send_best_us': min(durations),
+            'send_median_us': statistics.median(durations),
+            'delivery_s': total}
+
+
+def flatten(results, prefix=''):
+    """Return the durations of nested results by a dotted key."""
+    values = dict()
+    for key, value in results.items():
+        if isinstance(value, dict):
+            values.update(flatten(value, prefix + key + '.'))
+        elif key.endswith('_us') or key.endswith('_s'):
+            values[prefix + key] = value
+    return values
+
+
+def compare(old, new, threshold):
+    """Print the changes and return the regressions."""
+    old = flatten(old['results'])
+    new = flatten(new['results'])
+    regressions = []
+    print('{:<40} {:>12} {:>12} {:>8}'.format(
+        'benchmark', 'old', 'new', 'change'))
+    for key in sorted(new):
+        if key not in old or not old[key]:
+            print('{:<40} {:>12} {:>12.2f}'.format(key, '-', new[key]))
+            continue
+        change = (new[key] - old[key]) / old[key] * 100
+        print('{:<40} {:>12.2f} {:>12.2f} {:>+7.1f}%'.format(
+            key, old[key], new[key], change))
+        # Only the best durations are stable enough to fail the suite.
+        if 'best' in key and change > threshold:
+            regressions.append(key)
+    return regressions
+
+
+def getCommit():
+    """Return the current commit of the repository."""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=basedir,
+            stderr=subprocess.DEVNULL, universal_newlines=True).strip()
+    except Exception:
+        return ''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', help='write the results as json')
+    parser.add_argument('--compare', help='results of an older run')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='maximal slowdown in percent')
+    parser.add_argument('--only', action='append',
+                        help='run only the named benchmarks')
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        runClients(args.child, args.clients, args.messages)
+        return
+
+    setup()
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication(sys.argv)
+    controller = createMatch()
+
+    benchmarks = [('set_map_score', benchSetMapScore),
+                  ('score_data', benchScoreData),
+                  ('map_icons_data', benchMapIconsData),
+                  ('placeholders', benchPlaceholders),
+                  ('history', benchHistory),
+                  ('broadcast', lambda controller: benchBroadcast(
+                      controller, args.clients, args.messages))]
+    results = {'benchmark': 'suite',
+               'commit': getCommit(),
+               'python': platform.python_version(),
+               'platform': platform.platform(),
+               'no_sets': controller.matchData.getNoSets(),
+               'results': dict()}
+    for name, func in benchmarks:
+        if args.only and name not in args.only:
+            continue
+        results['results'][name] = func(controller)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    error = 0
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), results, args.threshold)
+        if regressions:
+            print('Slower than {}%: {}'.format(
+                args.threshold, ', '.join(regressions)))
+            error = 1
+    leave(error)
+
+
+if __name__ == '__main__':
+    main()
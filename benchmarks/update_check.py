@@ -0,0 +1,109 @@
+"""Measure the update check against a local update server with latency.
+
+Usage: python benchmarks/update_check.py [--latency 2] [--timeout 1]
+
+A local stand-in for the update server answers every request after an
+artificial delay. The benchmark reports how long a manifest refresh takes
+without a cache, when the server is slower than the timeout and when the
+cached manifest is still fresh.
+"""
+import argparse
+import gzip
+import http.server
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hwctool.tasks.updater as updater  # noqa: E402
+from hwctool.settings.client_config import ClientConfig  # noqa: E402
+
+
+class SlowHandler(http.server.SimpleHTTPRequestHandler):
+    """Serve the update directory after a delay."""
+
+    latency = 0.0
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        try:
+            super().do_GET()
+        except ConnectionError:
+            # The client has given up already.
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+def createServer(directory, latency):
+    """Start the stand-in update server in a thread."""
+    with open(os.path.join(directory, 'keys.gz'), 'wb') as f:
+        f.write(gzip.compress(json.dumps(
+            {'app_public': '', 'signature': ''}).encode('utf-8')))
+    for name in ['versions.gz', 'versions-{}.gz'.format(sys.platform)]:
+        with open(os.path.join(directory, name), 'wb') as f:
+            f.write(gzip.compress(json.dumps(
+                {'updates': {}, 'signature': ''}).encode('utf-8')))
+
+    handler = type('Handler', (SlowHandler,), {'latency': latency})
+    server = http.server.ThreadingHTTPServer(
+        ('localhost', 0),
+        lambda *args: handler(*args, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def refresh(data_dir):
+    """Create a client and refresh the manifest."""
+    start = time.perf_counter()
+    client = updater.createClient(data_dir=data_dir)
+    client.refresh()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--latency', type=float, default=2.0,
+                        help='delay of the update server in seconds')
+    parser.add_argument('--timeout', type=float, default=1.0,
+                        help='manifest timeout in seconds')
+    parser.add_argument('--output', help='write the results as json')
+    args = parser.parse_args()
+
+    results = {'benchmark': 'update_check', 'latency_s': args.latency,
+               'timeout_s': args.timeout}
+    with tempfile.TemporaryDirectory() as tmp:
+        www = os.path.join(tmp, 'www')
+        os.makedirs(www)
+        server = createServer(www, args.latency)
+        ClientConfig.UPDATE_URLS = [
+            'http://localhost:{}/'.format(server.server_address[1])]
+        try:
+            updater.MANIFEST_TIMEOUT = args.latency + 5
+            results['uncached_s'] = refresh(os.path.join(tmp, 'a'))
+            results['cached_s'] = refresh(os.path.join(tmp, 'a'))
+
+            updater.MANIFEST_TIMEOUT = args.timeout
+            results['timeout_s_measured'] = refresh(os.path.join(tmp, 'b'))
+
+            updater.MANIFEST_TTL = 0
+            results['stale_fallback_s'] = refresh(os.path.join(tmp, 'a'))
+        finally:
+            server.shutdown()
+
+    for key, value in results.items():
+        print('{:>20}: {}'.format(key, round(value, 3)
+                                  if isinstance(value, float) else value))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,9 @@
-import tarfile
-import os.path
+import hashlib
+import json
+import os
+import shutil
 import subprocess
+import tarfile
 from hwctool import __version__ as version
 
 
@@ -9,7 +12,56 @@ def make_tarfile(output_filename, source_dir):
         tar.add(source_dir, arcname=os.path.basename(source_dir))
 
 
+def load_private_key():
+    """Return the app private key of the pyupdater keypack."""
+    from pyupdater import settings
+    from pyupdater.utils.storage import Storage
+    return Storage().load(settings.CONFIG_DB_KEY_KEYPACK)['repo'][
+        'app_private']
+
+
+def sign_manifest(manifest, private_key):
+    """Sign a manifest like pyupdater signs the version file."""
+    from nacl.signing import SigningKey
+    from pyupdater.utils.encoding import UnpaddedBase64Encoder
+    manifest.pop('signature', None)
+    data = json.dumps(manifest, sort_keys=True).encode('utf-8')
+    signature = SigningKey(private_key, UnpaddedBase64Encoder).sign(data)
+    manifest['signature'] = UnpaddedBase64Encoder.encode(
+        signature[:64]).decode()
+    return manifest
+
+
+def make_manifest(source_dir, deploy_dir, version, private_key):
+    """Write a signed content-addressed manifest and the blobs."""
+    prefix = os.path.basename(source_dir)
+    files = {}
+    for root, _, filenames in os.walk(source_dir):
+        for filename in sorted(filenames):
+            file = os.path.join(root, filename)
+            with open(file, 'rb') as f:
+                data = f.read()
+            sha256 = hashlib.sha256(data).hexdigest()
+            path = os.path.join(
+                prefix, os.path.relpath(file, source_dir)).replace('\\', '/')
+            files[path] = {'sha256': sha256, 'size': len(data)}
+
+            blob = os.path.join(deploy_dir, 'blobs', sha256[:2], sha256)
+            if not os.path.exists(blob):
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                shutil.copyfile(file, blob)
+
+    manifest = sign_manifest(
+        {'name': 'HWCT-data', 'version': version, 'files': files},
+        private_key)
+    with open(os.path.join(deploy_dir, 'HWCT-data-manifest.json'), 'w') as o:
+        json.dump(manifest, o, indent=1, sort_keys=True)
+    return manifest
+
+
 if __name__ == "__main__":
     make_tarfile('pyu-data/new/HWCT-data', 'casting_html')
     subprocess.run(
         f'.\\.venv\\Scripts\\pyupdater.exe archive --name HWCT-data --version {version}', shell=True, check=True)
+    make_manifest('casting_html', 'pyu-data/deploy', version,
+                  load_private_key())
@@ -0,0 +1,100 @@
+class SpriteAtlas {
+  constructor() {
+    this.manifest = null;
+    this.image = null;
+    this.file = null;
+    this.objects = new Map();
+    var atlas = this;
+    window.addEventListener('load', function() {
+      atlas.refresh();
+    });
+    window.addEventListener('resize', function() {
+      atlas.refresh();
+    });
+  }
+
+  load(manifest) {
+    if (!manifest || !manifest.file) {
+      this.manifest = null;
+      this.image = null;
+      this.file = null;
+      this.refresh();
+      return;
+    }
+    if (manifest.file == this.file) return;
+    // Decode the atlas once, the logos are switched without any delay.
+    var atlas = this;
+    var image = new Image();
+    this.file = manifest.file;
+    image.src = manifest.file;
+    image.decode().then(function() {
+      if (atlas.file != manifest.file) return;
+      atlas.image = image;
+      atlas.manifest = manifest;
+      atlas.refresh();
+    }).catch(function(e) {
+      console.log("Failed to load " + manifest.file);
+    });
+  }
+
+  setImage(object, url) {
+    var atlas = this;
+    $(object).each(function() {
+      atlas.objects.set(this, url);
+      atlas.apply(this, url);
+    });
+  }
+
+  refresh() {
+    var atlas = this;
+    this.objects.forEach(function(url, element) {
+      atlas.apply(element, url);
+    });
+  }
+
+  apply(element, url) {
+    element.style.removeProperty('background-size');
+    element.style.removeProperty('background-position');
+    element.style.removeProperty('background-repeat');
+    element.style.removeProperty('clip-path');
+
+    var sprite = this.manifest ? this.manifest.sprites[url] : undefined;
+    var style = getComputedStyle(element);
+    var mode = style.backgroundSize;
+    var width = element.clientWidth;
+    var height = element.clientHeight;
+    if (!sprite || !width || !height || (mode != 'contain' && mode != 'cover')) {
+      element.style.backgroundImage = "url('" + url + "')";
+      return;
+    }
+
+    // Emulate the background size and position of the style sheet.
+    var scale = Math.min(width / sprite[2], height / sprite[3]);
+    if (mode == 'cover') scale = Math.max(width / sprite[2], height / sprite[3]);
+    var spriteWidth = sprite[2] * scale;
+    var spriteHeight = sprite[3] * scale;
+    var position = style.backgroundPosition.split(',')[0].trim().split(' ');
+    var left = this.offset(position[0], width - spriteWidth);
+    var top = this.offset(position[1], height - spriteHeight);
+
+    element.style.backgroundImage = "url('" + this.manifest.file + "')";
+    element.style.backgroundRepeat = 'no-repeat';
+    element.style.backgroundSize = (this.manifest.width * scale) + 'px ' +
+      (this.manifest.height * scale) + 'px';
+    element.style.backgroundPosition = (left - sprite[0] * scale) + 'px ' +
+      (top - sprite[1] * scale) + 'px';
+
+    // Hide the neighbouring sprites, but leave some room for shadows.
+    var margin = Math.min(this.manifest.padding * scale, 8);
+    element.style.clipPath = 'inset(' +
+      (top - margin) + 'px ' +
+      (width - left - spriteWidth - margin) + 'px ' +
+      (height - top - spriteHeight - margin) + 'px ' +
+      (left - margin) + 'px)';
+  }
+
+  offset(value, free) {
+    if (value && value.endsWith('%')) return parseFloat(value) / 100 * free;
+    return parseFloat(value) || 0;
+  }
+}
@@ -3,7 +3,10 @@ class Controller {
     this.profile = profile;
     this.name = name;
     this.ident = 0;
+    this.seq = null;
+    this.attempts = 0;
     this.storage = window.localStorage;
+    this.atlas = new SpriteAtlas();
     this.generateKey();
     this.loadCssFile(this.loadData('css'));
   }
@@ -15,6 +18,62 @@ class Controller {
     }
   }
 
+  socketUrl(path) {
+    // A relay of the tool is chosen by the url parameters port and host.
+    var params = new URLSearchParams(window.location.search);
+    var host = params.get('host') || '127.0.0.1';
+    var port = params.get('port') || parseInt("0x".concat(this.profile), 16);
+    var query = [];
+    if (params.get('encoding') == 'compact') query.push('encoding=compact');
+    // Resume after the last message, the tool sends the missed ones.
+    if (this.seq !== null) query.push('seq='.concat(this.seq));
+    var url = "ws://".concat(host, ":", port, "/", path);
+    if (query.length) url = url.concat('?', query.join('&'));
+    return url;
+  }
+
+  reconnectDelay() {
+    // Exponential backoff with jitter, such that many browser sources
+    // do not reconnect at the same time.
+    var delay = Math.min(10000, 250 * Math.pow(2, this.attempts));
+    this.attempts += 1;
+    return delay / 2 + Math.random() * delay / 2;
+  }
+
+  decode(raw) {
+    // Compact messages are lists of the event, the data with abbreviated
+    // keys and the state, which are described by the ENCODING message.
+    var message = JSON.parse(raw);
+    if (Array.isArray(message)) {
+      var event = message[0];
+      if (typeof event == 'number') event = this.encoding.events[event];
+      message = {
+        event: event,
+        data: this.expand(message[1]),
+        seq: message.length > 2 ? message[2] : null,
+        state: message.length > 3 ? message[3] : ''
+      };
+    } else if (message.event == 'ENCODING') {
+      this.encoding = message.data;
+    }
+    if (message.seq != null) this.seq = message.seq;
+    return message;
+  }
+
+  expand(value) {
+    if (Array.isArray(value)) {
+      return value.map(item => this.expand(item));
+    } else if (value !== null && typeof value == 'object') {
+      var data = {};
+      for (var key in value) {
+        var name = this.encoding.keys.hasOwnProperty(key) ? this.encoding.keys[key] : key;
+        data[name] = this.expand(value[key]);
+      }
+      return data;
+    }
+    return value;
+  }
+
   storeData(key, value, json = false) {
     if (json) value = JSON.stringify(value);
     this.storage.setItem(this.key + '-' + key, value);
@@ -30,21 +89,45 @@ class Controller {
     if (file == null) file = 'src/css/' + this.name + '/Default.css';
     this.style = file;
     console.log(file);
+    this.link = this.createLink(file);
+    document.getElementsByTagName("head")[0].appendChild(this.link);
+    $(document).ready(function() {
+      $(document).find(".text-fill").textfill();
+    });
+  }
+
+  createLink(file) {
     var fileref = document.createElement("link");
     fileref.setAttribute("rel", "stylesheet");
     fileref.setAttribute("type", "text/css");
     fileref.setAttribute("href", file);
-    document.getElementsByTagName("head")[0].appendChild(fileref)
-    $(document).ready(function() {
-      $(document).find(".text-fill").textfill();
-    });
+    return fileref;
   }
 
   setStyle(file = null) {
     if (file == null) file = 'src/css/' + this.name + '/Default.css';
-    if (file != this.style) {
-      this.storeData('css', file);
-      location.reload();
-    }
+    if (file == this.style) return;
+    this.style = file;
+    this.storeData('css', file);
+    // Keep the old stylesheet active until the new one is loaded to
+    // swap them within one frame instead of reloading the page.
+    var controller = this;
+    var link = this.createLink(file);
+    link.onload = function() {
+      if (controller.style != file) {
+        link.remove();
+        return;
+      }
+      if (controller.link) controller.link.remove();
+      controller.link = link;
+      $(document).find(".text-fill").textfill();
+      controller.atlas.refresh();
+      if (controller.onStyleChanged) controller.onStyleChanged(file);
+    };
+    link.onerror = function() {
+      console.log("Failed to load " + file);
+      link.remove();
+    };
+    document.getElementsByTagName("head")[0].appendChild(link);
   }
 }
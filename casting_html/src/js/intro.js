@@ -1,6 +1,5 @@
 var socket = null;
 var isopen = false;
-var reconnectIntervalMs = 5000;
 var volume = 1.0;
 var debug = false;
 var displayTime = 3.0;
@@ -32,16 +31,16 @@ function playSound(audio) {
 
 function Connect() {
   path = "intro"
-  port = parseInt("0x".concat(profile), 16);
-  socket = new WebSocket("ws://127.0.0.1:".concat(port, "/", path));
+  socket = new WebSocket(controller.socketUrl(path));
 
   socket.onopen = function() {
     console.log("Connected!");
     isopen = true;
+    controller.attempts = 0;
   }
 
   socket.onmessage = function(message) {
-    var jsonObject = JSON.parse(message.data);
+    var jsonObject = controller.decode(message.data);
     var intro = document.getElementById("intro");
     if (jsonObject.data.hasOwnProperty('font')) {
       intro.style.fontFamily = jsonObject.data.font;
@@ -64,7 +63,7 @@ function Connect() {
           $(".box").removeClass('red');
         }
         $(".logo").css("display", jsonObject.data.display)
-        $(".logo").css("background-image", "url(" + jsonObject.data.logo + ")");
+        controller.atlas.setImage($(".logo"), jsonObject.data.logo);
         $('.name span').html(jsonObject.data.name);
         $('.team span').html(jsonObject.data.team);
         fillText();
@@ -162,6 +161,8 @@ function Connect() {
         }
       }
 
+    } else if (jsonObject.event == 'LOAD_ATLAS') {
+      controller.atlas.load(jsonObject.data);
     } else if (jsonObject.event == 'CHANGE_STYLE') {
       controller.setStyle(jsonObject.data.file);
     } else if (jsonObject.event == 'DEBUG_MODE') {
@@ -187,7 +188,7 @@ function Connect() {
     isopen = false
     setTimeout(function() {
       Connect();
-    }, reconnectIntervalMs);
+    }, controller.reconnectDelay());
   }
 };
 
@@ -0,0 +1,174 @@
+var socket = null;
+var isopen = false;
+var data = {};
+var pending = {};
+var frame = null;
+var controller = new Controller(profile, 'mapicons');
+controller.onStyleChanged = function() {
+  $('#container').find(".text-fill").textfill();
+};
+
+init();
+
+function init() {
+  loadStoredData();
+  connectWebsocket();
+}
+
+function connectWebsocket() {
+  console.time('connectWebsocket');
+  path = "mapicons"
+  socket = new WebSocket(controller.socketUrl(path));
+
+  socket.onopen = function() {
+    console.log("Connected!");
+    isopen = true;
+    controller.attempts = 0;
+  }
+
+  socket.onmessage = function(message) {
+    var jsonObject = controller.decode(message.data);
+    console.log("Message received");
+    if (jsonObject.event == 'CHANGE_STYLE') {
+      controller.setStyle(jsonObject.data.file);
+    } else if (jsonObject.event == 'LOAD_ATLAS') {
+      controller.atlas.load(jsonObject.data);
+    } else if (jsonObject.event == 'ALL_DATA') {
+      setAllData(jsonObject.data);
+    } else if (jsonObject.event == 'CHANGE_SETS') {
+      changeSets(jsonObject.data);
+    }
+  }
+
+  socket.onclose = function(e) {
+    console.timeEnd('connectWebsocket');
+    console.log("Connection closed.");
+    socket = null;
+    isopen = false
+    setTimeout(function() {
+      connectWebsocket();
+    }, controller.reconnectDelay());
+  }
+}
+
+function storeData() {
+  controller.storeData('data', data, true);
+}
+
+function loadStoredData() {
+  try {
+    setAllData(controller.loadData('data', true) || {});
+  } catch (e) {}
+}
+
+function setAllData(newData) {
+  // The blocks are only created again if the number of sets changed.
+  var container = document.getElementById('container');
+  var keys = Object.keys(newData);
+  if (container.children.length != keys.length) {
+    $(container).find('.race').each(function() {
+      controller.atlas.objects.delete(this);
+    });
+    container.textContent = '';
+    for (var i = 0; i < keys.length; i++) {
+      container.appendChild(createBlock(keys[i]));
+    }
+  }
+  data = newData;
+  pending = Object.assign({}, newData);
+  scheduleRender();
+}
+
+function changeSets(sets) {
+  for (var idx in sets) {
+    data[idx] = sets[idx];
+    pending[idx] = sets[idx];
+  }
+  scheduleRender();
+}
+
+function scheduleRender() {
+  // A burst of changes, e.g. of all sets, is drawn within one frame.
+  if (frame === null) frame = window.requestAnimationFrame(render);
+}
+
+function render() {
+  frame = null;
+  var resized = [];
+  for (var idx in pending) {
+    var block = document.getElementById('map' + idx);
+    if (block && updateBlock(block, pending[idx])) resized.push(block);
+  }
+  pending = {};
+  storeData();
+  $(resized).find(".text-fill").textfill();
+}
+
+function createBlock(idx) {
+  var template = document.getElementById('block-template');
+  var block = template.content.firstElementChild.cloneNode(true);
+  block.id = 'map' + idx;
+  block.set = {};
+  return block;
+}
+
+function updateBlock(block, set) {
+  // Only the properties that changed are written to the page.
+  var old = block.set;
+  var resized = false;
+  block.set = set;
+  if (old.map_img != set.map_img) setMapImage(block, set.map_img);
+  ['player1', 'player2', 'mapname'].forEach(function(key) {
+    if (old[key] != set[key]) {
+      block.querySelector('.' + key + ' > span').textContent = set[key];
+      resized = true;
+    }
+  });
+  if (old.maplabel != set.maplabel) {
+    block.querySelector('.label').textContent = set.maplabel;
+  }
+  for (var i = 1; i < 3; i++) {
+    var player = block.querySelector('.player' + i);
+    if (old['status' + i] != set['status' + i]) {
+      player.classList.remove('winner', 'loser');
+      if (set['status' + i]) player.classList.add(set['status' + i]);
+    }
+    if (old['logo' + i] != set['logo' + i]) {
+      controller.atlas.setImage(block.querySelector('.race' + i),
+        set['logo' + i]);
+    }
+  }
+  if (old.border_color != set.border_color) {
+    block.querySelector('.box').style.borderColor = set.border_color;
+  }
+  var icon = block.querySelector('.scoreicon');
+  if (old.score_color != set.score_color) {
+    icon.style.backgroundColor = set.score_color;
+  }
+  if (old.hide_scoreicon != set.hide_scoreicon) {
+    icon.style.visibility = set.hide_scoreicon ? 'hidden' : 'visible';
+  }
+  if (old.opacity != set.opacity) {
+    block.querySelector('.opa').style.opacity = set.opacity;
+  }
+  return resized;
+}
+
+function setMapImage(block, url) {
+  var image = block.querySelector('.image');
+  block.mapImg = url;
+  if (!url || url == 'TBD') {
+    image.style.backgroundImage = 'none';
+    return;
+  }
+  // Decode the image before it is shown to avoid an empty frame.
+  var loader = new Image();
+  loader.src = url;
+  loader.decode().catch(function(e) {
+    console.log("Failed to load " + url);
+  }).then(function() {
+    if (block.mapImg == url) {
+      image.style.backgroundImage = 'url("' + url + '")';
+    }
+  });
+}
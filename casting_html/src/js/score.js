@@ -2,7 +2,6 @@ var tweens = {};
 var socket = null;
 var isopen = false;
 var myDefaultFont = null;
-var reconnectIntervalMs = 5000;
 var data = {};
 var font = "DEFAULT";
 var cssFile = "";
@@ -10,6 +9,12 @@ var initNeeded = true;
 var tweenInitial = new TimelineMax();
 var tweens = {};
 var controller = new Controller(profile, 'score');
+controller.onStyleChanged = function() {
+  var useDefault = (!font || font == myDefaultFont.trim());
+  document.documentElement.style.removeProperty('--font');
+  myDefaultFont = getComputedStyle(document.body).getPropertyValue('--font');
+  setFont(useDefault ? 'DEFAULT' : font);
+};
 
 init();
 
@@ -26,19 +31,21 @@ function init() {
 function connectWebsocket() {
   console.time('connectWebsocket');
   path = "score"
-  port = parseInt("0x".concat(profile), 16);
-  socket = new WebSocket("ws://127.0.0.1:".concat(port, "/", path));
+  socket = new WebSocket(controller.socketUrl(path));
 
   socket.onopen = function() {
     console.log("Connected!");
     isopen = true;
+    controller.attempts = 0;
   }
 
   socket.onmessage = function(message) {
-    var jsonObject = JSON.parse(message.data);
+    var jsonObject = controller.decode(message.data);
     console.log("Message received");
     if (jsonObject.event == 'CHANGE_STYLE') {
       controller.setStyle(jsonObject.data.file);
+    } else if (jsonObject.event == 'LOAD_ATLAS') {
+      controller.atlas.load(jsonObject.data);
     } else if (jsonObject.event == 'CHANGE_FONT') {
       setFont(jsonObject.data.font);
     } else if (jsonObject.event == 'ALL_DATA') {
@@ -63,7 +70,7 @@ function connectWebsocket() {
     isopen = false
     setTimeout(function() {
       connectWebsocket();
-    }, reconnectIntervalMs);
+    }, controller.reconnectDelay());
   }
 }
 
@@ -100,8 +107,8 @@ function insertData() {
   $('#team2').text(data['team2']);
   $('#score1').text(data['score1']);
   $('#score2').text(data['score2']);
-  $('#logo1').css("background-image", "url('" + data['logo1'] + "')");
-  $('#logo2').css("background-image", "url('" + data['logo2'] + "')");
+  controller.atlas.setImage($('#logo1'), data['logo1']);
+  controller.atlas.setImage($('#logo2'), data['logo2']);
   if (data['winner'][0]) {
     $('#team1').removeClass('loser');
     $('#team1').addClass('winner');
@@ -288,7 +295,7 @@ function changeImage(id, new_value) {
     }, "+=0.25");
 
   function _changeImage(object, new_value) {
-    object.css("background-image", "url('" + new_value + "')");
+    controller.atlas.setImage(object, new_value);
   }
 }
 
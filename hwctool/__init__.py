@@ -86,12 +86,11 @@ def initial_download():
     restart_flag = hwctool.tasks.updater.getRestartFlag()
     updater = False
 
+    # Only block if the data is missing, otherwise the version
+    # handler updates the data in the background.
     if hwctool.tasks.updater.needInitialUpdate(version):
         InitialUpdater()
         updater = True
-    elif restart_flag:
-        InitialUpdater(version)
-        updater = True
 
     hwctool.tasks.updater.setRestartFlag(False)
 
@@ -3,21 +3,24 @@ import logging
 import os
 import shutil
 import sys
+import threading
 import webbrowser
 
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtWidgets import QCheckBox, QMessageBox
 
 import hwctool.settings
+import hwctool.tasks.metrics
 import hwctool.tasks.nightbot
 import hwctool.tasks.twitch
 from hwctool.matchdata import matchData
 from hwctool.settings.history import HistoryManager
 from hwctool.settings.placeholders import PlaceholderList
-from hwctool.tasks.auth import AuthThread
 from hwctool.tasks.autorequests import AutoRequestsThread
+from hwctool.tasks.intros import IntroSynthesizer
+from hwctool.tasks.metrics import MetricsThread
+from hwctool.tasks.relay import RelayManager, parsePorts
 from hwctool.tasks.textfiles import TextFilesThread
-from hwctool.tasks.texttospeech import TextToSpeech
 from hwctool.tasks.updater import VersionHandler
 from hwctool.tasks.websocket import WebsocketThread
 from hwctool.view.widgets import ToolUpdater
@@ -32,30 +35,92 @@ class MainController:
     def __init__(self):
         """Init controller and connect them with other modules."""
         try:
+            hwctool.settings.assets.watch()
+            self.metricsThread = MetricsThread(
+                hwctool.settings.config.parser.getint("Metrics", "interval"))
+            self.setMetrics(hwctool.settings.config.parser.getboolean(
+                "Metrics", "active"))
             self.matchData = matchData(self)
-            self.authThread = AuthThread()
-            self.authThread.tokenRecived.connect(self.tokenRecived)
+            self._authThread = None
+            self._tts = None
+            self.introSynthesizer = IntroSynthesizer(lambda: self.tts)
+            self.introSynthesizer.synthesized.connect(
+                self.__introSynthesized)
+            self.__introKey = None
+            self.__introTimer = QTimer()
+            self.__introTimer.setSingleShot(True)
+            self.__introTimer.setInterval(100)
+            self.__introTimer.timeout.connect(self.__updatePlayerIntros)
+            self.__snapshotTimer = QTimer()
+            self.__snapshotTimer.setSingleShot(True)
+            self.__snapshotTimer.setInterval(0)
+            self.__snapshotTimer.timeout.connect(self.publishSnapshots)
+            self._mapIcons = None
+            self.__mapIconsTimer = QTimer()
+            self.__mapIconsTimer.setSingleShot(True)
+            self.__mapIconsTimer.setInterval(0)
+            self.__mapIconsTimer.timeout.connect(self.sendMapIcons)
+            self._mapImages = dict()
+            hwctool.settings.assets.changed.connect(self.__assetsChanged)
+            hwctool.settings.images.variantsChanged.connect(
+                self.__variantsChanged)
             self.textFilesThread = TextFilesThread(self.matchData)
             self.matchData.dataChanged.connect(self.handleMatchDataChange)
             self.matchData.metaChangedSignal.connect(self.matchMetaDataChanged)
+            self.matchData.changeSetCommitted.connect(
+                self.handleMatchChangeSet)
             self.versionHandler = VersionHandler(self)
             self.websocketThread = WebsocketThread(self)
             self.websocketThread.socketConnectionChanged.connect(
                 self.toogleLEDs)
-            self.websocketThread.introShown.connect(self.updatePlayerIntroIdx)
+            self.websocketThread.controlRequested.connect(
+                self.applyControlCommands)
+            hwctool.settings.images.atlasChanged.connect(
+                self.websocketThread.sendAtlas)
+            hwctool.settings.images.atlasChanged.connect(
+                self.updateSnapshots)
             self.runWebsocketThread()
+            self.relayManager = RelayManager()
+            self.runRelays()
             self.autoRequestsThread = AutoRequestsThread(self)
             self.placeholders = self.placeholderSetup()
             self._warning = False
-            self.checkVersion()
+            # Check for updates in the background after the first paint.
+            QTimer.singleShot(1000, self.checkVersion)
             self.historyManager = HistoryManager()
-            self.tts = TextToSpeech()
             self.initPlayerIntroData()
+            self.updateSnapshots()
 
         except Exception as e:
             module_logger.exception("message")
             raise
 
+    def setMetrics(self, active):
+        """Enable or disable the collection of performance metrics."""
+        hwctool.settings.config.parser.set("Metrics", "active", str(active))
+        hwctool.tasks.metrics.enable(active)
+        if active:
+            self.metricsThread.activateTask('export')
+        else:
+            self.metricsThread.deactivateTask('export')
+
+    @property
+    def authThread(self):
+        """Create the auth server on first use."""
+        if self._authThread is None:
+            from hwctool.tasks.auth import AuthThread
+            self._authThread = AuthThread()
+            self._authThread.tokenRecived.connect(self.tokenRecived)
+        return self._authThread
+
+    @property
+    def tts(self):
+        """Load the text-to-speech cache on first use."""
+        if self._tts is None:
+            from hwctool.tasks.texttospeech import TextToSpeech
+            self._tts = TextToSpeech()
+        return self._tts
+
     def checkVersion(self, force=False):
         """Check for new version."""
         try:
@@ -257,6 +322,24 @@ class MainController:
         else:
             module_logger.exception("Thread is still running")
 
+    def runRelays(self):
+        """Start the relays of the browser sources."""
+        try:
+            ports = parsePorts(
+                hwctool.settings.config.parser.get("Relay", "ports"))
+            if not ports:
+                return
+            port = int(hwctool.settings.profileManager.currentID(), 16)
+            if hwctool.settings.config.parser.getboolean("Control", "remote"):
+                host = None
+            else:
+                host = 'localhost'
+            self.relayManager.start('ws://localhost:{}'.format(port), ports,
+                                    host, hwctool.settings.getLogDir(),
+                                    WebsocketThread.getLimits())
+        except Exception as e:
+            module_logger.exception("message")
+
     def stopWebsocketThread(self):
         """Stop websocket thread."""
         try:
@@ -268,10 +351,14 @@ class MainController:
         """Clean up all threads and save config to close program."""
         try:
             module_logger.info("cleanUp called")
-            self.authThread.terminate()
+            if self._authThread is not None:
+                self._authThread.terminate()
             self.stopWebsocketThread()
+            self.relayManager.stop()
             self.textFilesThread.terminate()
             self.autoRequestsThread.terminate()
+            self.metricsThread.terminate()
+            self.introSynthesizer.shutdown()
             if save:
                 self.saveAll()
         except Exception as e:
@@ -282,7 +369,8 @@ class MainController:
         self.matchData.writeJsonFile()
         hwctool.settings.saveNightbotCommands()
         self.historyManager.dumpJson()
-        self.tts.dumpJson()
+        if self._tts is not None:
+            self._tts.dumpJson()
 
     def saveConfig(self):
         """Save the settings to the config file."""
@@ -360,28 +448,25 @@ class MainController:
             self.websocketThread.unregister_hotkeys(force=True)
             self.websocketThread.register_hotkeys()
 
-    def updatePlayerIntroIdx(self):
-        self.__playerIntroIdx = (self.__playerIntroIdx + 1) % 2
-
     def initPlayerIntroData(self):
         """Initalize player intro data."""
         self.__playerIntroData = dict()
-        self.__playerIntroIdx = 0
         for player_idx in range(2):
             data = dict()
             data['name'] = "pressure"
             data['race'] = "Random"
-            data['logo'] = 'src/img/races/Random.png'
+            data['logo'] = hwctool.settings.getRaceImg('Random')
             data['team'] = "Random"
             data['display'] = "block"
             data['color'] = 'red' if player_idx == 0 else 'blue'
             self.__playerIntroData[player_idx] = data
+        self.preparePlayerIntros()
 
     def getPlayerIntroData(self, idx):
         """Return player intro."""
         if idx == -1:
-            idx = self.__playerIntroIdx
-        data = self.__playerIntroData[idx]
+            idx = self.websocketThread.intro_idx
+        data = dict(self.__playerIntroData[idx])
         data['volume'] = hwctool.settings.config.parser.getint(
             "Intros", "sound_volume")
         data['tts_volume'] = hwctool.settings.config.parser.getint(
@@ -396,86 +481,183 @@ class MainController:
                 "Style", "custom_font")
         return data
 
+    def preparePlayerIntros(self, reset=False):
+        """Hand the serialized intros to the websocket thread."""
+        self.websocketThread.setIntroPayloads(
+            {idx: self.getPlayerIntroData(idx) for idx in range(2)}, reset)
+
+    def updateSnapshots(self, *args):
+        """Publish the snapshots after the current changes."""
+        self.__snapshotTimer.start()
+
+    def publishSnapshots(self):
+        """Publish the state of each scope for new browser sources."""
+        try:
+            for scope in self.websocketThread.get_primary_scopes():
+                self.websocketThread.publishSnapshot(
+                    scope, self.getSnapshot(scope))
+        except Exception as e:
+            module_logger.exception("message")
+
+    def getSnapshot(self, scope):
+        """Return the messages that bring a new browser source up to date."""
+        if scope == 'score':
+            return [('LOAD_ATLAS', hwctool.settings.getRaceAtlas()),
+                    ('ALL_DATA', self.matchData.getScoreData())]
+        elif scope == 'intro':
+            return [('LOAD_ATLAS', hwctool.settings.getRaceAtlas())]
+        elif scope == 'mapicons':
+            return [('LOAD_ATLAS', hwctool.settings.getRaceAtlas()),
+                    ('ALL_DATA', self.matchData.getMapIconsData())]
+        return []
+
+    def updateMapIcons(self):
+        """Send the map icons after the current changes."""
+        # Collapse a burst of changes, e.g. of all sets, into one update.
+        self.__mapIconsTimer.start()
+
+    def sendMapIcons(self):
+        """Send the sets of the map icons that changed since the last time.
+
+        All data is sent if the number of sets changed.
+        """
+        try:
+            data = self.matchData.getMapIconsData()
+            previous = self._mapIcons
+            self._mapIcons = data
+            if previous is None or previous.keys() != data.keys():
+                self.websocketThread.sendData2Path(
+                    'mapicons', 'ALL_DATA', data)
+                return
+            changes = {idx: value for idx, value in data.items()
+                       if previous[idx] != value}
+            if changes:
+                self.websocketThread.sendData2Path(
+                    'mapicons', 'CHANGE_SETS', changes)
+        except Exception as e:
+            module_logger.exception("message")
+
     def updatePlayerIntros(self):
-        """Update player intro files."""
+        """Update the player intros after the current changes."""
         if len(self.websocketThread.connected.get('intro', [])) < 1:
             return
+        # Collapse the updates of a burst of changes into one.
+        self.__introTimer.start()
+
+    def __updatePlayerIntros(self):
+        """Update the player intros if their inputs changed."""
+        parser = hwctool.settings.config.parser
+        tts = None
+        if parser.getboolean("Intros", "tts_active"):
+            # Load the cache of the text-to-speech client in this thread.
+            self.tts
+            tts = (parser.get("Intros", "tts_scope"),
+                   parser.get("Intros", "tts_voice"),
+                   parser.getfloat("Intros", "tts_pitch"),
+                   parser.getfloat("Intros", "tts_rate"))
+
+        set_idx = self.matchData.getNextSet(True)
+        players = tuple((self.matchData.getPlayer(player_idx, set_idx),
+                         self.matchData.getRace(player_idx, set_idx))
+                        for player_idx in range(2))
+        settings = tuple(parser.get(section, option) for section, option in
+                         [("Intros", "sound_volume"),
+                          ("Intros", "tts_volume"),
+                          ("Intros", "display_time"),
+                          ("Intros", "animation"),
+                          ("Style", "use_custom_font"),
+                          ("Style", "custom_font")])
+        key = (set_idx, players, tts, settings)
+        if key == self.__introKey:
+            return
+        # The shared hotkey only starts over for a new set or players.
+        reset = self.__introKey is None or self.__introKey[:2] != key[:2]
+        self.__introKey = key
         module_logger.info("updatePlayerIntros")
 
-        tts_active = hwctool.settings.config.parser.getboolean(
-            "Intros", "tts_active")
-        tts_voice = hwctool.settings.config.parser.get(
-            "Intros", "tts_voice")
-        tts_scope = hwctool.settings.config.parser.get(
-            "Intros", "tts_scope")
-        tts_pitch = hwctool.settings.config.parser.getfloat(
-            "Intros", "tts_pitch")
-        tts_rate = hwctool.settings.config.parser.getfloat(
-            "Intros", "tts_rate")
+        for player_idx, (name, race) in enumerate(players):
+            data = self.__playerIntroData[player_idx]
+            data['name'] = name
+            data['team'] = race
+            data['race'] = race
+            data['logo'] = hwctool.settings.getRaceImg(race)
+            data['display'] = "block"
+            data['color'] = 'red' if player_idx == 0 else 'blue'
+            if tts is None:
+                data['tts'] = None
+            else:
+                data['tts'] = self.introSynthesizer.get(
+                    (player_idx, name, race) + tts)
 
-        set_idx = name = self.matchData.getNextSet(True)
+        self.preparePlayerIntros(reset)
 
-        for player_idx in range(2):
-            name = self.matchData.getPlayer(player_idx, set_idx)
-            race = self.matchData.getRace(player_idx, set_idx)
-            self.__playerIntroData[player_idx]['name'] = name
-            self.__playerIntroData[player_idx]['team'] = race
-            self.__playerIntroData[player_idx]['race'] = race
-            file = 'src/img/races/{}.png'
-            self.__playerIntroData[player_idx]['logo'] = \
-                file.format(race.replace(' ', '_'))
-            self.__playerIntroData[player_idx]['display'] = "block"
-            self.__playerIntroData[player_idx]['color'] = \
-                'red' if player_idx == 0 else 'blue'
-            self.__playerIntroIdx = 0
-
-            try:
-                if tts_active:
-                    text = self.tts.getLine(tts_scope, name, race, player_idx)
-                    tts_file = os.path.join("..", self.tts.synthesize(
-                        text, tts_voice,
-                        tts_pitch, tts_rate)).replace('\\', '/')
-                else:
-                    tts_file = None
-                self.__playerIntroData[player_idx]['tts'] = tts_file
+    def __introSynthesized(self, key, file):
+        """Add a synthesized line to the intros if it is still current."""
+        if self.__introKey is None or self.__introKey[2] is None:
+            return
+        player_idx, name, race = key[:3]
+        if (self.__introKey[1][player_idx] != (name, race) or
+                self.__introKey[2] != key[3:]):
+            return
+        self.__playerIntroData[player_idx]['tts'] = file or None
+        self.preparePlayerIntros()
+
+    def __assetsChanged(self, scope):
+        if scope == 'maps':
+            self._mapImages = dict()
 
-            except Exception as e:
-                self.__playerIntroData[player_idx]['tts'] = None
-                module_logger.exception("message")
+    def __variantsChanged(self, scope):
+        """Point the browser sources to the new image variants."""
+        if scope == 'maps':
+            self._mapImages = dict()
+        self.updateMapIcons()
+        self.updateSnapshots()
 
     def getMapImg(self, map, fullpath=False):
-        """Get map image from map name."""
+        """Get map image from map name.
+
+        Only the GUI thread caches the lookups and reports missing maps,
+        other threads, e.g. readers of the match data, only look up.
+        """
         if map == 'TBD':
             return map
-        mapdir = hwctool.settings.getAbsPath(
-            hwctool.settings.casting_html_dir)
-        mapimg = os.path.normpath(os.path.join(
-            mapdir, "src/img/maps", map.replace(" ", "_")))
-        mapimg = os.path.basename(self.linkFile(mapimg))
+        # The lookups are cached until the maps of the profile change.
+        key = (map, fullpath)
+        mapimg = self._mapImages.get(key)
+        if mapimg is not None:
+            return mapimg
+        gui = threading.current_thread() is threading.main_thread()
+        mapimg = hwctool.settings.assets.find('maps', map)
         if not mapimg:
             mapimg = "TBD"
-            self.displayWarning(_("Warning: Map '{}' not found!").format(map))
+            if gui and hwctool.settings.assets.reportMissing('maps', map):
+                self.displayWarning(
+                    _("Warning: Map '{}' not found!").format(map))
 
         if(fullpath):
-            return os.path.normpath(os.path.join(
-                mapdir, "src/img/maps", mapimg))
+            mapimg = os.path.normpath(os.path.join(
+                hwctool.settings.assets.getDir('maps'), mapimg))
         else:
-            return mapimg
+            mapimg = hwctool.settings.images.getURL('maps', map, 'TBD')
+        if gui:
+            self._mapImages[key] = mapimg
+        return mapimg
 
     def addMap(self, file, mapname):
         """Add a new map via file and name."""
         _, ext = os.path.splitext(file)
-        mapdir = hwctool.settings.getAbsPath(
-            hwctool.settings.casting_html_dir)
+        mapdir = hwctool.settings.assets.getDir('maps')
         map = mapname.strip().replace(" ", "_") + ext.lower()
-        newfile = os.path.normpath(os.path.join(mapdir, "src/img/maps", map))
+        newfile = os.path.normpath(os.path.join(mapdir, map))
         shutil.copy(file, newfile)
+        hwctool.settings.assets.update('maps')
         if mapname not in hwctool.settings.maps:
             hwctool.settings.maps.append(mapname)
 
     def deleteMap(self, map):
         """Delete map and file."""
         os.remove(self.getMapImg(map, True))
+        hwctool.settings.assets.update('maps')
         hwctool.settings.maps.remove(map)
 
     def swapTeams(self):
@@ -483,6 +665,51 @@ class MainController:
             self.matchData.swapTeams()
             self.updateForms()
 
+    def setMapScore(self, set_idx, value, allkill=True):
+        """Set a map score and move the winner in the allkill format.
+
+        Returns True if a player was moved to the next set.
+        """
+        with self.matchData.transaction():
+            self.matchData.setMapScore(set_idx, value, True)
+            return bool(allkill and self.matchData.allkillUpdate())
+
+    def applyControlCommands(self, commands):
+        """Apply a batch of remote control commands to the match data."""
+        try:
+            with self.view.tlock:
+                with self.matchData.transaction():
+                    for command in commands:
+                        self.applyControlCommand(**command)
+                self.updateForms()
+        except Exception as e:
+            module_logger.exception("message")
+
+    def applyControlCommand(self, command, set_idx=0, team_idx=0,
+                            value=None, race=False):
+        """Apply a single remote control command to the match data."""
+        if command == 'score':
+            self.setMapScore(set_idx, value)
+        elif command in ['player', 'race']:
+            if set_idx == 0 and self.matchData.getSolo():
+                set_indices = range(self.matchData.getNoSets())
+            else:
+                set_indices = [set_idx]
+            for idx in set_indices:
+                if command == 'player':
+                    self.matchData.setPlayer(team_idx, idx, value, race)
+                else:
+                    self.matchData.setRace(team_idx, idx, value)
+            self.historyManager.insertPlayer(
+                self.matchData.getPlayer(team_idx, set_idx),
+                self.matchData.getRace(team_idx, set_idx))
+        elif command == 'team':
+            self.matchData.setTeam(team_idx, value)
+        elif command == 'league':
+            self.matchData.setLeague(value)
+        elif command == 'swap':
+            self.matchData.swapTeams()
+
     def displayWarning(self, msg="Warning: Something went wrong..."):
         """Display a warning in status bar."""
         msg = _(msg)
@@ -510,9 +737,38 @@ class MainController:
     def matchMetaDataChanged(self):
         data = self.matchData.getScoreData()
         self.websocketThread.sendData2Path("score", "ALL_DATA", data)
+        self.updateMapIcons()
         self.updatePlayerIntros()
+        self.updateSnapshots()
 
     def handleMatchDataChange(self, label, object):
+        if self.__sendMatchDataChange(label, object):
+            self.updatePlayerIntros()
+        self.updateMapIcons()
+        self.updateSnapshots()
+
+    def handleMatchChangeSet(self, changes):
+        """Send a change set of the match data at once."""
+        if 'meta' in changes or len(changes) > 2:
+            # A single message with all data is cheaper than the
+            # messages of many changes.
+            self.matchMetaDataChanged()
+            return
+        updateIntros = False
+        for label, object in changes.items():
+            if self.__sendMatchDataChange(label, object):
+                updateIntros = True
+        if updateIntros:
+            self.updatePlayerIntros()
+        self.updateMapIcons()
+        self.updateSnapshots()
+
+    def __sendMatchDataChange(self, label, object):
+        """Send a change to the browser sources.
+
+        Returns if the player intros have to be updated.
+        """
+        updateIntros = False
         if label == 'team':
             if not self.matchData.getSolo():
                 self.websocketThread.sendData2Path(
@@ -536,16 +792,14 @@ class MainController:
 
             set_idx = self.matchData.getNextSet(True)
 
-            file = 'src/img/races/{}.png'
-
             for idx in range(1):
-                img = file.format(self.matchData.getRace(
-                    idx, set_idx).replace(' ', '_'))
+                img = hwctool.settings.getRaceImg(
+                    self.matchData.getRace(idx, set_idx))
                 self.websocketThread.sendData2Path(
                     'score', 'CHANGE_IMAGE',
                     {'id': 'logo{}'.format(idx + 1), 'img': img})
 
-            self.updatePlayerIntros()
+            updateIntros = True
         elif label == 'color':
             for idx in range(2):
                 self.websocketThread.sendData2Path(
@@ -562,22 +816,23 @@ class MainController:
                     {'id': 'team{}'.format(object['team_idx'] + 1),
                      'text': object['value']})
             if object['set_idx'] == self.matchData.getNextSet(True):
-                self.updatePlayerIntros()
+                updateIntros = True
         elif label == 'race':
 
             set_idx = self.matchData.getNextSet(True)
 
             if object['set_idx'] == set_idx:
-                self.updatePlayerIntros()
-                file = 'src/img/races/{}.png'
+                updateIntros = True
 
                 for idx in range(2):
-                    img = file.format(self.matchData.getRace(
-                        idx, set_idx).replace(' ', '_'))
+                    img = hwctool.settings.getRaceImg(
+                        self.matchData.getRace(idx, set_idx))
                     self.websocketThread.sendData2Path(
                         'score', 'CHANGE_IMAGE',
                         {'id': 'logo{}'.format(idx + 1), 'img': img})
 
+        return updateIntros
+
     def newVersion(self, version, force=False):
         """Display dialog for new version."""
         prompt = force or hwctool.settings.config.parser.getboolean(
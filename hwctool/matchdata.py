@@ -1,50 +1,130 @@
 """Matchdata."""
 import difflib
+import functools
 import json
 import logging
 import re
+import threading
+import time
+from contextlib import contextmanager
 
 from PyQt5.QtCore import QObject, pyqtSignal
 
 import hwctool.settings
+import hwctool.tasks.metrics as metrics
 
 # create logger
 module_logger = logging.getLogger('hwctool.matchdata')
 
 
+def mutator(method):
+    """Change the match data under the lock of the instance."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.dataLock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
 class matchData(QObject):
     """Matchdata."""
     dataChanged = pyqtSignal(str, object)
     metaChangedSignal = pyqtSignal()
+    changeSetCommitted = pyqtSignal(object)
 
     def __init__(self, controller):
         """Init and define custom providers."""
         super().__init__()
         self.__rawData = None
         self.__controller = controller
+        self.dataLock = DataLock()
         self.__initData()
 
         self.emitLock = EmitLock()
+        self.__transaction = Transaction()
 
     def __emitSignal(self, scope, name='', data=None):
-        if not self.emitLock.locked():
-            if scope == 'data':
-                self.dataChanged.emit(name, data)
-            elif scope == 'meta':
-                self.metaChangedSignal.emit()
-            elif scope == 'outcome':
-                self.dataChanged.emit('outcome', self.getWinner())
-                for idx in range(self.getNoSets()):
-                    if self.getMapScore(idx) == 0:
-                        colorData = self.getColorData(idx)
-                        self.__emitSignal(
-                            'data', 'color', {
-                                'set_idx': idx,
-                                'score_color': colorData["score_color"],
-                                'border_color': colorData["border_color"],
-                                'hide': colorData["hide"],
-                                'opacity': colorData["opacity"]})
-
+        if self.emitLock.locked():
+            return
+        changes = self.__transaction.changes
+        if changes is not None:
+            changes.add(scope, name, data)
+            return
+        # The slots run after the change, when the lock is released.
+        self.dataLock.defer(self.__emit, scope, name, data)
+
+    def __emit(self, scope, name, data):
+        start = metrics.clock()
+        if scope == 'data':
+            self.dataChanged.emit(name, data)
+        elif scope == 'meta':
+            self.metaChangedSignal.emit()
+        elif scope == 'outcome':
+            self.__emitOutcome()
+        if start:
+            metrics.stop('signal.' + (name or scope), start)
+
+    def __emitOutcome(self):
+        self.__emitSignal('data', 'outcome', self.getWinner())
+        for idx in range(self.getNoSets()):
+            if self.getMapScore(idx) == 0:
+                colorData = self.getColorData(idx)
+                self.__emitSignal(
+                    'data', 'color', {
+                        'set_idx': idx,
+                        'score_color': colorData["score_color"],
+                        'border_color': colorData["border_color"],
+                        'hide': colorData["hide"],
+                        'opacity': colorData["opacity"]})
+
+    @contextmanager
+    def transaction(self):
+        """Collect all changes and emit them as one change set.
+
+        Transactions can be nested, the change set is emitted by
+        changeSetCommitted when the outermost transaction ends. Each
+        thread has its own transaction, the changes of other threads are
+        not collected.
+        """
+        transaction = self.__transaction
+        if transaction.depth == 0:
+            transaction.changes = ChangeSet()
+        transaction.depth += 1
+        try:
+            yield transaction.changes
+        finally:
+            transaction.depth -= 1
+            if transaction.depth == 0:
+                self.__commit()
+
+    def read(self, func, *args):
+        """Call a function that reads the match data from any thread.
+
+        The function sees the data between two changes, but it might be
+        called more than once and must not have side effects.
+        """
+        return self.dataLock.read(func, *args)
+
+    def getVersion(self):
+        """Return the version of the data, it is odd during a change."""
+        return self.dataLock.version
+
+    def __commit(self):
+        changes = self.__transaction.changes
+        if changes.outcome:
+            # Evaluate the outcome once for the final state.
+            self.__emitOutcome()
+        self.__transaction.changes = None
+        if changes:
+            self.dataLock.defer(self.__emitChangeSet, changes)
+
+    def __emitChangeSet(self, changes):
+        start = metrics.clock()
+        self.changeSetCommitted.emit(changes)
+        if start:
+            metrics.stop('signal.change_set', start)
+
+    @mutator
     def readJsonFile(self):
         """Read json data from file."""
         try:
@@ -92,6 +172,7 @@ class matchData(QObject):
         self.__data['sets'] = []
         self.__data['players'] = [[], []]
 
+    @mutator
     def swapTeams(self):
         module_logger.info("Swapping teams")
         self.__data['swapped'] = not self.__data.get('swapped', False)
@@ -114,9 +195,11 @@ class matchData(QObject):
     def isSwapped(self):
         return bool(self.__data.get('swapped', False))
 
+    @mutator
     def resetSwap(self):
         self.__data['swapped'] = False
 
+    @mutator
     def setMinSets(self, minSets):
         """Set minium number of sets that are played."""
         if(minSets > 0):
@@ -134,20 +217,23 @@ class matchData(QObject):
         except Exception:
             return 0
 
+    @mutator
     def setSolo(self, solo):
         """Set allkill format."""
         self.__data['solo'] = bool(solo)
 
         if self.__data['solo']:
-            for set_idx in range(self.getNoSets()):
-                for team_idx in range(2):
-                    self.setPlayer(team_idx, set_idx,
-                                   self.getPlayer(team_idx, 0))
+            with self.transaction():
+                for set_idx in range(self.getNoSets()):
+                    for team_idx in range(2):
+                        self.setPlayer(team_idx, set_idx,
+                                       self.getPlayer(team_idx, 0))
 
     def getSolo(self):
         """Check if format is solo (or team)."""
         return bool(self.__data['solo'])
 
+    @mutator
     def setAllKill(self, allkill):
         """Set allkill format."""
         self.__data['allkill'] = bool(allkill)
@@ -156,6 +242,7 @@ class matchData(QObject):
         """Check if format is allkill."""
         return bool(self.__data['allkill'])
 
+    @mutator
     def allkillUpdate(self):
         """Move the winner to the next set in case of allkill format."""
         if(not self.getAllKill()):
@@ -179,6 +266,7 @@ class matchData(QObject):
 
         return False
 
+    @mutator
     def setCustom(self, bestof, allkill=False, solo=True):
         """Set a custom match format."""
         bestof = int(bestof)
@@ -188,16 +276,18 @@ class matchData(QObject):
         else:
             no_sets = bestof + 1 - bestof % 2
 
-        self.setNoSets(no_sets, bestof)
-        self.resetLabels()
-        self.setAllKill(allkill)
-        self.setID(0)
-        self.setURL("")
-        self.setSolo(solo)
+        with self.transaction():
+            self.setNoSets(no_sets, bestof)
+            self.resetLabels()
+            self.setAllKill(allkill)
+            self.setID(0)
+            self.setURL("")
+            self.setSolo(solo)
 
+    @mutator
     def resetData(self, reset_options=True):
         """Reset all data to default values."""
-        with self.emitLock():
+        with self.transaction():
             for team_idx in range(2):
                 for set_idx in range(self.getNoSets()):
                     self.setPlayer(team_idx, set_idx, "TBD", "Random")
@@ -213,8 +303,9 @@ class matchData(QObject):
             if reset_options:
                 self.setAllKill(False)
                 self.setSolo(True)
-        self.__emitSignal('meta')
+            self.__emitSignal('meta')
 
+    @mutator
     def resetLabels(self):
         """Reset the map labels."""
         best_of = self.__data['best_of']
@@ -242,6 +333,7 @@ class matchData(QObject):
                     self.setLabel(set_idx, "Ace Map " +
                                   str(set_idx - ace_start + 1))
 
+    @mutator
     def setNoSets(self, no_sets=5, bestof=False, resetPlayers=False):
         """Set the number of sets/maps."""
         try:
@@ -306,6 +398,7 @@ class matchData(QObject):
         except Exception as e:
             module_logger.exception("message")
 
+    @mutator
     def setMyTeam(self, myteam, swap=False):
         """Set "my team"."""
         if(isinstance(myteam, str)):
@@ -359,6 +452,7 @@ class matchData(QObject):
         except Exception:
             return 0
 
+    @mutator
     def setMap(self, set_idx, map="TBD"):
         """Set the map of a set."""
         try:
@@ -451,6 +545,7 @@ class matchData(QObject):
         else:
             return 1
 
+    @mutator
     def setMapScore(self, set_idx, score, overwrite=False, applySwap=False):
         """Set the score of a set."""
         try:
@@ -528,6 +623,7 @@ class matchData(QObject):
 
         return player
 
+    @mutator
     def setPlayer(self, team_idx, set_idx, name="TBD", race=False):
         """Set the player of a set."""
         try:
@@ -571,6 +667,7 @@ class matchData(QObject):
         except Exception:
             return False
 
+    @mutator
     def setRace(self, team_idx, set_idx, race="Random"):
         """Set a players race."""
         try:
@@ -602,6 +699,7 @@ class matchData(QObject):
         except Exception:
             return False
 
+    @mutator
     def setAce(self, set_idx, ace):
         """Label set as ace."""
         ace = bool(ace)
@@ -621,6 +719,7 @@ class matchData(QObject):
         except Exception:
             return False
 
+    @mutator
     def setLabel(self, set_idx, label):
         """Set a map label."""
         try:
@@ -643,6 +742,7 @@ class matchData(QObject):
         except Exception:
             return False
 
+    @mutator
     def setTeam(self, team_idx, name, tag=False):
         """Set a team name."""
         if team_idx not in range(2):
@@ -673,6 +773,7 @@ class matchData(QObject):
         else:
             return self.getTeam(team_idx)
 
+    @mutator
     def setTeamTag(self, team_idx, tag):
         """Set team tag."""
         if team_idx not in range(2):
@@ -695,6 +796,7 @@ class matchData(QObject):
         else:
             return self.getTeam(team_idx)
 
+    @mutator
     def setID(self, id):
         """Set match id."""
         self.__data['id'] = int(id)
@@ -704,6 +806,7 @@ class matchData(QObject):
         """Get match id."""
         return int(self.__data['id'])
 
+    @mutator
     def setLeague(self, league):
         """Set league."""
         league = str(league)
@@ -716,6 +819,7 @@ class matchData(QObject):
         """Get league."""
         return self.__data['league']
 
+    @mutator
     def setURL(self, url):
         """Set URL."""
         self.__data['matchlink'] = str(url)
@@ -884,9 +988,8 @@ class matchData(QObject):
         idx = self.getNextSet()
         if idx == -1:
             idx = self.getNoSets() - 1
-        file = 'src/img/races/{}.png'
-        data['logo1'] = file.format(self.getRace(0, idx).replace(' ', '_'))
-        data['logo2'] = file.format(self.getRace(1, idx).replace(' ', '_'))
+        data['logo1'] = hwctool.settings.getRaceImg(self.getRace(0, idx))
+        data['logo2'] = hwctool.settings.getRaceImg(self.getRace(1, idx))
 
         return data
 
@@ -962,37 +1065,35 @@ class matchData(QObject):
             score = [0, 0]
 
             hide_scoreicon = team == 0
+            # The options are read once for all sets.
+            options = {option: hwctool.settings.config.parser.get(
+                "MapIcons", option) for option in [
+                    'notplayed_color', 'notplayed_opacity', 'win_color',
+                    'lose_color', 'default_border_color',
+                    'undecided_color']}
+            threshold = int(self.getBestOf() / 2)
+            min_sets = self.getMinSets()
+            logos = dict()
 
             for i in range(self.getNoSets()):
                 winner = self.getMapScore(i)
                 won = winner * team
                 opacity = 0.0
 
-                threshold = int(self.getBestOf() / 2)
-
-                if(max(score) > threshold and i >= self.getMinSets()):
-                    border_color = hwctool.settings.config.parser.get(
-                        "MapIcons", "notplayed_color")
-                    score_color = hwctool.settings.config.parser.get(
-                        "MapIcons", "notplayed_color")
-                    opacity = hwctool.settings.config.parser.get(
-                        "MapIcons", "notplayed_opacity")
+                if(max(score) > threshold and i >= min_sets):
+                    border_color = options['notplayed_color']
+                    score_color = options['notplayed_color']
+                    opacity = options['notplayed_opacity']
                     winner = 0
                 elif(won == 1):
-                    border_color = hwctool.settings.config.parser.get(
-                        "MapIcons", "win_color")
-                    score_color = hwctool.settings.config.parser.get(
-                        "MapIcons", "win_color")
+                    border_color = options['win_color']
+                    score_color = options['win_color']
                 elif(won == -1):
-                    border_color = hwctool.settings.config.parser.get(
-                        "MapIcons", "lose_color")
-                    score_color = hwctool.settings.config.parser.get(
-                        "MapIcons", "lose_color")
+                    border_color = options['lose_color']
+                    score_color = options['lose_color']
                 else:
-                    border_color = hwctool.settings.config.parser.get(
-                        "MapIcons", "default_border_color")
-                    score_color = hwctool.settings.config.parser.get(
-                        "MapIcons", "undecided_color")
+                    border_color = options['default_border_color']
+                    score_color = options['undecided_color']
 
                 if(winner == -1):
                     player1status = 'winner'
@@ -1009,10 +1110,15 @@ class matchData(QObject):
                 data = dict()
                 data['player1'] = self.getPlayer(0, i)
                 data['player2'] = self.getPlayer(1, i)
-                data['race1'] = self.getRace(0, i).lower()
-                data['race2'] = self.getRace(1, i).lower()
-                data['map_img'] = self.__controller.getMapImg(self.getMap(i))
-                data['mapname'] = self.getMap(i)
+                for idx in range(2):
+                    race = self.getRace(idx, i)
+                    if race not in logos:
+                        logos[race] = hwctool.settings.getRaceImg(race)
+                    data['race{}'.format(idx + 1)] = race.lower()
+                    data['logo{}'.format(idx + 1)] = logos[race]
+                map = self.getMap(i)
+                data['map_img'] = self.__controller.getMapImg(map)
+                data['mapname'] = map
                 data['maplabel'] = self.getLabel(i)
                 data['score_color'] = score_color
                 data['border_color'] = border_color
@@ -1028,6 +1134,7 @@ class matchData(QObject):
 
         return websocket_data
 
+    @mutator
     def autoSetMyTeam(self, swap=False):
         """Try to set team via fav teams."""
         try:
@@ -1081,6 +1188,52 @@ def getRace(str):
         return "Random"
 
 
+class ChangeSet():
+    """Record the changes of a transaction of the match data."""
+
+    def __init__(self):
+        self.keys = set()
+        self.outcome = False
+        self.__changes = dict()
+
+    def add(self, scope, name='', data=None):
+        """Record a change, a later change of the same item replaces it."""
+        if scope == 'outcome':
+            self.outcome = True
+            return
+        if scope == 'meta':
+            self.keys.add('meta')
+            return
+        self.keys.add(name)
+        key = (name,)
+        if isinstance(data, dict):
+            key += tuple(data.get(item) for item in
+                         ['idx', 'team_idx', 'set_idx'])
+        # Move the key to the end to keep the order of the last changes.
+        self.__changes.pop(key, None)
+        self.__changes[key] = data
+
+    def items(self):
+        """Return the changes as (name, data) in order."""
+        return [(key[0], data) for key, data in self.__changes.items()]
+
+    def __contains__(self, name):
+        return name in self.keys
+
+    def __bool__(self):
+        return bool(self.keys) or self.outcome
+
+    def __len__(self):
+        return len(self.__changes)
+
+
+class Transaction(threading.local):
+    """The open transaction of the match data in a thread."""
+
+    depth = 0
+    changes = None
+
+
 class EmitLock():
     def __init__(self):
         self.__locked = False
@@ -1103,3 +1256,79 @@ class EmitLock():
 
     def locked(self):
         return bool(self.__locked)
+
+
+class DataLock():
+    """Versioned lock of the match data.
+
+    Writers hold the lock and the version is odd while they change the
+    data. Readers of other threads do not wait for the lock, they retry
+    if the version has changed during the read and take the lock only
+    after some failed attempts. Signals of a change are deferred until
+    the lock is released, such that no slot runs while it is held.
+    """
+
+    def __init__(self, retries=4):
+        self.__lock = threading.RLock()
+        self.__owner = None
+        self.__depth = 0
+        self.__deferred = []
+        self.retries = retries
+        self.version = 0
+
+    def __enter__(self):
+        self.__lock.acquire()
+        self.__depth += 1
+        if self.__depth == 1:
+            self.__owner = threading.get_ident()
+            self.version += 1
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.__depth -= 1
+        if self.__depth:
+            self.__lock.release()
+            return
+        self.version += 1
+        self.__owner = None
+        deferred, self.__deferred = self.__deferred, []
+        self.__lock.release()
+        for func, args in deferred:
+            try:
+                func(*args)
+            except Exception as e:
+                module_logger.exception("message")
+
+    def holds(self):
+        """Check if the current thread is changing the data."""
+        return self.__owner == threading.get_ident()
+
+    def defer(self, func, *args):
+        """Call a function after the current change."""
+        if self.holds():
+            self.__deferred.append((func, args))
+        else:
+            func(*args)
+
+    def read(self, func, *args):
+        """Return the result of a function that read a consistent state."""
+        if self.holds():
+            return func(*args)
+        for attempt in range(self.retries):
+            version = self.version
+            if not version % 2:
+                try:
+                    result = func(*args)
+                except Exception:
+                    # Might be caused by a change, raise it only if not.
+                    if self.version == version:
+                        raise
+                else:
+                    if self.version == version:
+                        return result
+            metrics.count('matchdata.retries')
+            # Release the interpreter to the writer.
+            time.sleep(0)
+        metrics.count('matchdata.locked_reads')
+        with self.__lock:
+            return func(*args)
@@ -8,10 +8,14 @@ import time
 
 import appdirs
 
+from hwctool.settings.assetIndex import AssetIndex
 from hwctool.settings.client_config import ClientConfig
 from hwctool.settings.config import init as initConfig
+from hwctool.settings.imageCache import ImageCache
+from hwctool.settings.logfiles import cleanUp as cleanUpLogs
 from hwctool.settings.profileManager import ProfileManager
 from hwctool.settings.safeGuard import SafeGuard
+from hwctool.settings.styleRegistry import StyleRegistry
 
 module_logger = logging.getLogger('hwctool.settings')
 
@@ -39,6 +43,26 @@ this.profileManager = ProfileManager()
 this.maps = []
 this.nightbot_commands = dict()
 this.safe = SafeGuard()
+this.assets = AssetIndex()
+this.assets.addScope('maps', casting_html_dir + '/src/img/maps',
+                     ['.jpg', '.png'])
+this.assets.addScope('races', casting_html_dir + '/src/img/races',
+                     ['.png', '.jpg', '.jpeg'])
+this.assets.addScope('logos', logosDir, ['.png', '.jpg', '.jpeg'])
+this.assets.addScope('styles/score', casting_html_dir + '/src/css/score',
+                     ['.css'])
+this.assets.addScope('styles/intro', casting_html_dir + '/src/css/intro',
+                     ['.css'])
+this.assets.addScope('styles/mapicons',
+                     casting_html_dir + '/src/css/mapicons', ['.css'])
+this.styles = StyleRegistry(this.assets)
+this.styles.addScope('score')
+this.styles.addScope('intro')
+this.styles.addScope('mapicons')
+this.images = ImageCache(this.assets, casting_html_dir, 'src/img/cache')
+this.images.addScope('races', 360, 360)
+this.images.addScope('maps', 640, 360)
+this.images.addScope('logos', 360, 360)
 
 
 def loadSettings():
@@ -60,6 +84,7 @@ def loadSettings():
     if not os.path.exists(getAbsPath(ttsDir)):
         os.makedirs(getAbsPath(ttsDir))
 
+    this.assets.rebuild()
     loadRaceList()
 
     # Create a symnolic link to the profiles directory
@@ -106,12 +131,8 @@ def getLogFile():
     if not os.path.exists(logdir):
         os.makedirs(logdir)
     else:
-        # Delete old logfiles
-        for f in os.listdir(logdir):
-            full = os.path.join(logdir, f)
-            if (os.path.isfile(full) and
-                    os.stat(full).st_mtime < time.time() - 7 * 86400):
-                os.remove(full)
+        # Delete old logfiles in the background
+        cleanUpLogs(logdir)
 
     filename = 'scct-{}-{}.log'.format(time.strftime(
         "%Y%m%d-%H%M%S"), this.profileManager._current)
@@ -123,6 +144,29 @@ def getLogDir():
         ClientConfig.APP_NAME, ClientConfig.COMPANY_NAME)
 
 
+def getBrowserSourceURL(file):
+    """Link to a browser source served by the websocket server."""
+    port = int(this.profileManager.currentID(), 16)
+    return 'http://localhost:{}/{}'.format(port, file.replace('\\', '/'))
+
+
+def getRaceImg(race):
+    """Link to the optimized race logo relative to the casting html."""
+    return this.images.getURL(
+        'races', race,
+        'src/img/races/{}.png'.format(race.replace(' ', '_')))
+
+
+def getRaceAtlas():
+    """Return the race logo atlas keyed by the links of the race logos."""
+    atlas = this.images.getAtlas('races')
+    if not atlas:
+        return dict()
+    sprites = {getRaceImg(race): sprite
+               for race, sprite in atlas['sprites'].items()}
+    return dict(atlas, sprites=sprites)
+
+
 def getAbsPath(file):
     """Link to absolute path of a file."""
 
@@ -168,18 +212,15 @@ def idx2race(idx):
         return races[0]
 
 
-def loadRaceList():
-    """Load races from dir."""
-    try:
-        racedir = os.path.normpath(os.path.join(
-            getAbsPath(casting_html_dir), "src/img/races"))
-
-        for fname in os.listdir(racedir):
-            full_fname = os.path.join(racedir, fname)
-            name, ext = os.path.splitext(fname)
-            if os.path.isfile(full_fname) and ext in ['.jpg', '.jpeg', '.png']:
-                mapName = name.replace('_', " ")
-                if mapName not in this.races:
-                    this.races.append(mapName)
-    except FileNotFoundError:
-        pass
+def loadRaceList(scope='races'):
+    """Load races from the asset index."""
+    if scope != 'races':
+        return
+    for race in this.assets.names('races'):
+        if race not in this.races:
+            this.races.append(race)
+    # Regenerate the sprite atlas of the browser sources if needed.
+    this.images.getAtlas('races')
+
+
+this.assets.changed.connect(loadRaceList)
@@ -0,0 +1,112 @@
+"""Provide an in-memory index of the assets of a profile."""
+import logging
+import os
+
+from PyQt5.QtCore import QFileSystemWatcher, QObject, pyqtSignal
+
+module_logger = logging.getLogger(
+    'hwctool.settings.assetIndex')  # create logger
+
+
+class AssetIndex(QObject):
+    """Index maps, races, logos and styles of the current profile."""
+
+    changed = pyqtSignal(str)
+
+    def __init__(self):
+        """Init the index."""
+        super().__init__()
+        self.__scopes = dict()
+        self.__index = dict()
+        self.__paths = dict()
+        self.__missing = set()
+        self.__watcher = None
+
+    def addScope(self, scope, directory, extensions):
+        """Add a directory (relative to the profile) to the index."""
+        self.__scopes[scope] = (directory, [ext.lower()
+                                            for ext in extensions])
+        self.__index[scope] = dict()
+
+    def getDir(self, scope):
+        """Return the absolute directory of a scope."""
+        from hwctool.settings import getAbsPath
+        return getAbsPath(self.__scopes[scope][0])
+
+    def rebuild(self):
+        """Rebuild the index of all scopes."""
+        self.__paths = dict()
+        for scope in self.__scopes:
+            self.__paths[os.path.normpath(self.getDir(scope))] = scope
+            self.update(scope)
+        if self.__watcher is not None:
+            self.watch()
+
+    def update(self, scope):
+        """Rescan the directory of a scope."""
+        directory, extensions = self.__scopes[scope]
+        index = dict()
+        try:
+            for fname in sorted(os.listdir(self.getDir(scope))):
+                name, ext = os.path.splitext(fname)
+                if ext.lower() not in extensions:
+                    continue
+                key = self.key(name)
+                if key in index and self.__rank(scope, index[key]) <=\
+                        self.__rank(scope, fname):
+                    continue
+                index[key] = fname
+        except FileNotFoundError:
+            pass
+
+        self.__index[scope] = index
+        self.__missing = {item for item in self.__missing
+                          if item[0] != scope}
+        self.changed.emit(scope)
+
+    def __rank(self, scope, fname):
+        _, ext = os.path.splitext(fname)
+        return self.__scopes[scope][1].index(ext.lower())
+
+    def watch(self):
+        """Keep the index fresh via a file system watcher."""
+        if self.__watcher is None:
+            self.__watcher = QFileSystemWatcher()
+            self.__watcher.directoryChanged.connect(self.__directoryChanged)
+        elif self.__watcher.directories():
+            self.__watcher.removePaths(self.__watcher.directories())
+        paths = [path for path in self.__paths if os.path.isdir(path)]
+        if paths:
+            self.__watcher.addPaths(paths)
+
+    def __directoryChanged(self, path):
+        scope = self.__paths.get(os.path.normpath(path))
+        if scope is not None:
+            module_logger.info('Assets of %s changed.', scope)
+            self.update(scope)
+
+    def key(self, name):
+        """Normalize a name to an index key."""
+        return name.replace('_', ' ').strip().lower()
+
+    def find(self, scope, name):
+        """Return the file name of an asset or an empty string."""
+        return self.__index.get(scope, dict()).get(self.key(name), '')
+
+    def names(self, scope):
+        """Return the display names of all assets of a scope."""
+        return [os.path.splitext(fname)[0].replace('_', ' ')
+                for fname in self.__index.get(scope, dict()).values()]
+
+    def files(self, scope):
+        """Return the file names of all assets of a scope."""
+        return list(self.__index.get(scope, dict()).values())
+
+    def reportMissing(self, scope, name):
+        """Return True only the first time an asset is reported missing."""
+        item = (scope, self.key(name))
+        if item in self.__missing:
+            return False
+        self.__missing.add(item)
+        module_logger.warning("Asset '%s' of %s not found.", name, scope)
+        return True
@@ -2,6 +2,7 @@
 import configparser
 import logging
 import sys
+from uuid import uuid4
 
 module_logger = logging.getLogger('hwctool.settings.config')  # create logger
 
@@ -106,9 +107,12 @@ def setDefaultConfigAll():
     setDefaultConfig("MapIcons", "lose_color", "#f22200")
     setDefaultConfig("MapIcons", "undecided_color", "#aaaaaa")
     setDefaultConfig("MapIcons", "notplayed_color", "#aaaaaa")
+    setDefaultConfig("MapIcons", "notplayed_opacity", "0.4")
+    setDefaultConfig("MapIcons", "default_border_color", "#aaaaaa")
 
     setDefaultConfig("Style", "score", "Default")
     setDefaultConfig("Style", "intro", "Default")
+    setDefaultConfig("Style", "mapicons", "Default")
     setDefaultConfig("Style", "use_custom_font", "False")
     setDefaultConfig("Style", "custom_font", "Verdana")
 
@@ -125,6 +129,23 @@ def setDefaultConfigAll():
     setDefaultConfig("Intros", "tts_pitch", "0.0")
     setDefaultConfig("Intros", "tts_rate", "1.0")
 
+    setDefaultConfig("Control", "active", "False")
+    setDefaultConfig("Control", "remote", "False")
+    setDefaultConfig("Control", "token", "", lambda: uuid4().hex)
+
+    setDefaultConfig("Metrics", "active", "False")
+    setDefaultConfig("Metrics", "interval", "10")
+
+    setDefaultConfig("Relay", "ports", "")
+
+    setDefaultConfig("Websocket", "compression", "True")
+    setDefaultConfig("Websocket", "window_bits", "12")
+    setDefaultConfig("Websocket", "max_queue", "16")
+    setDefaultConfig("Websocket", "max_size", "10240")
+    setDefaultConfig("Websocket", "read_limit", "10240")
+    setDefaultConfig("Websocket", "write_limit", "65536")
+    setDefaultConfig("Websocket", "replay_size", "256")
+
 
 def nightbotIsValid():
     """Check if nightbot data is valid."""
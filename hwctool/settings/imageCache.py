@@ -0,0 +1,353 @@
+"""Provide right-sized variants of the images of a profile."""
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+
+from PyQt5.QtCore import QObject, QSize, Qt, pyqtSignal
+from PyQt5.QtGui import (QImage, QImageReader, QImageWriter,
+                         QPainter)
+
+module_logger = logging.getLogger(
+    'hwctool.settings.imageCache')  # create logger
+
+
+class ImageCache(QObject):
+    """Generate and cache image variants keyed by the source hash."""
+
+    atlasChanged = pyqtSignal(str)
+    variantsChanged = pyqtSignal(str)
+
+    def __init__(self, assets, base_dir, cache_dir):
+        """Init the cache on top of an asset index."""
+        super().__init__()
+        self.__assets = assets
+        self.__base_dir = base_dir
+        self.__cache_dir = cache_dir
+        self.__sizes = dict()
+        self.__variants = dict()
+        self.__urls = dict()
+        self.__hashes = dict()
+        self.__prepared = set()
+        self.__atlases = dict()
+        self.__atlasFiles = dict()
+        self.__lock = threading.Lock()
+        self.__atlasLock = threading.Lock()
+        # The variants are prepared one scope after another.
+        self.__pool = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='ImageCache')
+        self.__webp = b'webp' in [bytes(fmt) for fmt in
+                                  QImageWriter.supportedImageFormats()]
+        self.__assets.changed.connect(self.__assetsChanged)
+
+    def addScope(self, scope, width, height):
+        """Define the maximal size of the overlay variants of a scope."""
+        self.__sizes[scope] = QSize(width, height)
+
+    def getDir(self):
+        """Return the absolute directory of the cache."""
+        from hwctool.settings import getAbsPath
+        return getAbsPath(os.path.join(self.__base_dir, self.__cache_dir))
+
+    def __assetsChanged(self, scope):
+        with self.__atlasLock:
+            self.__atlases.pop(scope, None)
+        # The overlays only look up the variants created in the worker.
+        if scope in self.__sizes:
+            self.__pool.submit(self.__prepareScope, scope)
+
+    def __prepareScope(self, scope):
+        try:
+            changed = self.prepare(scope)
+            self.removeStale()
+        except Exception as e:
+            module_logger.exception("message")
+            return
+        if changed:
+            self.variantsChanged.emit(scope)
+
+    def wait(self):
+        """Wait until the variants of all changes are prepared."""
+        self.__pool.submit(int).result()
+
+    def getURL(self, scope, name, fallback=''):
+        """Return the variant relative to the casting html directory."""
+        source = self.__getSource(scope, name)
+        size = self.__sizes.get(scope)
+        if not source or size is None:
+            return fallback
+        with self.__lock:
+            url = self.__urls.get(
+                (scope, source, size.width(), size.height()))
+        return url or self.__getURL(source)
+
+    def __getURL(self, file):
+        from hwctool.settings import getAbsPath
+        return os.path.relpath(
+            file, getAbsPath(self.__base_dir)).replace('\\', '/')
+
+    def getFile(self, scope, name):
+        """Return the absolute file of a variant or an empty string.
+
+        Only looks up the variants of prepared assets, the source file
+        is returned for all other assets.
+        """
+        source = self.__getSource(scope, name)
+        size = self.__sizes.get(scope)
+        if not source or size is None:
+            return ''
+        with self.__lock:
+            entry = self.__variants.get(
+                (scope, source, size.width(), size.height()))
+        return source if entry is None else entry[1]
+
+    def __getSource(self, scope, name):
+        fname = self.__assets.find(scope, name)
+        if not fname:
+            return ''
+        return os.path.join(self.__assets.getDir(scope), fname)
+
+    def getVariant(self, scope, source, size):
+        """Return the variant of a source file and create it if needed."""
+        key = (scope, source, size.width(), size.height())
+        return self.__updateVariant(key, scope, source, size)[0]
+
+    def __updateVariant(self, key, scope, source, size):
+        try:
+            hash = self.getHash(scope, source)
+        except OSError:
+            hash = None
+        with self.__lock:
+            entry = self.__variants.get(key)
+        if entry is not None and entry[0] == hash:
+            return entry[1], False
+        try:
+            variant = self.createVariant(scope, source, size)
+        except Exception as e:
+            module_logger.exception("message")
+            variant = source
+        url = self.__getURL(variant)
+        with self.__lock:
+            self.__variants[key] = (hash, variant)
+            self.__urls[key] = url
+        return variant, True
+
+    def getThumbnail(self, source, size=64):
+        """Return the file of a small variant of an image for the GUI."""
+        if not source:
+            return ''
+        return self.getVariant('thumbnails', source, QSize(size, size))
+
+    def prepare(self, scope, name=None):
+        """Generate the variants of one or all assets of a scope.
+
+        Only the variants of new or changed files are created. Returns
+        the number of variants that changed.
+        """
+        size = self.__sizes[scope]
+        single = name is not None
+        names = [name] if single else self.__assets.names(scope)
+        keys = set()
+        changed = 0
+        for name in names:
+            source = self.__getSource(scope, name)
+            if not source:
+                continue
+            key = (scope, source, size.width(), size.height())
+            keys.add(key)
+            changed += self.__updateVariant(key, scope, source, size)[1]
+        if single:
+            return changed
+
+        # Forget the files that were removed from the scope.
+        sources = {key[1] for key in keys}
+        with self.__lock:
+            removed = [key for key in self.__variants
+                       if key[0] == scope and key not in keys]
+            for key in removed:
+                del self.__variants[key]
+                del self.__urls[key]
+            for key in [key for key in self.__hashes
+                        if key[0] == scope and key[1] not in sources]:
+                del self.__hashes[key]
+            self.__prepared.add(scope)
+        return changed + len(removed)
+
+    def removeStale(self):
+        """Delete the overlay variants that are not used anymore.
+
+        This waits until all scopes are prepared once, as some of them
+        share a size.
+        """
+        sizes = {'{}x{}'.format(size.width(), size.height())
+                 for size in self.__sizes.values()}
+        with self.__lock:
+            if not self.__prepared.issuperset(self.__sizes):
+                return
+            used = {os.path.basename(entry[1])
+                    for entry in self.__variants.values()}
+        try:
+            fnames = os.listdir(self.getDir())
+        except FileNotFoundError:
+            return
+        for fname in fnames:
+            match = re.match(r'^[0-9a-f]{16}-(\d+x\d+)\.\w+$', fname)
+            if match and match.group(1) in sizes and fname not in used:
+                os.remove(os.path.join(self.getDir(), fname))
+                module_logger.info('Removed image variant %s.', fname)
+
+    def getHash(self, scope, source):
+        """Return the hash of a source image.
+
+        The hash is computed again only if the size or the modification
+        time of the file changed.
+        """
+        key = (scope, source)
+        stat = os.stat(source)
+        signature = (stat.st_size, stat.st_mtime_ns)
+        with self.__lock:
+            entry = self.__hashes.get(key)
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+        sha = hashlib.sha1()
+        with open(source, 'rb') as f:
+            for chunk in iter(lambda: f.read(65536), b''):
+                sha.update(chunk)
+        value = sha.hexdigest()[:16]
+        with self.__lock:
+            self.__hashes[key] = (signature, value)
+        return value
+
+    def createVariant(self, scope, source, size):
+        """Create a variant unless it is already in the cache."""
+        ext = os.path.splitext(source)[1]
+        if self.__webp:
+            ext = '.webp'
+        elif ext.lower() == '.jpeg':
+            ext = '.jpg'
+        file = os.path.join(self.getDir(), '{}-{}x{}{}'.format(
+            self.getHash(scope, source),
+            size.width(), size.height(), ext.lower()))
+        if os.path.isfile(file):
+            return file
+
+        image = QImage(source)
+        if image.isNull():
+            raise ValueError('Could not read {}.'.format(source))
+        if image.width() > size.width() or image.height() > size.height():
+            image = image.scaled(size, Qt.KeepAspectRatio,
+                                 Qt.SmoothTransformation)
+        elif not self.__webp:
+            # Nothing to gain without a better format.
+            return source
+
+        os.makedirs(self.getDir(), exist_ok=True)
+        tmp = '{}.{}.tmp'.format(file, uuid4().hex)
+        quality = -1 if ext == '.png' else 85
+        if not image.save(tmp, ext[1:].upper(), quality):
+            raise ValueError('Could not write {}.'.format(file))
+        os.replace(tmp, file)
+        module_logger.info('Created image variant %s of %s.',
+                           os.path.basename(file), source)
+        return file
+
+    def getAtlas(self, scope):
+        """Return the manifest of the sprite atlas of a scope."""
+        changed = False
+        with self.__atlasLock:
+            if scope not in self.__atlases:
+                try:
+                    atlas = self.createAtlas(scope)
+                except Exception as e:
+                    module_logger.exception("message")
+                    atlas = dict()
+                self.__atlases[scope] = atlas
+                if atlas.get('file') != self.__atlasFiles.get(scope):
+                    self.__atlasFiles[scope] = atlas.get('file')
+                    changed = True
+            atlas = self.__atlases[scope]
+        # The receivers read the atlas again, i.e. take the lock.
+        if changed:
+            self.atlasChanged.emit(scope)
+        return atlas
+
+    def createAtlas(self, scope, cell=192, padding=24):
+        """Draw all assets of a scope on a uniform grid of sprites.
+
+        Every sprite is scaled to fit into the cell and surrounded by a
+        transparent padding, such that a browser source can show a
+        sprite with its original aspect ratio without bleeding of the
+        neighbouring sprites.
+        """
+        names = sorted(self.__assets.names(scope))
+        if not names:
+            return dict()
+        sources = [os.path.join(self.__assets.getDir(scope),
+                                self.__assets.find(scope, name))
+                   for name in names]
+        sha = hashlib.sha1('{}-{}'.format(cell, padding).encode())
+        for name, source in zip(names, sources):
+            sha.update(name.encode('utf-8'))
+            sha.update(self.getHash(scope, source).encode())
+
+        size = cell + 2 * padding
+        columns = math.ceil(math.sqrt(len(names)))
+        rows = math.ceil(len(names) / columns)
+        ext = '.webp' if self.__webp else '.png'
+        file = os.path.join(self.getDir(), '{}-atlas-{}{}'.format(
+            scope.replace('/', '-'), sha.hexdigest()[:16], ext))
+
+        sprites = dict()
+        for idx, (name, source) in enumerate(zip(names, sources)):
+            scaled = QImageReader(source).size().scaled(
+                cell, cell, Qt.KeepAspectRatio)
+            if scaled.isEmpty():
+                module_logger.warning('Could not read %s.', source)
+                continue
+            x = (idx % columns) * size + padding + \
+                (cell - scaled.width()) // 2
+            y = (idx // columns) * size + padding + \
+                (cell - scaled.height()) // 2
+            sprites[name] = [x, y, scaled.width(), scaled.height()]
+
+        if not os.path.isfile(file):
+            atlas = QImage(columns * size, rows * size,
+                           QImage.Format_ARGB32_Premultiplied)
+            atlas.fill(Qt.transparent)
+            painter = QPainter(atlas)
+            for name, source in zip(names, sources):
+                if name not in sprites:
+                    continue
+                x, y, width, height = sprites[name]
+                painter.drawImage(x, y, QImage(source).scaled(
+                    width, height, Qt.IgnoreAspectRatio,
+                    Qt.SmoothTransformation))
+            painter.end()
+            os.makedirs(self.getDir(), exist_ok=True)
+            tmp = '{}.{}.tmp'.format(file, uuid4().hex)
+            if not atlas.save(tmp, ext[1:].upper(), 90):
+                raise ValueError('Could not write {}.'.format(file))
+            os.replace(tmp, file)
+            prefix = '{}-atlas-'.format(scope.replace('/', '-'))
+            for fname in os.listdir(self.getDir()):
+                if (fname.startswith(prefix) and
+                        fname != os.path.basename(file)):
+                    os.remove(os.path.join(self.getDir(), fname))
+            module_logger.info('Created sprite atlas %s of %d sprites.',
+                               os.path.basename(file), len(sprites))
+
+        manifest = {'file': self.__getURL(file),
+                    'width': columns * size,
+                    'height': rows * size,
+                    'padding': padding,
+                    'sprites': sprites}
+        manifest_file = os.path.join(
+            self.getDir(), '{}-atlas.json'.format(scope.replace('/', '-')))
+        with open(manifest_file, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
@@ -0,0 +1,139 @@
+"""Write the log in the background through a queue."""
+import atexit
+import copy
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+
+# create logger
+module_logger = logging.getLogger('hwctool.settings.logfiles')
+
+# listeners that were started and not stopped yet
+_listeners = set()
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """Put records on the queue without the formatting of the handlers."""
+
+    def prepare(self, record):
+        """Merge the arguments into the message and leave the rest.
+
+        The arguments may change after the call, thus only the time
+        stamp and the layout of the handlers are left to the listener.
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if getattr(record, 'dropped', 0):
+            record.msg = '{} [{} similar messages dropped]'.format(
+                record.msg, record.dropped)
+        if record.exc_info:
+            # The traceback is only available in the current thread.
+            record.exc_text = logging.Formatter().formatException(
+                record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    """Limit the rate of frequent debug and info messages.
+
+    Records are sampled per logger and call site, such that messages
+    that were formatted before the call count as one template. Warnings
+    and errors always pass. The number of dropped records is kept in the
+    attribute dropped of the next record of the call site that passes,
+    the message itself is left to the handlers.
+    """
+
+    def __init__(self, rate=20, interval=1.0):
+        """Allow a number of records per template and interval."""
+        super().__init__()
+        self.rate = rate
+        self.interval = interval
+        self.__windows = dict()
+        self.__lock = threading.Lock()
+
+    def filter(self, record):
+        """Check if a record is logged."""
+        if record.levelno >= logging.WARNING or self.rate <= 0:
+            return True
+        key = (record.name, record.pathname, record.lineno)
+        now = record.created
+        with self.__lock:
+            window = self.__windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                dropped = window[2] if window else 0
+                self.__windows[key] = [now, 1, 0]
+            elif window[1] < self.rate:
+                window[1] += 1
+                dropped = 0
+            else:
+                window[2] += 1
+                return False
+        record.dropped = dropped
+        return True
+
+
+def setup(logger, file, console=True, max_bytes=5 * 1024 * 1024,
+          backups=3, rate=20):
+    """Route a logger through a queue to a rotating file.
+
+    Returns the listener that writes the records in a background thread,
+    it is stopped at exit.
+    """
+    formatter = logging.Formatter(
+        '%(asctime)s, %(name)s, %(levelname)s: %(message)s',
+        datefmt="%Y-%m-%d %H:%M:%S")
+    handlers = []
+    fh = logging.handlers.RotatingFileHandler(
+        file, maxBytes=max_bytes, backupCount=backups,
+        encoding='utf-8', delay=True)
+    fh.setFormatter(formatter)
+    handlers.append(fh)
+    if console:
+        ch = logging.StreamHandler()
+        ch.setFormatter(formatter)
+        handlers.append(ch)
+
+    listener = logging.handlers.QueueListener(
+        queue.Queue(-1), *handlers, respect_handler_level=True)
+    qh = LazyQueueHandler(listener.queue)
+    qh.addFilter(SamplingFilter(rate))
+    logger.addHandler(qh)
+    listener.start()
+    _listeners.add(listener)
+    atexit.register(stop, logger, listener)
+    return listener
+
+
+def stop(logger, listener):
+    """Write the remaining records and close the handlers."""
+    if listener not in _listeners:
+        return
+    _listeners.discard(listener)
+    for handler in list(logger.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler):
+            logger.removeHandler(handler)
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+
+
+def cleanUp(logdir, days=7):
+    """Delete old log files in a background thread."""
+    def cleanUpTask():
+        limit = time.time() - days * 86400
+        try:
+            for entry in os.scandir(logdir):
+                if entry.is_file() and entry.stat().st_mtime < limit:
+                    os.remove(entry.path)
+        except Exception as e:
+            module_logger.exception("message")
+
+    thread = threading.Thread(target=cleanUpTask, name='LogCleanUp',
+                              daemon=True)
+    thread.start()
+    return thread
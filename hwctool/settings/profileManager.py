@@ -187,6 +187,8 @@ class ProfileManager:
             os.makedirs(dir)
         file = os.path.join(dir, 'profile.js')
 
+        # Browser sources served via HTTP get profile.js from the
+        # websocket server, this file is only used via file://.
         with open(file, 'w', encoding='utf-8') as o:
             o.write("var profile = '{}';".format(profile))
 
@@ -0,0 +1,132 @@
+"""Provide a registry of the styles of the browser sources."""
+import logging
+import os
+import re
+import urllib.parse
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+module_logger = logging.getLogger(
+    'hwctool.settings.styleRegistry')  # create logger
+
+import_regex = re.compile(
+    r"@import\s+url\(\s*['\"]?([^'\")]+)['\"]?\s*\)", re.IGNORECASE)
+fontface_regex = re.compile(
+    r"@font-face\s*{[^}]*font-family:\s*['\"]?([^;'\"]+)", re.IGNORECASE)
+fontvar_regex = re.compile(r"--font:\s*([^;]+);", re.IGNORECASE)
+
+
+class StyleRegistry(QObject):
+    """Keep the parsed metadata of the styles of each scope."""
+
+    changed = pyqtSignal(str)
+
+    def __init__(self, assets):
+        """Init the registry on top of an asset index."""
+        super().__init__()
+        self.__assets = assets
+        self.__styles = dict()
+        self.__assets.changed.connect(self.__assetsChanged)
+
+    def addScope(self, scope):
+        """Register the styles of a browser source scope."""
+        self.__styles[scope] = dict()
+
+    def __assetsChanged(self, asset_scope):
+        if not asset_scope.startswith('styles/'):
+            return
+        scope = asset_scope[len('styles/'):]
+        if scope in self.__styles:
+            self.update(scope)
+
+    def update(self, scope):
+        """Parse new and modified styles of a scope."""
+        asset_scope = 'styles/' + scope
+        style_dir = self.__assets.getDir(asset_scope)
+        old_styles = self.__styles[scope]
+        styles = dict()
+        modified = False
+        for fname in self.__assets.files(asset_scope):
+            file = os.path.join(style_dir, fname)
+            name = os.path.splitext(fname)[0]
+            if ' ' in name:
+                # Styles are referenced in URLs, thus avoid spaces.
+                try:
+                    os.rename(file, os.path.join(
+                        style_dir, name.replace(' ', '-') + '.css'))
+                except OSError:
+                    module_logger.exception("message")
+                continue
+            try:
+                stat = os.stat(file)
+            except OSError:
+                continue
+            key = (stat.st_mtime_ns, stat.st_size)
+            style = old_styles.get(name)
+            if style is None or style['key'] != key or\
+                    style['file'] != file:
+                style = self.parse(file, name, key)
+                modified = True
+            preview = os.path.join(style_dir, name + '.png')
+            preview = preview if os.path.isfile(preview) else ''
+            if preview != style['preview']:
+                style['preview'] = preview
+                modified = True
+            styles[name] = style
+
+        if modified or styles.keys() != old_styles.keys():
+            self.__styles[scope] = styles
+            module_logger.info('Styles of %s updated.', scope)
+            self.changed.emit(scope)
+
+    def parse(self, file, name, key):
+        """Parse the metadata of a style."""
+        style = {'name': name, 'label': name.replace('-', ' '),
+                 'file': file, 'key': key, 'preview': '', 'fonts': []}
+        try:
+            with open(file, 'r', encoding='utf-8-sig') as f:
+                content = f.read()
+        except Exception as e:
+            module_logger.exception("message")
+            return style
+
+        fonts = []
+        for url in import_regex.findall(content):
+            url = urllib.parse.urlparse(url)
+            if 'fonts.googleapis.com' not in url.netloc:
+                continue
+            query = urllib.parse.parse_qs(url.query)
+            for family in query.get('family', []):
+                for font in family.split('|'):
+                    fonts.append(font.split(':')[0].strip())
+        for font in fontface_regex.findall(content) + \
+                fontvar_regex.findall(content):
+            fonts.append(font.split(',')[0].strip())
+
+        for font in fonts:
+            if font and font not in style['fonts']:
+                style['fonts'].append(font)
+        return style
+
+    def getStyles(self, scope):
+        """Return the metadata of all styles of a scope sorted by label."""
+        return sorted(self.__styles.get(scope, dict()).values(),
+                      key=lambda style: style['label'].lower())
+
+    def getStyle(self, scope, name):
+        """Return the metadata of a style or None."""
+        return self.__styles.get(scope, dict()).get(name)
+
+    def validate(self, scope, name):
+        """Return a valid style of a scope, falling back to the default."""
+        styles = self.__styles.get(scope, dict())
+        if name in styles:
+            return name
+        for style in styles:
+            if style.lower() == str(name).lower():
+                return style
+        module_logger.warning(
+            "Style '{}' of {} not found.".format(name, scope))
+        if 'Default' in styles or not styles:
+            return 'Default'
+        return self.getStyles(scope)[0]['name']
@@ -35,9 +35,14 @@ class AutoRequestsThread(TasksThread):
         self.nightbotSignal.connect(controller.displayWarning)
         self.disableCB.connect(controller.uncheckCB)
 
+    def __replace(self, text):
+        """Replace the placeholders with a consistent state of the match."""
+        return self.__controller.matchData.read(
+            self.__controller.placeholders.replace, text)
+
     def __twitchTask(self):
         title = hwctool.settings.config.parser.get("Twitch", "title_template")
-        title = self.__controller.placeholders.replace(title)
+        title = self.__replace(title)
 
         if(hwctool.tasks.twitch.previousTitle is None):
             hwctool.tasks.twitch.previousTitle = title
@@ -52,7 +57,7 @@ class AutoRequestsThread(TasksThread):
         try:
             title = hwctool.settings.config.parser.get(
                 "Twitch", "title_template")
-            title = self.__controller.placeholders.replace(title)
+            title = self.__replace(title)
             msg, success = hwctool.tasks.twitch.updateTitle(title)
             self.twitchSignal.emit(msg)
         finally:
@@ -61,7 +66,7 @@ class AutoRequestsThread(TasksThread):
     def __nightbotTask(self):
         data = dict()
         for command, message in hwctool.settings.nightbot_commands.items():
-            message = self.__controller.placeholders.replace(message)
+            message = self.__replace(message)
             if(hwctool.tasks.nightbot.previousMsg.get(command, None) is None):
                 hwctool.tasks.nightbot.previousMsg[command] = message
             elif(hwctool.tasks.nightbot.previousMsg[command] != message):
@@ -80,7 +85,7 @@ class AutoRequestsThread(TasksThread):
         try:
             data = dict()
             for command, message in hwctool.settings.nightbot_commands.items():
-                message = self.__controller.placeholders.replace(message)
+                message = self.__replace(message)
                 data[command] = message
             for cmd, msg, _, deleted in \
                     hwctool.tasks.nightbot.updateCommand(data):
@@ -0,0 +1,134 @@
+"""Remote control of the match data via HTTP and websocket."""
+import hmac
+import json
+import logging
+import urllib.parse
+from http import HTTPStatus
+
+import hwctool.settings
+
+# create logger
+module_logger = logging.getLogger('hwctool.tasks.control')
+
+valid_commands = ['score', 'player', 'race', 'team', 'league', 'swap']
+
+
+def isActive():
+    """Check if the remote control is activated."""
+    return hwctool.settings.config.parser.getboolean("Control", "active")
+
+
+def checkToken(token):
+    """Check a token against the configured control token."""
+    secret = hwctool.settings.config.parser.get("Control", "token")
+    if not secret or not token:
+        return False
+    return hmac.compare_digest(str(token), secret)
+
+
+def getToken(path, request_headers):
+    """Extract the token from the query or the authorization header."""
+    query = urllib.parse.parse_qs(urllib.parse.urlparse(path).query)
+    token = query.get('token', [''])[0]
+    if not token:
+        auth = request_headers.get('Authorization', '')
+        if auth.lower().startswith('bearer '):
+            token = auth[7:].strip()
+    return token
+
+
+def parseRequest(path):
+    """Parse a HTTP control request like /control/score?set=1&value=-1."""
+    url = urllib.parse.urlparse(path)
+    parts = url.path.strip('/').split('/')
+    if len(parts) != 2 or parts[0] != 'control':
+        raise ValueError('Invalid control path.')
+    query = {key: value[0] for key, value in
+             urllib.parse.parse_qs(url.query).items() if key != 'token'}
+    if parts[1] == 'batch':
+        return parseCommands(json.loads(query.get('commands', '[]')))
+    query['command'] = parts[1]
+    return parseCommands(query)
+
+
+def parseCommands(data):
+    """Validate a single command or a batch of commands."""
+    if isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list) or not data:
+        raise ValueError('Expected a command or a list of commands.')
+    return [parseCommand(item) for item in data]
+
+
+def parseCommand(data):
+    """Validate a command and convert it to zero based indices."""
+    if not isinstance(data, dict):
+        raise ValueError('A command has to be an object.')
+    command = str(data.get('command', '')).strip().lower()
+    if command not in valid_commands:
+        raise ValueError("Command '{}' is not valid.".format(command))
+
+    parsed = {'command': command}
+    if command in ['score', 'player', 'race']:
+        parsed['set_idx'] = _getIdx(data, 'set', hwctool.settings.max_no_sets)
+    if command in ['player', 'race', 'team']:
+        parsed['team_idx'] = _getIdx(data, 'team', 2)
+
+    if command == 'score':
+        value = data.get('value', 0)
+        if isinstance(value, str):
+            value = value.strip()
+        if value not in [-1, 0, 1, '-1', '0', '1'] or \
+                isinstance(value, bool):
+            raise ValueError('Score has to be -1, 0 or 1.')
+        parsed['value'] = int(value)
+    elif command == 'player':
+        parsed['value'] = str(data.get('name', 'TBD')).strip()
+        race = data.get('race', False)
+        parsed['race'] = _getRace(race) if race else False
+    elif command == 'race':
+        parsed['value'] = _getRace(data.get('race', ''))
+    elif command in ['team', 'league']:
+        parsed['value'] = str(data.get('name', 'TBD')).strip()
+
+    return parsed
+
+
+def _getIdx(data, key, maximum):
+    try:
+        idx = int(data[key]) - 1
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("Parameter '{}' is missing or invalid.".format(key))
+    if idx not in range(maximum):
+        raise ValueError("Parameter '{}' is out of range.".format(key))
+    return idx
+
+
+def _getRace(race):
+    for item in hwctool.settings.races:
+        if item.lower() == str(race).strip().lower():
+            return item
+    raise ValueError("Race '{}' is not valid.".format(race))
+
+
+def response(status, data):
+    """Create a HTTP response for websockets' process_request."""
+    body = json.dumps(data).encode('utf-8')
+    headers = [('Content-Type', 'application/json'),
+               ('Content-Length', str(len(body))),
+               ('Cache-Control', 'no-store')]
+    return status, headers, body
+
+
+def processRequest(path, request_headers, dispatch):
+    """Handle a HTTP control request and dispatch the parsed commands."""
+    if not isActive():
+        return response(HTTPStatus.NOT_FOUND, {'error': 'Not found.'})
+    if not checkToken(getToken(path, request_headers)):
+        return response(HTTPStatus.UNAUTHORIZED, {'error': 'Invalid token.'})
+    try:
+        commands = parseRequest(path)
+    except ValueError as e:
+        return response(HTTPStatus.BAD_REQUEST, {'error': str(e)})
+    dispatch(commands)
+    return response(HTTPStatus.OK, {'accepted': len(commands)})
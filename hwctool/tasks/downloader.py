@@ -0,0 +1,238 @@
+"""Download files in the background with resume and verification."""
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+
+from PyQt5.QtCore import QObject, Qt, pyqtSignal
+
+import hwctool.tasks.metrics as metrics
+
+# create logger
+module_logger = logging.getLogger('hwctool.tasks.downloader')
+
+
+class DownloadCanceled(Exception):
+    """Raised in a worker if the downloads were canceled."""
+
+
+class Download:
+    """Define a single download."""
+
+    min_chunk = 16 * 1024
+    max_chunk = 1024 * 1024
+
+    def __init__(self, url, file, sha256=None):
+        """Init the download."""
+        self.id = uuid4().hex
+        self.url = url
+        self.file = file
+        self.part = file + '.part'
+        self.sha256 = sha256.lower() if sha256 else None
+        self.done = 0
+        self.total = 0
+
+
+class DownloadManager(QObject):
+    """Download files with a pool of worker threads."""
+
+    progress = pyqtSignal(str, int, int)
+    finished = pyqtSignal(str, str)
+    failed = pyqtSignal(str, str)
+    allFinished = pyqtSignal()
+
+    _progress = pyqtSignal(str, int, int)
+    _finished = pyqtSignal(str, str)
+    _failed = pyqtSignal(str, str)
+
+    def __init__(self, max_workers=4, timeout=10, retries=3):
+        """Init the manager."""
+        super().__init__()
+        self.timeout = timeout
+        self.retries = retries
+        self.__pool = ThreadPoolExecutor(max_workers=max_workers)
+        self.__lock = threading.Lock()
+        self.__canceled = threading.Event()
+        self.__downloads = dict()
+        self.__pending = set()
+
+        # Relay the signals of the workers to the thread of the manager.
+        self._progress.connect(self.__onProgress, Qt.QueuedConnection)
+        self._finished.connect(self.__onFinished, Qt.QueuedConnection)
+        self._failed.connect(self.__onFailed, Qt.QueuedConnection)
+
+    def download(self, url, file, sha256=None):
+        """Queue a download and return its id."""
+        download = Download(url, file, sha256)
+        with self.__lock:
+            self.__downloads[download.id] = download
+            self.__pending.add(download.id)
+        self.__canceled.clear()
+        self.__pool.submit(self.__run, download)
+        return download.id
+
+    def downloadAll(self, items):
+        """Queue a list of (url, file) or (url, file, sha256) items."""
+        return [self.download(*item) for item in items]
+
+    def getDownload(self, id):
+        return self.__downloads.get(id)
+
+    def totalProgress(self):
+        """Return the sum of the done and total bytes of all downloads."""
+        with self.__lock:
+            downloads = list(self.__downloads.values())
+        return (sum(download.done for download in downloads),
+                sum(download.total for download in downloads))
+
+    def isRunning(self):
+        with self.__lock:
+            return bool(self.__pending)
+
+    def cancel(self):
+        """Cancel all pending downloads, keeping partial files to resume."""
+        self.__canceled.set()
+
+    def shutdown(self):
+        """Cancel all downloads and wait for the workers."""
+        self.cancel()
+        self.__pool.shutdown(wait=True)
+
+    def __run(self, download):
+        error = ''
+        for attempt in range(self.retries + 1):
+            try:
+                self.fetch(download)
+                self._finished.emit(download.id, download.file)
+                return
+            except DownloadCanceled:
+                error = _('Canceled.')
+                break
+            except ValueError as e:
+                error = str(e)
+                break
+            except Exception as e:
+                error = str(e)
+                module_logger.warning(
+                    "Download of %s failed (attempt %d): %s",
+                    download.url, attempt + 1, e)
+                time.sleep(min(2 ** attempt, 10) * 0.1)
+        self._failed.emit(download.id, error)
+
+    @metrics.timed('http.download')
+    def fetch(self, download):
+        """Download a file, resuming a partial download if possible."""
+        import requests
+        os.makedirs(os.path.dirname(os.path.abspath(download.file)),
+                    exist_ok=True)
+
+        sha = hashlib.sha256() if download.sha256 else None
+        offset = 0
+        if os.path.isfile(download.part):
+            offset = os.path.getsize(download.part)
+        # Progress and ranges refer to the bytes on the wire.
+        headers = {'Accept-Encoding': 'identity'}
+        if offset:
+            headers['Range'] = 'bytes={}-'.format(offset)
+
+        with requests.get(download.url, stream=True, headers=headers,
+                          timeout=self.timeout) as response:
+            if response.status_code == 416:
+                # The partial file is complete only if it has the size
+                # reported by the server or the checksum verifies it.
+                size = self.getCompleteLength(response)
+                if size != offset and (size is not None or sha is None):
+                    os.remove(download.part)
+                    raise ConnectionError(
+                        'Partial file of {} bytes does not match {} bytes.'
+                        .format(offset, size))
+                length = 0
+            else:
+                response.raise_for_status()
+                if response.status_code != 206:
+                    offset = 0
+                length = int(response.headers.get('content-length', 0))
+
+            if sha is not None and offset:
+                with open(download.part, 'rb') as f:
+                    for chunk in iter(lambda: f.read(65536), b''):
+                        sha.update(chunk)
+
+            download.done = offset
+            download.total = offset + length
+            with open(download.part, 'ab' if offset else 'wb') as f:
+                if response.status_code != 416:
+                    self.__copy(download, response, f, sha)
+
+        if sha is not None and sha.hexdigest() != download.sha256:
+            os.remove(download.part)
+            raise ValueError(_('Checksum of {} does not match.').format(
+                os.path.basename(download.file)))
+
+        os.replace(download.part, download.file)
+        metrics.observe('http.download_bytes', download.done, unit='B')
+        self._progress.emit(download.id, download.done, download.done)
+        module_logger.info("Downloaded %s to %s", download.url, download.file)
+
+    @staticmethod
+    def getCompleteLength(response):
+        """Return the size in the Content-Range header of a response."""
+        match = re.match(r'bytes\s+(?:\*|\d+-\d+)/(\d+)',
+                         response.headers.get('content-range', ''))
+        if match is None:
+            return None
+        return int(match.group(1))
+
+    def __copy(self, download, response, f, sha):
+        chunk_size = Download.min_chunk * 4
+        last_emit = 0
+        while True:
+            if self.__canceled.is_set():
+                raise DownloadCanceled()
+            start = time.perf_counter()
+            data = response.raw.read(chunk_size, decode_content=True)
+            if not data:
+                break
+            f.write(data)
+            if sha is not None:
+                sha.update(data)
+            download.done += len(data)
+
+            # Adapt the chunk size to the speed of the connection.
+            elapsed = time.perf_counter() - start
+            if elapsed < 0.05:
+                chunk_size = min(chunk_size * 2, Download.max_chunk)
+            elif elapsed > 0.5:
+                chunk_size = max(chunk_size // 2, Download.min_chunk)
+
+            now = time.perf_counter()
+            if now - last_emit > 0.1:
+                last_emit = now
+                self._progress.emit(download.id, download.done,
+                                    max(download.total, download.done))
+
+        if download.total and download.done < download.total:
+            raise ConnectionError('Connection closed after {} of {} bytes.'
+                                  .format(download.done, download.total))
+
+    def __onProgress(self, id, done, total):
+        self.progress.emit(id, done, total)
+
+    def __onFinished(self, id, file):
+        self.finished.emit(id, file)
+        self.__complete(id)
+
+    def __onFailed(self, id, error):
+        self.failed.emit(id, error)
+        self.__complete(id)
+
+    def __complete(self, id):
+        with self.__lock:
+            self.__pending.discard(id)
+            pending = bool(self.__pending)
+        if not pending:
+            self.allFinished.emit()
@@ -0,0 +1,75 @@
+"""Encode the messages of the browser sources."""
+import json
+import string
+
+# Keys of the data that are abbreviated by the compact encoding.
+KEYS = ['team1', 'team2', 'sets', 'winner', 'score1', 'score2', 'logo1',
+        'logo2', 'text', 'teamid', 'setid', 'color', 'img', 'player1',
+        'player2', 'race1', 'race2', 'map_img', 'mapname', 'maplabel',
+        'score_color', 'border_color', 'hide_scoreicon', 'opacity',
+        'status1', 'status2', 'name', 'race', 'logo', 'display', 'team',
+        'tts', 'font', 'file']
+
+# Events that are sent by their index.
+EVENTS = ['ALL_DATA', 'CHANGE_TEXT', 'CHANGE_SCORE', 'CHANGE_IMAGE',
+          'SET_WINNER', 'CHANGE_STYLE', 'CHANGE_FONT', 'LOAD_ATLAS',
+          'SHOW_INTRO', 'DEBUG_MODE', 'CHANGE_SETS']
+
+# Events whose state is sent back by the browser sources.
+ECHOED_EVENTS = ['SHOW_INTRO']
+
+
+def _code(idx):
+    letters = string.ascii_uppercase
+    code = letters[idx % 26]
+    while idx >= 26:
+        idx = idx // 26 - 1
+        code = letters[idx % 26] + code
+    return code
+
+
+# Real keys are lower case, the upper case codes do not collide with keys
+# that are not abbreviated.
+CODES = {key: _code(idx) for idx, key in enumerate(KEYS)}
+EVENT_CODES = {event: idx for idx, event in enumerate(EVENTS)}
+
+
+def encode(event, data, state='', seq=None):
+    """Return a message as json with the full key names."""
+    message = {'event': event, 'data': data, 'state': state}
+    if seq is not None:
+        message['seq'] = seq
+    return json.dumps(message)
+
+
+def encodeCompact(event, data, state='', seq=None):
+    """Return a message as compact json.
+
+    The message is a list of the event (index), the data with
+    abbreviated keys, the sequence number and the state. The last two
+    are left out if the message has no sequence number and the state is
+    not sent back by the browser sources.
+    """
+    message = [EVENT_CODES.get(event, event), compact(data)]
+    if event in ECHOED_EVENTS:
+        message += [seq, state]
+    elif seq is not None:
+        message.append(seq)
+    return json.dumps(message, separators=(',', ':'))
+
+
+def compact(data):
+    """Abbreviate the keys of the data."""
+    if isinstance(data, dict):
+        return {CODES.get(key, key): compact(value)
+                for key, value in data.items()}
+    if isinstance(data, list):
+        return [compact(value) for value in data]
+    return data
+
+
+def header():
+    """Return the message that describes the compact encoding."""
+    return encode('ENCODING', {
+        'keys': {code: key for key, code in CODES.items()},
+        'events': EVENTS})
@@ -0,0 +1,132 @@
+"""Serve the casting html files via HTTP next to the websocket."""
+import email.utils
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+import urllib.parse
+from http import HTTPStatus
+
+import hwctool.settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# create logger
+module_logger = logging.getLogger('hwctool.tasks.fileserver')
+
+compressible_types = ['.css', '.js', '.html', '.json', '.svg']
+# name.<hash>.ext, the image variants <hash>-<w>x<h>.ext and the sprite
+# atlases <scope>-atlas-<hash>.ext
+hashed_regex = re.compile(
+    r'(\.[0-9a-f]{8,}|(^|-)[0-9a-f]{16}(-\d+x\d+)?)\.\w+$')
+
+
+class FileServer:
+    """Serve the casting html files of the current profile."""
+
+    def __init__(self):
+        """Init file server."""
+        self.__cache = dict()
+
+    def root(self):
+        """Return the directory that is served."""
+        return os.path.realpath(hwctool.settings.getAbsPath(
+            hwctool.settings.casting_html_dir))
+
+    def processRequest(self, path, request_headers):
+        """Return a HTTP response for a file or None if not found."""
+        path = urllib.parse.unquote(urllib.parse.urlparse(path).path)
+        if path == '/src/js/profile.js':
+            body = "var profile = '{}';".format(
+                hwctool.settings.profileManager.currentID()).encode('utf-8')
+            return self.response(request_headers, path, body, 'no-cache')
+
+        root = self.root()
+        file = os.path.realpath(os.path.join(root, path.lstrip('/')))
+        if not file.startswith(root + os.sep) or not os.path.isfile(file):
+            return None
+
+        try:
+            body = self.readFile(file)
+        except OSError:
+            module_logger.exception("message")
+            return None
+
+        if hashed_regex.search(os.path.basename(file)):
+            cache_control = 'public, max-age=31536000, immutable'
+        else:
+            cache_control = 'no-cache'
+
+        return self.response(request_headers, file, body, cache_control)
+
+    def readFile(self, file):
+        """Read a file and cache it until it is modified."""
+        stat = os.stat(file)
+        key = (stat.st_mtime_ns, stat.st_size)
+        cached = self.__cache.get(file)
+        if cached is None or cached['key'] != key:
+            with open(file, 'rb') as f:
+                body = f.read()
+            cached = {'key': key, 'body': body, 'encoded': dict(),
+                      'etag': '"{}"'.format(
+                          hashlib.sha1(body).hexdigest()[:16])}
+            self.__cache[file] = cached
+        return cached['body']
+
+    def response(self, request_headers, file, body, cache_control):
+        """Create a response with caching and compression headers."""
+        cached = self.__cache.get(file)
+        if cached is not None:
+            etag = cached['etag']
+        else:
+            etag = '"{}"'.format(hashlib.sha1(body).hexdigest()[:16])
+
+        headers = [('Cache-Control', cache_control),
+                   ('ETag', etag),
+                   ('Date', email.utils.formatdate(usegmt=True))]
+
+        if etag in request_headers.get('If-None-Match', ''):
+            return HTTPStatus.NOT_MODIFIED, headers, b''
+
+        content_type, _ = mimetypes.guess_type(file)
+        headers.append(('Content-Type',
+                        content_type or 'application/octet-stream'))
+
+        _, ext = os.path.splitext(file)
+        if ext.lower() in compressible_types:
+            headers.append(('Vary', 'Accept-Encoding'))
+            encoding = self.selectEncoding(
+                request_headers.get('Accept-Encoding', ''))
+            if encoding:
+                body = self.encode(cached, body, encoding)
+                headers.append(('Content-Encoding', encoding))
+
+        headers.append(('Content-Length', str(len(body))))
+        return HTTPStatus.OK, headers, body
+
+    def selectEncoding(self, accept_encoding):
+        """Select the best content encoding accepted by the client."""
+        accepted = [item.split(';')[0].strip().lower()
+                    for item in accept_encoding.split(',')]
+        if brotli is not None and 'br' in accepted:
+            return 'br'
+        elif 'gzip' in accepted:
+            return 'gzip'
+        return ''
+
+    def encode(self, cached, body, encoding):
+        """Compress the body and cache the result."""
+        if cached is not None and encoding in cached['encoded']:
+            return cached['encoded'][encoding]
+        if encoding == 'br':
+            encoded = brotli.compress(body)
+        else:
+            encoded = gzip.compress(body, mtime=0)
+        if cached is not None:
+            cached['encoded'][encoding] = encoded
+        return encoded
@@ -0,0 +1,79 @@
+"""Synthesize the speech of the player intros in the background."""
+import logging
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5.QtCore import QObject, Qt, pyqtSignal
+
+# create logger
+module_logger = logging.getLogger('hwctool.tasks.intros')
+
+
+class IntroSynthesizer(QObject):
+    """Synthesize the lines of the intros once per player and voice.
+
+    A line is keyed by (player index, name, race, line, voice, pitch,
+    rate). Synthesized files are reused until the key changes, such
+    that repeated updates of the intros do not reach the text-to-speech
+    service.
+    """
+
+    synthesized = pyqtSignal(object, object)
+
+    _synthesized = pyqtSignal(object, object)
+
+    def __init__(self, tts, size=32):
+        """Init with a factory of the text-to-speech client."""
+        super().__init__()
+        self.__tts = tts
+        self.__size = size
+        self.__files = OrderedDict()
+        self.__pending = set()
+        # The text-to-speech cache is not thread-safe, a single worker
+        # synthesizes the lines one after another.
+        self.__pool = ThreadPoolExecutor(max_workers=1)
+
+        # Relay the results of the worker to the thread of the object.
+        self._synthesized.connect(self.__onSynthesized, Qt.QueuedConnection)
+
+    def get(self, key):
+        """Return the file of a line or queue its synthesis.
+
+        Returns None while the line is synthesized, synthesized is
+        emitted with the key and the file afterwards.
+        """
+        if key in self.__files:
+            self.__files.move_to_end(key)
+            return self.__files[key]
+        if key not in self.__pending:
+            self.__pending.add(key)
+            self.__pool.submit(self.__run, key)
+        return None
+
+    def isPending(self):
+        return bool(self.__pending)
+
+    def shutdown(self):
+        """Wait for the worker."""
+        self.__pool.shutdown(wait=True)
+
+    def __run(self, key):
+        player_idx, name, race, scope, voice, pitch, rate = key
+        try:
+            tts = self.__tts()
+            text = tts.getLine(scope, name, race, player_idx)
+            file = os.path.join("..", tts.synthesize(
+                text, voice, pitch, rate)).replace('\\', '/')
+        except Exception as e:
+            module_logger.exception("message")
+            file = ''
+        self._synthesized.emit(key, file)
+
+    def __onSynthesized(self, key, file):
+        self.__pending.discard(key)
+        if file:
+            self.__files[key] = file
+            while len(self.__files) > self.__size:
+                self.__files.popitem(last=False)
+        self.synthesized.emit(key, file)
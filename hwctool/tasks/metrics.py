@@ -0,0 +1,259 @@
+"""Collect performance metrics with counters, histograms and timers."""
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from uuid import uuid4
+
+from hwctool.tasks.tasksthread import TasksThread
+
+# create logger
+module_logger = logging.getLogger('hwctool.tasks.metrics')
+
+this = sys.modules[__name__]
+
+this.enabled = False
+this.started = time.time()
+this.counters = dict()
+this.histograms = dict()
+this.history = deque(maxlen=60)
+this.lock = threading.Lock()
+
+
+class Histogram:
+    """Summarize values and keep the most recent for percentiles."""
+
+    __slots__ = ['unit', 'count', 'total', 'min', 'max', 'pending', 'recent']
+
+    def __init__(self, unit='', size=4096):
+        """Init the histogram."""
+        self.unit = unit
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        # Appending to a deque is thread-safe and much cheaper than taking
+        # a lock, the pending values are summarized on demand.
+        self.pending = deque()
+        self.recent = deque(maxlen=size)
+
+    def add(self, value):
+        """Add a value."""
+        self.pending.append(value)
+        if len(self.pending) > 10000:
+            collect()
+
+    def flush(self):
+        """Summarize the pending values (with the lock held)."""
+        pending = self.pending
+        values = [pending.popleft() for idx in range(len(pending))]
+        if not values:
+            return
+        self.count += len(values)
+        self.total += sum(values)
+        low = min(values)
+        high = max(values)
+        if self.min is None or low < self.min:
+            self.min = low
+        if self.max is None or high > self.max:
+            self.max = high
+        self.recent.extend(values)
+
+    def percentile(self, q, values=None):
+        """Return a percentile of the recent values."""
+        if values is None:
+            values = sorted(self.recent)
+        if not values:
+            return 0.0
+        return values[min(int(q * len(values)), len(values) - 1)]
+
+    def summary(self):
+        """Return a summary of the histogram."""
+        values = sorted(self.recent)
+        return {'unit': self.unit,
+                'count': self.count,
+                'total': self.total,
+                'mean': self.total / self.count if self.count else 0.0,
+                'min': self.min or 0.0,
+                'p50': self.percentile(0.5, values),
+                'p99': self.percentile(0.99, values),
+                'max': self.max or 0.0}
+
+
+class Timer:
+    """Measure the duration of a block in a histogram."""
+
+    __slots__ = ['name', 'start']
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        stop(self.name, self.start)
+        return False
+
+
+class NoTimer:
+    """Do nothing while the metrics are disabled."""
+
+    __slots__ = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+noTimer = NoTimer()
+
+
+def enable(active=True):
+    """Enable or disable the collection of metrics."""
+    this.enabled = bool(active)
+    module_logger.info("Metrics %s.",
+                       'enabled' if this.enabled else 'disabled')
+
+
+def isEnabled():
+    """Check if metrics are collected."""
+    return this.enabled
+
+
+def count(name, value=1):
+    """Increase a counter."""
+    if not this.enabled:
+        return
+    with this.lock:
+        this.counters[name] = this.counters.get(name, 0) + value
+
+
+def observe(name, value, unit=''):
+    """Add a value to a histogram."""
+    if not this.enabled:
+        return
+    histogram = this.histograms.get(name)
+    if histogram is None:
+        histogram = getHistogram(name, unit)
+    histogram.add(value)
+
+
+def getHistogram(name, unit=''):
+    """Return a histogram and create it if required."""
+    with this.lock:
+        histogram = this.histograms.get(name)
+        if histogram is None:
+            histogram = Histogram(unit)
+            this.histograms[name] = histogram
+        return histogram
+
+
+def clock():
+    """Return the start of a measurement or zero while disabled."""
+    return time.perf_counter() if this.enabled else 0.0
+
+
+def stop(name, start):
+    """Add the duration since the start of a measurement."""
+    if not start:
+        return
+    value = time.perf_counter() - start
+    # Inlined observe, this runs for every signal of the match data.
+    histogram = this.histograms.get(name) or getHistogram(name, 's')
+    pending = histogram.pending
+    pending.append(value)
+    if len(pending) > 10000:
+        collect()
+
+
+def collect():
+    """Summarize the pending values of all histograms."""
+    with this.lock:
+        for histogram in this.histograms.values():
+            histogram.flush()
+
+
+def timer(name):
+    """Return a context manager that measures a duration."""
+    if not this.enabled:
+        return noTimer
+    return Timer(name)
+
+
+def timed(name):
+    """Decorate a function to measure its duration."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not this.enabled:
+                return func(*args, **kwargs)
+            with Timer(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def snapshot():
+    """Return the current state of all metrics."""
+    with this.lock:
+        for histogram in this.histograms.values():
+            histogram.flush()
+        return {'time': time.time(),
+                'uptime': time.time() - this.started,
+                'counters': dict(this.counters),
+                'histograms': {name: histogram.summary() for name, histogram
+                               in this.histograms.items()}}
+
+
+def reset():
+    """Clear all metrics."""
+    with this.lock:
+        this.started = time.time()
+        this.counters = dict()
+        this.histograms = dict()
+        this.history.clear()
+
+
+def getFile():
+    """Return the file the metrics are exported to."""
+    from hwctool.settings import getLogDir, profileManager
+    return os.path.join(getLogDir(), 'metrics-{}.json'.format(
+        profileManager.currentID()))
+
+
+def export(file=None):
+    """Write the latest snapshots to a json file."""
+    if file is None:
+        file = getFile()
+    this.history.append(snapshot())
+    os.makedirs(os.path.dirname(file), exist_ok=True)
+    tmp = '{}.{}.tmp'.format(file, uuid4().hex)
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'snapshots': list(this.history)}, f)
+    os.replace(tmp, file)
+
+
+class MetricsThread(TasksThread):
+    """Export the metrics periodically to a rolling json file."""
+
+    def __init__(self, interval=10):
+        """Init the thread."""
+        super().__init__()
+        self.setTimeout(interval)
+        self.addTask('export', self.__exportTask)
+
+    def __exportTask(self):
+        if not this.enabled:
+            return
+        try:
+            export()
+        except Exception as e:
+            module_logger.exception("message")
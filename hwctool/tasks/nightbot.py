@@ -1,9 +1,8 @@
 """Update Nightbot commands."""
 import logging
 
-import requests
-
 import hwctool.settings
+import hwctool.tasks.metrics as metrics
 
 # create logger
 module_logger = logging.getLogger('hwctool.tasks.nightbot')
@@ -17,9 +16,11 @@ def base_headers():
 previousMsg = dict()
 
 
+@metrics.timed('http.nightbot')
 def updateCommand(data):
     """Update command to message."""
     global previousMsg
+    import requests
 
     # Updates the twitch title specified in the config file
     try:
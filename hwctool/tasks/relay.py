@@ -0,0 +1,376 @@
+"""Relay the messages of the browser sources in separate processes.
+
+Usage: python hwctool/tasks/relay.py --upstream ws://localhost:PORT
+                                    --port PORT [--host HOST]
+
+A relay connects to the websocket server of the casting tool like a
+browser source, once per path, and serves any number of browser sources
+itself. The messages of the tool are sent once to each relay, such that
+the fan-out to many browser sources does not share the interpreter with
+the user interface. Browser sources connect to a relay by the url
+parameter port (and host), e.g. score.html?port=4490. The script only
+depends on websockets, such that it runs on other machines as well.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import logging.handlers
+import os
+import subprocess
+import sys
+from urllib.parse import parse_qs, urlsplit
+
+import websockets
+from websockets.extensions.permessage_deflate import \
+    ServerPerMessageDeflateFactory
+
+# create logger
+module_logger = logging.getLogger('hwctool.tasks.relay')
+
+# Messages that describe the state of a browser source by themselves.
+STATE_EVENTS = ['ENCODING', 'LOAD_ATLAS', 'CHANGE_STYLE', 'CHANGE_FONT']
+
+# Paths of the browser sources that are relayed by default.
+PATHS = ('score', 'intro', 'mapicons')
+
+# Limits of the websocket server like the defaults of the tool, a
+# window_bits of 0 turns the compression off.
+LIMITS = {'max_queue': 16, 'max_size': 10240, 'read_limit': 10240,
+          'write_limit': 65536, 'window_bits': 12}
+
+
+def serverOptions(limits):
+    """Return the options of websockets.serve for the limits."""
+    limits = dict(LIMITS, **limits)
+    options = {option: limits[option] for option in
+               ['max_queue', 'max_size', 'read_limit', 'write_limit']}
+    # Negotiate permessage-deflate with the settings below only.
+    options['compression'] = None
+    if limits['window_bits']:
+        # The window and the memory level are kept small, the memory
+        # of the compression is needed per connection.
+        bits = min(max(limits['window_bits'], 9), 15)
+        options['extensions'] = [ServerPerMessageDeflateFactory(
+            server_max_window_bits=bits,
+            client_max_window_bits=bits,
+            compress_settings={'memLevel': 5})]
+    return options
+
+
+def fanOut(clients, message):
+    """Write a message to clients without waiting for them."""
+    if hasattr(websockets, 'broadcast'):
+        websockets.broadcast(clients, message)
+    else:
+        for websocket in clients:
+            asyncio.ensure_future(websocket.send(message))
+
+
+class Channel:
+    """Mirror a path of the casting tool for the clients of a relay.
+
+    New clients receive the last message of each state event and the
+    last ALL_DATA with the changes after it, like they would from the
+    tool. If the changes exceed max_log, a fresh ALL_DATA is requested
+    over a second connection. Clients that reconnect with the sequence
+    number of their last message only get the messages they missed, as
+    does the relay from the tool.
+    """
+
+    def __init__(self, upstream, path, encoding='', max_log=256):
+        """Init with the url of the tool, the path and the encoding."""
+        self.base = '{}/{}'.format(upstream.rstrip('/'), path)
+        self.path = path
+        self.encoding = encoding
+        self.max_log = max_log
+        self.clients = set()
+        self.state = dict()
+        self.log = []
+        self.events = []
+        self.seq = None
+        self.since = None
+        self.websocket = None
+        self.__snapshot = None
+        self.task = asyncio.ensure_future(self.run())
+
+    def getUrl(self, seq=None):
+        """Return the url of the path at the tool."""
+        query = []
+        if self.encoding:
+            query.append('encoding=' + self.encoding)
+        if seq is not None:
+            query.append('seq={}'.format(seq))
+        if query:
+            return self.base + '?' + '&'.join(query)
+        return self.base
+
+    async def run(self):
+        """Stay connected to the tool."""
+        delay = 0.5
+        while True:
+            try:
+                async with websockets.connect(
+                        self.getUrl(self.seq), max_size=None) as websocket:
+                    module_logger.info("Connected to '%s'.", self.base)
+                    self.websocket = websocket
+                    delay = 0.5
+                    async for message in websocket:
+                        self.receive(message)
+            except (OSError, websockets.WebSocketException) as e:
+                module_logger.info("No connection to '%s': %s",
+                                   self.base, e)
+            self.websocket = None
+            await asyncio.sleep(delay)
+            delay = min(2 * delay, 10)
+
+    def receive(self, message):
+        """Keep the state and pass a message of the tool to the clients."""
+        event, seq = self.__parse(message)
+        if seq is not None:
+            if self.seq is None or not self.seq <= seq <= self.seq + 1:
+                # A snapshot, the messages in between were not received.
+                self.since = seq
+            self.seq = seq
+        item = (seq, message)
+        if event == 'ALL_DATA':
+            self.log = [item]
+        elif event in STATE_EVENTS:
+            self.state[event] = item
+        elif self.log:
+            self.log.append(item)
+            if self.__snapshot is not None:
+                self.__snapshot.append(item)
+            elif len(self.log) > self.max_log:
+                self.__snapshot = []
+                asyncio.ensure_future(self.__resync())
+        fanOut(self.clients, message)
+
+    async def __resync(self):
+        # The changes received while the new ALL_DATA is generated are
+        # kept after it, unless it contains them already.
+        try:
+            async with websockets.connect(
+                    self.getUrl(), max_size=None) as websocket:
+                async for message in websocket:
+                    event, seq = self.__parse(message)
+                    if event == 'ALL_DATA':
+                        self.log = [(seq, message)] + [
+                            item for item in self.__snapshot
+                            if seq is None or item[0] is None or
+                            item[0] > seq]
+                        break
+        except (OSError, websockets.WebSocketException) as e:
+            module_logger.info("Resync of '%s' failed: %s", self.base, e)
+        finally:
+            self.__snapshot = None
+
+    def __parse(self, message):
+        """Return the event and the sequence number of a message."""
+        try:
+            message = json.loads(message)
+            if isinstance(message, list):
+                # A message of the compact encoding.
+                event = message[0]
+                if isinstance(event, int):
+                    event = self.events[event]
+                return event, message[2] if len(message) > 2 else None
+            event = message.get('event', '')
+            if event == 'ENCODING':
+                self.events = message['data']['events']
+            return event, message.get('seq')
+        except (ValueError, AttributeError, LookupError, TypeError):
+            return '', None
+
+    def canResume(self, seq):
+        """Check if the messages after a sequence number are available."""
+        if seq is None or self.since is None or self.seq is None:
+            return False
+        lower = self.since
+        if self.log and self.log[0][0] is not None:
+            lower = max(lower, self.log[0][0])
+        return lower <= seq <= self.seq
+
+    def subscribe(self, websocket, seq=None):
+        """Send the state or the missed messages to a client and add it."""
+        items = list(self.state.values()) + self.log
+        if self.canResume(seq):
+            items = sorted((item for item in items
+                            if item[0] is not None and item[0] > seq),
+                           key=lambda item: item[0])
+        # Nothing is awaited in between, no message is missed or sent
+        # out of order.
+        for item in items:
+            fanOut([websocket], item[1])
+        self.clients.add(websocket)
+
+    async def forward(self, message):
+        """Pass a message of a client to the tool, e.g. a shown intro."""
+        if self.websocket is not None:
+            try:
+                await self.websocket.send(message)
+            except websockets.ConnectionClosed:
+                pass
+
+
+class Relay:
+    """Serve the browser sources on a port with the data of the tool."""
+
+    def __init__(self, upstream, port, host=None,
+                 paths=PATHS, limits=None):
+        """Init relay."""
+        self.upstream = upstream
+        self.port = port
+        self.host = host
+        self.paths = paths
+        self.limits = limits or dict()
+        self.channels = dict()
+
+    def getChannel(self, path, encoding=''):
+        """Return the channel of a path and encoding."""
+        key = (path, encoding)
+        if key not in self.channels:
+            self.channels[key] = Channel(self.upstream, path, encoding)
+        return self.channels[key]
+
+    async def handler(self, websocket, path):
+        url = urlsplit(path)
+        path = url.path.strip('/')
+        if path not in self.paths:
+            module_logger.info("Client with incorrect path.")
+            return
+        query = parse_qs(url.query)
+        encoding = query.get('encoding', [''])[0]
+        if encoding != 'compact':
+            encoding = ''
+        try:
+            seq = int(query.get('seq', [''])[0])
+        except ValueError:
+            seq = None
+        channel = self.getChannel(path, encoding)
+        channel.subscribe(websocket, seq)
+        module_logger.info("Client connected to '%s' (%d).",
+                           path, len(channel.clients))
+        try:
+            async for message in websocket:
+                await channel.forward(message)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            channel.clients.discard(websocket)
+        module_logger.info("Client disconnected from '%s' (%d).",
+                           path, len(channel.clients))
+
+    async def serve(self):
+        """Run the relay until it is cancelled."""
+        # Connect to the tool ahead of the first client.
+        for path in self.paths:
+            self.getChannel(path)
+        server = await websockets.serve(self.handler,
+                                        host=self.host,
+                                        port=self.port,
+                                        **serverOptions(self.limits))
+        module_logger.info('Relay listening on port %d.', self.port)
+        try:
+            await asyncio.Future()
+        finally:
+            server.close()
+            await server.wait_closed()
+
+
+class RelayManager:
+    """Start the relays of the config with the tool."""
+
+    def __init__(self):
+        """Init manager."""
+        self.processes = dict()
+
+    def start(self, upstream, ports, host=None, logdir='', limits=None):
+        """Start a relay process per port with the limits of the tool."""
+        if getattr(sys, 'frozen', False):
+            module_logger.warning(
+                'Relays have to be started from the sources.')
+            return
+        for port in ports:
+            if port in self.processes:
+                continue
+            command = [sys.executable, os.path.abspath(__file__),
+                       '--upstream', upstream, '--port', str(port)]
+            if host:
+                command += ['--host', host]
+            if limits:
+                command += ['--limits', json.dumps(limits)]
+            if logdir:
+                command += ['--log', os.path.join(
+                    logdir, 'relay-{}.log'.format(port))]
+            try:
+                self.processes[port] = subprocess.Popen(
+                    command,
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL)
+                module_logger.info('Started relay on port %d.', port)
+            except Exception as e:
+                module_logger.exception("message")
+
+    def stop(self):
+        """Stop all relays."""
+        for port, process in self.processes.items():
+            process.terminate()
+        for port, process in self.processes.items():
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self.processes = dict()
+
+
+def parsePorts(value):
+    """Return the ports of a comma separated list."""
+    ports = []
+    for item in value.split(','):
+        item = item.strip()
+        if item.isdigit() and 0 < int(item) < 65536:
+            ports.append(int(item))
+    return ports
+
+
+def main():
+    """Run a relay."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--upstream', required=True,
+                        help='websocket server of the tool')
+    parser.add_argument('--port', type=int, required=True)
+    parser.add_argument('--host', help='address to listen on')
+    parser.add_argument('--path', action='append',
+                        help='paths to relay (default: {})'.format(
+                            ', '.join(PATHS)))
+    parser.add_argument('--limits', type=json.loads, default=dict(),
+                        help='limits of the server as json, e.g. '
+                             '\'{"max_size": 10240, "window_bits": 0}\'')
+    parser.add_argument('--log', help='write the log to a file')
+    args = parser.parse_args()
+
+    logger = logging.getLogger('hwctool')
+    logger.setLevel(logging.INFO)
+    if args.log:
+        handler = logging.handlers.RotatingFileHandler(
+            args.log, maxBytes=1024 * 1024, backupCount=1,
+            encoding='utf-8')
+    else:
+        handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(
+        '%(asctime)s, %(name)s, %(levelname)s: %(message)s',
+        datefmt="%Y-%m-%d %H:%M:%S"))
+    logger.addHandler(handler)
+
+    relay = Relay(args.upstream, args.port, args.host,
+                  args.path or PATHS, args.limits)
+    try:
+        asyncio.run(relay.serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
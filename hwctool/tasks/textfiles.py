@@ -3,6 +3,7 @@ import logging
 import queue
 
 import hwctool.settings
+import hwctool.tasks.metrics as metrics
 from hwctool.tasks.tasksthread import TasksThread
 
 # from PyQt5.QtCore import pyqtSignal
@@ -23,6 +24,7 @@ class TextFilesThread(TasksThread):
         self._available_items = ['team', 'score', 'meta', 'league']
         self._matchData.dataChanged.connect(self.put)
         self._matchData.metaChangedSignal.connect(self.put)
+        self._matchData.changeSetCommitted.connect(self.putChangeSet)
         self.addTask('write', self.__writeTask)
         self.activateTask('write')
 
@@ -30,39 +32,52 @@ class TextFilesThread(TasksThread):
         if item in self._available_items:
             self._q.put(item)
 
+    def putChangeSet(self, changes):
+        """Queue the files of all changed items at once."""
+        if 'meta' in changes:
+            self.put('meta')
+            return
+        for item in changes.keys:
+            self.put(item)
+
     def __writeTask(self):
         try:
             item = self._q.get(timeout=0.5)
-            if item == "team":
-                self.__writeTeam()
-            elif item == "score":
-                self.__writeScore()
-            else:
-                self.__writeTeam()
-                self.__writeScore()
-                self.__writeLeague()
+            with metrics.timer('textfiles.write'):
+                if item == "team":
+                    self.__writeTeam()
+                elif item == "score":
+                    self.__writeScore()
+                else:
+                    self.__writeTeam()
+                    self.__writeScore()
+                    self.__writeLeague()
         except queue.Empty:
             pass
         finally:
             pass
 
+    def __getTeams(self):
+        match = self._matchData
+        return ([match.getTeamOrPlayer(idx) for idx in range(2)],
+                [match.getTeamTag(idx) for idx in range(2)])
+
     def __writeTeam(self):
+        # The names and tags of both teams are read at once.
+        teams, tags = self._matchData.read(self.__getTeams)
         file = hwctool.settings.getAbsPath(
             hwctool.settings.casting_data_dir +
             "/teams_vs_long.txt")
         with open(file, mode='w', encoding='utf-8') as f:
-            f.write(self._matchData.getTeamOrPlayer(0) + ' vs ' +
-                    self._matchData.getTeamOrPlayer(1) + "\n")
+            f.write(teams[0] + ' vs ' + teams[1] + "\n")
 
         file = hwctool.settings.getAbsPath(
             hwctool.settings.casting_data_dir +
             "/teams_vs_short.txt")
         with open(file, mode='w', encoding='utf-8') as f:
-            f.write(self._matchData.getTeamTag(0) + ' vs ' +
-                    self._matchData.getTeamTag(1) + "\n")
+            f.write(tags[0] + ' vs ' + tags[1] + "\n")
 
-        for idx in range(2):
-            team = self._matchData.getTeamOrPlayer(idx)
+        for idx, team in enumerate(teams):
             file = hwctool.settings.getAbsPath(
                 hwctool.settings.casting_data_dir +
                 "/team{}.txt".format(idx + 1))
@@ -73,7 +88,7 @@ class TextFilesThread(TasksThread):
         file = hwctool.settings.getAbsPath(
             hwctool.settings.casting_data_dir + "/score.txt")
         try:
-            score = self._matchData.getScore()
+            score = self._matchData.read(self._matchData.getScore)
             score_str = str(score[0]) + " - " + str(score[1])
         except Exception:
             score_str = "0 - 0"
@@ -84,7 +99,7 @@ class TextFilesThread(TasksThread):
         file = hwctool.settings.getAbsPath(
             hwctool.settings.casting_data_dir + "/league.txt")
         with open(file, mode='w', encoding='utf-8') as f:
-            f.write(self._matchData.getLeague())
+            f.write(self._matchData.read(self._matchData.getLeague))
 
 
 class SetQueue(queue.Queue):
@@ -7,6 +7,7 @@ import random
 import requests
 
 import hwctool.settings
+import hwctool.tasks.metrics as metrics
 
 module_logger = logging.getLogger(
     'hwctool.settings.texttospeech')  # create logger
@@ -23,10 +24,12 @@ class TextToSpeech:
         self.defineOptions()
         self.loadJson()
 
+    @metrics.timed('tts.synthesize')
     def synthesize(self, ssml, voice, pitch=0.00, rate=1.00):
 
         cache = self.searchCache(ssml, voice, pitch, rate)
         if cache:
+            metrics.count('tts.cache_hits')
             return cache
         file = self.newCacheItem(ssml, voice, pitch, rate)
 
@@ -1,9 +1,8 @@
 """Update the twitch title to the title specified in the config file."""
 import logging
 
-import requests
-
 import hwctool.settings
+import hwctool.tasks.metrics as metrics
 
 
 # create logger
@@ -12,9 +11,11 @@ module_logger = logging.getLogger(__name__)
 previousTitle = None
 
 
+@metrics.timed('http.twitch')
 def updateTitle(newTitle):
     """Update the twitch title to the title specified in the config file."""
     global previousTitle
+    import requests
 
     try:
         twitchChannel = hwctool.settings.config.parser.get(
@@ -67,6 +68,7 @@ def updateTitle(newTitle):
 
 def getUserID(login):
     """Get a user's ID from twitch API."""
+    import requests
     client_id = hwctool.settings.safe.get('twitch-client-id')
     url = 'https://api.twitch.tv/helix/users'
     oauth = hwctool.settings.config.parser.get("Twitch", "oauth")
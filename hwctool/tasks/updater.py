@@ -1,14 +1,18 @@
 """Get info about latest version and download it in the background."""
 
+import gzip
+import hashlib
 import json
 import logging
 import os
+import shutil
 import sys
 import tarfile
+import tempfile
+import time
 import zipfile
 
 from PyQt5.QtCore import pyqtSignal
-from pyupdater.client import Client
 
 import hwctool
 from hwctool.settings.client_config import ClientConfig
@@ -16,6 +20,14 @@ from hwctool.tasks.tasksthread import TasksThread
 
 module_logger = logging.getLogger('hwctool.tasks.updater')
 
+# Manifest of the data files next to the pyupdater archives.
+DATA_MANIFEST = 'HWCT-data-manifest.json'
+
+# Seconds until a cached update manifest is fetched again.
+MANIFEST_TTL = 6 * 60 * 60
+# Timeout in seconds to fetch an update manifest.
+MANIFEST_TIMEOUT = 5
+
 
 def compareVersions(v1, v2, maximum=5):
     """Compare two versions."""
@@ -105,6 +117,164 @@ def setRestartFlag(flag=True):
         pass
 
 
+class ManifestDownloader:
+    """Download files for pyupdater and cache the update manifests."""
+
+    def __init__(self, max_age=None, timeout=None):
+        """Init the downloader."""
+        self.max_age = MANIFEST_TTL if max_age is None else max_age
+        self.timeout = MANIFEST_TIMEOUT if timeout is None else timeout
+        self.client = None
+
+    def __call__(self, filename, urls, hexdigest=None):
+        """Return a file downloader as expected by pyupdater."""
+        from pyupdater.client.downloader import FileDownloader
+        if filename in self.manifests():
+            return CachedManifest(self, filename, urls)
+        return FileDownloader(
+            filename, urls, hexdigest=hexdigest,
+            max_download_retries=ClientConfig.MAX_DOWNLOAD_RETRIES,
+            http_timeout=ClientConfig.HTTP_TIMEOUT,
+            progress_hooks=self.client.progress_hooks)
+
+    def manifests(self):
+        """Return the file names of the update manifests."""
+        if self.client is None:
+            return []
+        return [self.client.key_file, self.client.version_file,
+                self.client.version_file_compat]
+
+    def cacheFile(self):
+        """Return the file that stores when the manifests were fetched."""
+        return os.path.join(self.client.data_dir, 'manifest-cache.json')
+
+    def loadTimes(self):
+        """Read when the manifests were fetched."""
+        try:
+            with open(self.cacheFile(), 'r', encoding='utf-8-sig') as f:
+                data = json.load(f)
+                if isinstance(data, dict):
+                    return data
+        except Exception:
+            pass
+        return dict()
+
+    def setTime(self, filename):
+        """Remember that a manifest was fetched now."""
+        data = self.loadTimes()
+        data[filename] = time.time()
+        try:
+            with open(self.cacheFile(), 'w', encoding='utf-8-sig') as o:
+                json.dump(data, o)
+        except Exception as e:
+            module_logger.exception("message")
+
+    def isFresh(self, filename):
+        """Check if a manifest was fetched within the TTL."""
+        age = time.time() - self.loadTimes().get(filename, 0)
+        return age <= self.max_age
+
+    def readCache(self, filename, fresh=True):
+        """Return a cached manifest or None."""
+        if fresh and not self.isFresh(filename):
+            return None
+        file = os.path.join(self.client.data_dir, filename)
+        try:
+            with open(file, 'rb') as f:
+                data = f.read()
+            # Skip empty manifests written after failed downloads.
+            if gzip.decompress(data):
+                return data
+        except (OSError, EOFError):
+            pass
+        return None
+
+
+class CachedManifest:
+    """Fetch an update manifest unless the cached one is fresh."""
+
+    def __init__(self, downloader, filename, urls):
+        """Init the manifest."""
+        self.__downloader = downloader
+        self.filename = filename
+        self.urls = urls
+
+    def download_verify_return(self):
+        """Return the manifest from cache or the update server."""
+        from pyupdater.client.downloader import FileDownloader
+        data = self.__downloader.readCache(self.filename)
+        if data is not None:
+            module_logger.info(
+                "Using cached update manifest {}.".format(self.filename))
+            return data
+        client = self.__downloader.client
+        if self.filename == client.version_file and\
+                self.__downloader.isFresh(client.version_file_compat):
+            # The server only provides the fresh compatible manifest.
+            raise ConnectionError(
+                "Update manifest {} is not available.".format(self.filename))
+        data = FileDownloader(self.filename, self.urls,
+                              max_download_retries=1,
+                              http_timeout=self.__downloader.timeout
+                              ).download_verify_return()
+        if data is not None:
+            self.__downloader.setTime(self.filename)
+            return data
+        data = self.__downloader.readCache(self.filename, fresh=False)
+        if data is None:
+            # pyupdater would treat None as an empty manifest.
+            raise ConnectionError(
+                "Could not fetch update manifest {}.".format(self.filename))
+        module_logger.warning(
+            "Using outdated update manifest {}.".format(self.filename))
+        return data
+
+
+def createClient(progress_hook=None, data_dir=None):
+    """Create a pyupdater client with cached update manifests."""
+    from pyupdater.client import Client
+    downloader = ManifestDownloader()
+    client = Client(ClientConfig(), downloader=downloader, data_dir=data_dir)
+    downloader.client = client
+    if progress_hook is not None:
+        client.add_progress_hook(progress_hook)
+    return client
+
+
+class ProgressReader:
+    """Count the bytes read from a file object."""
+
+    def __init__(self, fileobj, total, handler, start=10, end=95):
+        """Init the reader."""
+        self.__fileobj = fileobj
+        self.__total = max(total, 1)
+        self.__handler = handler
+        self.__start = start
+        self.__end = end
+        self.__last = None
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        """Read from the file object and report the progress."""
+        data = self.__fileobj.read(size)
+        self.bytes_read += len(data)
+        progress = self.__start + (self.__end - self.__start) * \
+            min(self.bytes_read, self.__total) // self.__total
+        if progress != self.__last:
+            self.__last = progress
+            self.__handler(progress)
+        return data
+
+
+def hashFile(file):
+    """Return the sha256 hash of a file."""
+    sha = hashlib.sha256()
+    with open(file, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
 def extractData(asset_update, handler=lambda x: None):
     """Extract data."""
     handler(10)
@@ -113,19 +283,223 @@ def extractData(asset_update, handler=lambda x: None):
                             asset_update.filename)
         targetdir = hwctool.settings.profileManager.profiledir()
         with zipfile.ZipFile(file, "r") as zip:
-            zip.extractall(targetdir)
-        handler(50)
-        file = os.path.join(targetdir,
-                            'HWCT-data')
-        with tarfile.open(file, "r") as tar:
-            tar.extractall(targetdir)
-        handler(90)
-        os.remove(file)
-        handler(95)
+            info = zip.getinfo(VersionHandler.ASSET_NAME)
+            with zip.open(info) as fileobj:
+                reader = ProgressReader(fileobj, info.file_size, handler)
+                written, skipped = extractTar(reader, targetdir)
+        module_logger.info("Extracted {} files, {} unchanged.".format(
+            written, skipped))
         setDataVersion(asset_update.latest)
         handler(100)
 
 
+def extractTar(fileobj, targetdir):
+    """Stream a tar into targetdir and only replace changed files."""
+    staging = tempfile.mkdtemp(prefix='.HWCT-data-', dir=targetdir)
+    root = os.path.realpath(targetdir)
+    staged = []
+    skipped = 0
+    try:
+        with tarfile.open(fileobj=fileobj, mode='r|*') as tar:
+            for member in tar:
+                if not member.isfile():
+                    continue
+                target = os.path.realpath(os.path.join(root, member.name))
+                if not target.startswith(root + os.sep):
+                    module_logger.warning(
+                        "Skipping {} outside of the profile.".format(
+                            member.name))
+                    continue
+                data = tar.extractfile(member).read()
+                if os.path.isfile(target) and \
+                        os.path.getsize(target) == len(data) and \
+                        hashFile(target) == \
+                        hashlib.sha256(data).hexdigest():
+                    skipped += 1
+                    continue
+                file = os.path.join(staging, str(len(staged)))
+                with open(file, 'wb') as o:
+                    o.write(data)
+                staged.append((file, target))
+
+        replaceFiles(staged)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    return len(staged), skipped
+
+
+def replaceFiles(staged):
+    """Move staged files to their targets, all or none of them.
+
+    The replaced targets are kept next to the staged files until all
+    files are in place and are restored if a move fails.
+    """
+    done = []
+    try:
+        for file, target in staged:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            backup = None
+            if os.path.lexists(target):
+                backup = file + '.bak'
+                os.replace(target, backup)
+            done.append((target, backup))
+            os.replace(file, target)
+    except Exception:
+        for target, backup in reversed(done):
+            try:
+                if backup is None:
+                    if os.path.lexists(target):
+                        os.remove(target)
+                else:
+                    os.replace(backup, target)
+            except Exception as e:
+                module_logger.exception("message")
+        raise
+
+
+def getTarget(targetdir, path):
+    """Return the absolute target of a data file inside targetdir."""
+    root = os.path.realpath(targetdir)
+    target = os.path.realpath(os.path.join(root, path))
+    if not target.startswith(root + os.sep):
+        raise ValueError("Data file {} is outside of the profile.".format(
+            path))
+    return target
+
+
+def loadDataIndex(targetdir, paths, index_file):
+    """Return the hash of the local data files, reusing cached hashes."""
+    try:
+        with open(index_file, 'r', encoding='utf-8-sig') as f:
+            cache = json.load(f)
+    except Exception:
+        cache = dict()
+
+    index = dict()
+    for path in paths:
+        try:
+            stat = os.stat(getTarget(targetdir, path))
+        except (OSError, ValueError):
+            continue
+        entry = cache.get(path, dict())
+        if entry.get('size') != stat.st_size or \
+                entry.get('mtime') != stat.st_mtime_ns:
+            entry = {'sha256': hashFile(getTarget(targetdir, path)),
+                     'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+        index[path] = entry
+    return index
+
+
+def saveDataIndex(targetdir, index, index_file):
+    """Write the local data index."""
+    for path, entry in index.items():
+        try:
+            entry['mtime'] = os.stat(getTarget(targetdir, path)).st_mtime_ns
+        except OSError:
+            pass
+    with open(index_file, 'w', encoding='utf-8-sig') as o:
+        json.dump(index, o)
+
+
+def verifyManifest(manifest, app_key):
+    """Check the signature of a data manifest with the app key.
+
+    The app key is verified by pyupdater against the public key of the
+    client config, the manifest is signed like the version file.
+    """
+    from nacl.signing import VerifyKey
+    from pyupdater.utils.encoding import UnpaddedBase64Encoder
+    if not app_key:
+        raise ValueError('The app key is not verified.')
+    manifest = dict(manifest)
+    signature = manifest.pop('signature', None)
+    if not signature:
+        raise ValueError('The data manifest is not signed.')
+    if not isinstance(app_key, bytes):
+        app_key = app_key.encode('utf-8')
+    data = json.dumps(manifest, sort_keys=True).encode('utf-8')
+    try:
+        VerifyKey(app_key, UnpaddedBase64Encoder).verify(
+            data, UnpaddedBase64Encoder.decode(signature))
+    except Exception:
+        raise ValueError('Invalid signature of the data manifest.')
+
+
+def deltaUpdate(version, targetdir, index_file, app_key,
+                handler=lambda x: None, urls=None):
+    """Update the data files by fetching only the changed blobs."""
+    import requests
+    if urls is None:
+        urls = ClientConfig.UPDATE_URLS
+
+    manifest = None
+    for url in urls:
+        try:
+            response = requests.get(url + DATA_MANIFEST,
+                                    timeout=MANIFEST_TIMEOUT)
+            response.raise_for_status()
+            manifest = response.json()
+            break
+        except Exception as e:
+            module_logger.info("Data manifest not available at {}: {}".format(
+                url, e))
+    if manifest is None or manifest.get('version') != version:
+        raise ValueError('No data manifest for version {}.'.format(version))
+    # The hashes of the blobs are only trusted with a valid signature.
+    verifyManifest(manifest, app_key)
+
+    files = manifest['files']
+    index = loadDataIndex(targetdir, files.keys(), index_file)
+    changed = [path for path, entry in files.items()
+               if index.get(path, dict()).get('sha256') != entry['sha256']]
+    total = max(sum(files[path]['size'] for path in changed), 1)
+    module_logger.info("{} of {} data files changed.".format(
+        len(changed), len(files)))
+
+    staging = tempfile.mkdtemp(prefix='.HWCT-data-', dir=targetdir)
+    staged = []
+    done = 0
+    try:
+        for path in changed:
+            entry = files[path]
+            target = getTarget(targetdir, path)
+            data = fetchBlob(urls, entry['sha256'])
+            file = os.path.join(staging, str(len(staged)))
+            with open(file, 'wb') as o:
+                o.write(data)
+            staged.append((file, target))
+            index[path] = {'sha256': entry['sha256'], 'size': len(data)}
+            done += len(data)
+            handler(10 + 85 * min(done, total) // total)
+        replaceFiles(staged)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    saveDataIndex(targetdir, index, index_file)
+    handler(100)
+    return len(changed)
+
+
+def fetchBlob(urls, sha256):
+    """Download a content-addressed blob and verify its hash."""
+    import requests
+    for url in urls:
+        try:
+            response = requests.get(
+                '{}blobs/{}/{}'.format(url, sha256[:2], sha256),
+                timeout=ClientConfig.HTTP_TIMEOUT)
+            response.raise_for_status()
+        except Exception as e:
+            module_logger.info("Blob not available at {}: {}".format(url, e))
+            continue
+        if hashlib.sha256(response.content).hexdigest() == sha256:
+            return response.content
+        module_logger.warning("Blob {} from {} is corrupt.".format(
+            sha256, url))
+    raise ValueError('Could not fetch blob {}.'.format(sha256))
+
+
 class VersionHandler(TasksThread):
     """Check for new version and update or notify."""
 
@@ -142,7 +516,7 @@ class VersionHandler(TasksThread):
     ASSET_NAME = 'HWCT-data'
     ASSET_VERSION = '0.0.0'
 
-    client = Client(ClientConfig())
+    client = None
 
     app_update = None
     asset_update = None
@@ -170,15 +544,23 @@ class VersionHandler(TasksThread):
         """Process progress updates."""
         self.progress.emit(data)
 
+    def getClient(self):
+        """Create the pyupdater client on first use."""
+        if self.client is None:
+            self.client = createClient(self.update_progress)
+        return self.client
+
     def __version_check(self):
         try:
-            self.client.add_progress_hook(self.update_progress)
-            self.client.refresh()
+            self.getClient().refresh()
             self.ASSET_VERSION = getDataVersion()
             channel = getChannel(self.APP_VERSION)
             self.app_update = self.client.update_check(self.APP_NAME,
                                                        self.APP_VERSION,
                                                        channel=channel)
+            self.asset_update = self.client.update_check(self.ASSET_NAME,
+                                                         self.ASSET_VERSION,
+                                                         channel=channel)
             if self.asset_update is not None:
                 self.newData.emit(self.asset_update.latest)
                 module_logger.info("Asset: " + self.asset_update.latest)
@@ -203,8 +585,18 @@ class VersionHandler(TasksThread):
             if self.asset_update is None:
                 self.deactivateTask('update_data')
                 return
-            self.asset_update.download()
-            extractData(self.asset_update)
+            try:
+                deltaUpdate(self.asset_update.latest,
+                            hwctool.settings.profileManager.profiledir(),
+                            hwctool.settings.getJsonFile('dataindex'),
+                            self.client.app_key)
+                setDataVersion(self.asset_update.latest)
+            except Exception as e:
+                module_logger.info(
+                    "Delta update failed, downloading full archive: "
+                    "{}".format(e))
+                self.asset_update.download()
+                extractData(self.asset_update)
             module_logger.info("Updated data files!")
             self.updated_data.emit(_("Updated data files!"))
         except Exception as e:
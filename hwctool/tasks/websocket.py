@@ -3,6 +3,12 @@ import asyncio
 import json
 import logging
 import re
+import statistics
+import threading
+import time
+from collections import deque, namedtuple
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
 from uuid import uuid4
 
 import keyboard
@@ -10,32 +16,75 @@ import websockets
 from PyQt5.QtCore import QThread, pyqtSignal
 
 import hwctool.settings
+import hwctool.tasks.control
+import hwctool.tasks.encoding as encoding
+import hwctool.tasks.metrics as metrics
+import hwctool.tasks.relay as relay
+from hwctool.tasks.fileserver import FileServer
 
 # create logger
 module_logger = logging.getLogger('hwctool.tasks.websocket')
 
+# Events that are not replayed to clients that reconnect.
+TRANSIENT_EVENTS = ['SHOW_INTRO', 'DEBUG_MODE']
+
+# The encoded state of a scope after the message with the sequence number,
+# the messages are indexed by the use of the compact encoding.
+Snapshot = namedtuple('Snapshot', ['seq', 'messages'])
+
+
+def summarize(durations):
+    """Return statistics in ms of a sequence of durations in seconds."""
+    durations = sorted(durations)
+    if not durations:
+        return dict()
+    return {'count': len(durations),
+            'mean_ms': statistics.mean(durations) * 1000,
+            'p50_ms': durations[len(durations) // 2] * 1000,
+            'p99_ms': durations[int(len(durations) * 0.99)] * 1000,
+            'max_ms': durations[-1] * 1000}
+
 
 class WebsocketThread(QThread):
     """Thread for websocket interaction."""
 
-    keyboard_state = dict()
+    pressed_keys = set()
     hooked_keys = dict()
     socketConnectionChanged = pyqtSignal(int, str)
-    valid_scopes = ['score', 'intro']
+    valid_scopes = ['score', 'intro', 'mapicons']
     mapicon_sets = dict()
     scopes = dict()
     intro_state = ''
     introShown = pyqtSignal()
+    controlRequested = pyqtSignal(list)
 
     def __init__(self, controller):
         """Init thread."""
         QThread.__init__(self)
         self.connected = dict()
+        self.compact = set()
+        # Sequence numbers start at the time in ms, such that the numbers
+        # of a former run of the tool are out of the replay window.
+        self.__epoch = int(time.time() * 1000)
+        self.__sequenceLock = threading.RLock()
+        self.sequences = dict()
+        self.replay = dict()
+        self.snapshots = dict()
+        self.replay_size = hwctool.settings.config.parser.getint(
+            "Websocket", "replay_size")
         self.__loop = None
+        self.__loopThread = None
         self.__controller = controller
+        self.__fileServer = FileServer()
         self.setup_scopes()
         self._hotkeys_active = False
         self.hooked_keys['intro'] = set()
+        self.intro_payloads = dict()
+        self.intro_idx = 0
+        self.intro_latency = deque(maxlen=1000)
+        self.key_events = deque()
+        self.hook_duration = deque(maxlen=1000)
+        self.__keysQueued = False
 
     def setup_scopes(self):
         self.scope_regex = re.compile(r'_\[\d-\d\]')
@@ -51,19 +100,21 @@ class WebsocketThread(QThread):
         module_logger.info("WebSocketThread starting!")
         self.connected = dict()
         self.__loop = asyncio.new_event_loop()
+        self.__loopThread = threading.get_ident()
         asyncio.set_event_loop(self.__loop)
 
         port = int(hwctool.settings.profileManager.currentID(), 16)
-        module_logger.info(
-            'Starting Websocket Server with port {}.'.format(port))
+        module_logger.info('Starting Websocket Server with port %d.', port)
+        if hwctool.settings.config.parser.getboolean("Control", "remote"):
+            host = None
+        else:
+            host = 'localhost'
         # Create the server.
         start_server = websockets.serve(self.handler,
-                                        host='localhost',
+                                        host=host,
                                         port=port,
-                                        max_queue=16,
-                                        max_size=10240,
-                                        read_limit=10240,
-                                        write_limit=10240)
+                                        process_request=self.process_request,
+                                        **self.getServerOptions())
         self.__server = self.__loop.run_until_complete(start_server)
         self.__loop.run_forever()
 
@@ -74,23 +125,57 @@ class WebsocketThread(QThread):
 
         module_logger.info("WebSocketThread finished!")
 
+    @staticmethod
+    def getLimits():
+        """Return the limits and the compression window of the config."""
+        parser = hwctool.settings.config.parser
+        limits = dict()
+        for option in ['max_queue', 'max_size', 'read_limit', 'write_limit']:
+            limits[option] = parser.getint("Websocket", option)
+        if parser.getboolean("Websocket", "compression"):
+            limits['window_bits'] = min(max(
+                parser.getint("Websocket", "window_bits"), 9), 15)
+        else:
+            limits['window_bits'] = 0
+        return limits
+
+    @staticmethod
+    def getServerOptions():
+        """Return the limits and the compression of the server."""
+        return relay.serverOptions(WebsocketThread.getLimits())
+
     def stop(self):
         if self.__loop is not None:
             module_logger.info("Requesting stop of WebsocketThread.")
             self.__loop.call_soon_threadsafe(self.__loop.stop)
 
     def __callback_on_hook(self, scan_code, is_keypad, e, callback):
+        # Runs in the global hook thread of the keyboard library and
+        # delays every key event, thus the event is only queued here.
+        key_time = time.perf_counter()
         if e.is_keypad == is_keypad:
-            if e.event_type == keyboard.KEY_DOWN:
-                if((scan_code, is_keypad) not in self.keyboard_state or
-                   self.keyboard_state[(scan_code, is_keypad)]):
-                    try:
-                        callback()
-                    except Exception as e:
-                        module_logger.exception("message")
-                self.keyboard_state[(scan_code, is_keypad)] = False
-            if e.event_type == keyboard.KEY_UP:
-                self.keyboard_state[(scan_code, is_keypad)] = True
+            self.key_events.append((key_time, scan_code, is_keypad,
+                                    e.event_type, callback))
+            if not self.__keysQueued and self.__loop is not None:
+                self.__keysQueued = True
+                self.__loop.call_soon_threadsafe(self.__processKeyEvents)
+        self.hook_duration.append(time.perf_counter() - key_time)
+
+    def __processKeyEvents(self):
+        self.__keysQueued = False
+        while self.key_events:
+            key_time, scan_code, is_keypad, event_type, callback = \
+                self.key_events.popleft()
+            key = (scan_code, is_keypad)
+            if event_type == keyboard.KEY_UP:
+                self.pressed_keys.discard(key)
+            elif key not in self.pressed_keys:
+                # Ignore the repeated key down events of a held key.
+                self.pressed_keys.add(key)
+                try:
+                    callback(key_time)
+                except Exception as e:
+                    module_logger.exception("message")
 
     def __register_hotkey(self, hotkey, callback, scope='intro'):
         if isinstance(hotkey, str):
@@ -125,21 +210,22 @@ class WebsocketThread(QThread):
                     hwctool.settings.config.parser.get(
                         "Intros", "hotkey_player2"))
                 if player1 == player2:
-                    self.__register_hotkey(player1,
-                                           lambda: self.showIntro(-1))
+                    self.__register_hotkey(
+                        player1, lambda key_time: self.showIntro(-1, key_time))
                 else:
-                    self.__register_hotkey(player1,
-                                           lambda: self.showIntro(0))
+                    self.__register_hotkey(
+                        player1, lambda key_time: self.showIntro(0, key_time))
 
-                    self.__register_hotkey(player2,
-                                           lambda: self.showIntro(1))
+                    self.__register_hotkey(
+                        player2, lambda key_time: self.showIntro(1, key_time))
 
                 self.__register_hotkey(
                     hwctool.settings.config.parser.get(
                         "Intros", "hotkey_debug"),
-                    lambda: self.sendData2Path("intro", "DEBUG_MODE", dict()))
+                    lambda key_time: self.sendData2Path(
+                        "intro", "DEBUG_MODE", dict()))
 
-        module_logger.info('Registered {} hotkeys.'.format(scope))
+        module_logger.info('Registered %s hotkeys.', scope)
 
     def unregister_hotkeys(self, scope='', force=False):
         if not scope:
@@ -150,7 +236,7 @@ class WebsocketThread(QThread):
                     keyboard.unhook_all()
                 except AttributeError:
                     pass
-            self.keyboard_state = dict()
+            self.pressed_keys = set()
         else:
             while self.hooked_keys[scope]:
                 try:
@@ -158,10 +244,10 @@ class WebsocketThread(QThread):
                 except ValueError:
                     pass
 
-            module_logger.info('Unregistered {} hotkeys.'.format(scope))
+            module_logger.info('Unregistered %s hotkeys.', scope)
 
     def handle_path(self, path):
-        paths = path.split('/')[1:]
+        paths = urlsplit(path).path.split('/')[1:]
 
         for path in paths:
             for scope in self.valid_scopes:
@@ -177,23 +263,95 @@ class WebsocketThread(QThread):
                 return self.scope_regex.sub('', scope)
         return ''
 
+    async def process_request(self, path, request_headers):
+        if request_headers.get('Upgrade', '').lower() != 'websocket':
+            if path.startswith('/control'):
+                return hwctool.tasks.control.processRequest(
+                    path, request_headers, self.controlRequested.emit)
+            if path.split('?')[0] == '/metrics' and metrics.isEnabled():
+                return self.processMetricsRequest(path, request_headers)
+            response = self.__fileServer.processRequest(
+                path, request_headers)
+            if response is None:
+                response = (HTTPStatus.NOT_FOUND, [], b'File not found.')
+            return response
+        if not path.startswith('/control'):
+            return None
+        token = hwctool.tasks.control.getToken(path, request_headers)
+        if not hwctool.tasks.control.isActive():
+            return hwctool.tasks.control.response(
+                HTTPStatus.NOT_FOUND, {'error': 'Not found.'})
+        if not hwctool.tasks.control.checkToken(token):
+            return hwctool.tasks.control.response(
+                HTTPStatus.UNAUTHORIZED, {'error': 'Invalid token.'})
+        return None
+
+    def processMetricsRequest(self, path, request_headers):
+        """Serve the metrics, remotely only with the control token."""
+        control = hwctool.tasks.control
+        if (hwctool.settings.config.parser.getboolean("Control", "remote")
+                and not control.checkToken(
+                    control.getToken(path, request_headers))):
+            return control.response(
+                HTTPStatus.UNAUTHORIZED, {'error': 'Invalid token.'})
+        return control.response(HTTPStatus.OK, metrics.snapshot())
+
+    async def control_handler(self, websocket):
+        module_logger.info("Remote control connected!")
+        while True:
+            try:
+                msg = await websocket.recv()
+            except websockets.ConnectionClosed:
+                break
+            try:
+                commands = hwctool.tasks.control.parseCommands(
+                    json.loads(msg))
+            except ValueError as e:
+                await websocket.send(json.dumps({'error': str(e)}))
+                continue
+            self.controlRequested.emit(commands)
+            await websocket.send(json.dumps({'accepted': len(commands)}))
+        module_logger.info("Remote control disconnected!")
+
     async def handler(self, websocket, path):
+        if path.startswith('/control'):
+            await self.control_handler(websocket)
+            return
+        query = parse_qs(urlsplit(path).query)
         path = self.handle_path(path)
         if not path:
             module_logger.info("Client with incorrect path.")
             return
-        self.registerConnection(websocket, path)
-        module_logger.info("Client connected!")
+        if query.get('encoding', [''])[0] == 'compact':
+            self.compact.add(websocket)
+            await websocket.send(encoding.header())
         primary_scope = self.get_primary_scope(path)
-        if primary_scope == 'score':
-            data = self.__controller.matchData.getScoreData()
-            self.sendData2WS(websocket, "ALL_DATA", data)
+        # No message is sent to the path in between, the replay or the
+        # snapshot is followed by the next message in order.
+        with self.__sequenceLock, metrics.timer('websocket.join'):
+            missed = self.getMissed(primary_scope,
+                                    query.get('seq', [''])[0])
+            self.registerConnection(websocket, path)
+            if missed is None:
+                self.sendSnapshot(websocket, primary_scope)
+            else:
+                for seq, event, data, state in missed:
+                    self.__send([websocket], event, data, state, seq)
+        if missed is None:
+            metrics.count('websocket.snapshots')
+            module_logger.info("Client connected!")
+        else:
+            metrics.count('websocket.resumed')
+            metrics.count('websocket.replayed', len(missed))
+            module_logger.info(
+                "Client resumed with %d missed messages.", len(missed))
 
         while True:
             try:
                 msg = await asyncio.wait_for(websocket.recv(), timeout=20)
                 if msg == self.intro_state:
                     self.intro_state = ''
+                    self.intro_idx = (self.intro_idx + 1) % 2
                     self.introShown.emit()
             except asyncio.TimeoutError:
                 try:
@@ -211,6 +369,78 @@ class WebsocketThread(QThread):
         module_logger.info("Connection removed")
         self.unregisterConnection(websocket, path)
 
+    def publishSnapshot(self, scope, messages):
+        """Encode the state of a scope for new clients ahead of time.
+
+        The messages are a list of events and data that reflect the
+        messages sent to the scope so far.
+        """
+        with self.__sequenceLock:
+            seq = self.sequences.get(scope, self.__epoch)
+        snapshot = Snapshot(seq, (
+            tuple(encoding.encode(event, data, '', seq)
+                  for event, data in messages),
+            tuple(encoding.encodeCompact(event, data, '', seq)
+                  for event, data in messages)))
+        with self.__sequenceLock:
+            # A snapshot older than the current one is dropped.
+            current = self.snapshots.get(scope)
+            if current is None or current.seq <= seq:
+                self.snapshots[scope] = snapshot
+
+    def sendSnapshot(self, websocket, scope):
+        """Send the state of a scope to a new client."""
+        snapshot = self.snapshots.get(scope)
+        if snapshot is not None:
+            missed = self.getMissed(scope, snapshot.seq)
+            if missed is not None:
+                # The published state and the messages sent after it.
+                for message in snapshot.messages[websocket in self.compact]:
+                    self.__write(websocket, message)
+                for seq, event, data, state in missed:
+                    self.__send([websocket], event, data, state, seq)
+                return
+        # Compute the state if no snapshot has been published yet.
+        seq = self.sequences.get(scope, self.__epoch)
+        if scope in ['score', 'intro', 'mapicons']:
+            self.sendAtlas(websocket=websocket, seq=seq)
+        matchData = self.__controller.matchData
+        if scope == 'score':
+            data = matchData.read(matchData.getScoreData)
+            self.sendData2WS(websocket, "ALL_DATA", data, seq=seq)
+        elif scope == 'mapicons':
+            data = matchData.read(matchData.getMapIconsData)
+            self.sendData2WS(websocket, "ALL_DATA", data, seq=seq)
+
+    def getMissed(self, scope, seq):
+        """Return the messages of a scope after a sequence number.
+
+        Returns None if they are not available anymore, then a snapshot
+        has to be sent.
+        """
+        try:
+            seq = int(seq)
+        except ValueError:
+            return None
+        current = self.sequences.get(scope, self.__epoch)
+        replay = self.replay.get(scope, ())
+        if seq == current:
+            return []
+        if seq > current or not replay or replay[0][0] > seq + 1:
+            return None
+        return [item for item in replay if item[0] > seq]
+
+    def __record(self, scope, event, input_data, state):
+        """Number a message of a scope and keep it for the replay."""
+        if event in TRANSIENT_EVENTS:
+            return None
+        seq = self.sequences.get(scope, self.__epoch) + 1
+        self.sequences[scope] = seq
+        if scope not in self.replay:
+            self.replay[scope] = deque(maxlen=self.replay_size)
+        self.replay[scope].append((seq, event, input_data, state))
+        return seq
+
     def registerConnection(self, websocket, path):
         if path not in self.connected.keys():
             self.connected[path] = set()
@@ -223,6 +453,7 @@ class WebsocketThread(QThread):
             self.register_hotkeys('intro')
 
     def unregisterConnection(self, websocket, path):
+        self.compact.discard(websocket)
         if path in self.connected.keys():
             self.connected[path].remove(websocket)
             primary_scope = self.get_primary_scope(path)
@@ -237,6 +468,7 @@ class WebsocketThread(QThread):
             if style is None:
                 style = hwctool.settings.config.parser.get(
                     "Style", primary_scope)
+            style = hwctool.settings.styles.validate(primary_scope, style)
             style_file = "src/css/{}/{}.css".format(primary_scope, style)
             if websocket is None:
                 self.sendData2Path(path, "CHANGE_STYLE", {'file': style_file})
@@ -246,6 +478,17 @@ class WebsocketThread(QThread):
         else:
             raise ValueError('Change style is not available for this path.')
 
+    def sendAtlas(self, scope='races', websocket=None, seq=None):
+        """Send the sprite atlas of the race logos."""
+        if scope != 'races':
+            return
+        atlas = hwctool.settings.getRaceAtlas()
+        if websocket is None:
+            self.sendData2Path(['score', 'intro', 'mapicons'], "LOAD_ATLAS",
+                               atlas)
+        else:
+            self.sendData2WS(websocket, "LOAD_ATLAS", atlas, seq=seq)
+
     def changeFont(self, path=None, font=None, websocket=None):
         valid_paths = ['score']
         if path is None:
@@ -268,10 +511,71 @@ class WebsocketThread(QThread):
         else:
             raise ValueError('Change font is not available for this path.')
 
-    def showIntro(self, idx):
-        self.intro_state = self.sendData2Path(
-            "intro", "SHOW_INTRO",
-            self.__controller.getPlayerIntroData(idx))
+    def setIntroPayloads(self, payloads, reset=False):
+        """Serialize the intros of both players ahead of the hotkeys.
+
+        The shared hotkey starts with the first player again only on a
+        reset, i.e. when the players changed.
+        """
+        self.intro_payloads = {idx: self.__encodeIntro(data)
+                               for idx, data in payloads.items()}
+        if reset:
+            self.intro_idx = 0
+
+    def __encodeIntro(self, data):
+        state = str(uuid4())
+        messages = (encoding.encode('SHOW_INTRO', data, state),
+                    encoding.encodeCompact('SHOW_INTRO', data, state))
+        return state, messages, data
+
+    def showIntro(self, idx, key_time=None):
+        """Push a prepared intro to the event loop."""
+        if key_time is None:
+            key_time = time.perf_counter()
+        if idx == -1:
+            idx = self.intro_idx
+        payload = self.intro_payloads.get(idx)
+        if payload is None or self.__loop is None:
+            return
+        self.intro_state = payload[0]
+        if threading.get_ident() == self.__loopThread:
+            self.__sendIntro(idx, payload, key_time)
+        else:
+            self.__loop.call_soon_threadsafe(
+                self.__sendIntro, idx, payload, key_time)
+
+    def __sendIntro(self, idx, payload, key_time):
+        state, messages, data = payload
+        sends = [self.__loop.create_task(
+                 websocket.send(messages[websocket in self.compact]))
+                 for path in self.scopes.get('intro', [])
+                 for websocket in self.connected.get(path, set())]
+        if sends:
+            pending = [len(sends)]
+            for send in sends:
+                send.add_done_callback(
+                    lambda send: self.__introSent(pending, key_time))
+        # Use a new state for the next intro, off the hotkey path.
+        if self.intro_payloads.get(idx) is payload:
+            self.intro_payloads[idx] = self.__encodeIntro(data)
+
+    def __introSent(self, pending, key_time):
+        pending[0] -= 1
+        if pending[0] > 0:
+            return
+        latency = time.perf_counter() - key_time
+        self.intro_latency.append(latency)
+        metrics.observe('websocket.intro_latency', latency, unit='s')
+        module_logger.info(
+            "Intro sent %.3f ms after the key down.", latency * 1000)
+
+    def getIntroLatency(self):
+        """Return statistics of the time from key down to sent intro."""
+        return summarize(self.intro_latency)
+
+    def getHookDuration(self):
+        """Return statistics of the time spent in the keyboard hook."""
+        return summarize(self.hook_duration)
 
     def sendData2Path(self, path, event, input_data, state=''):
         if not state:
@@ -282,42 +586,73 @@ class WebsocketThread(QThread):
                 self.sendData2Path(item, event, input_data, state)
             return
         try:
-            data = dict()
-            data['event'] = event
-            data['data'] = input_data
-            data['state'] = state
-
-            paths = self.scopes.get(path, [path])
-
-            for path in paths:
-                connections = self.connected.get(path, set()).copy()
-                for websocket in connections:
-                    module_logger.info(
-                        "Sending data to '{}': {}".format(path, data))
-                    coro = websocket.send(json.dumps(data))
-                    asyncio.run_coroutine_threadsafe(coro, self.__loop)
+            scope = self.get_primary_scope(path) or path
+            with self.__sequenceLock:
+                # Disconnected clients catch up on the recorded messages.
+                seq = self.__record(scope, event, input_data, state)
+                paths = self.scopes.get(path, [path])
+                connections = [
+                    websocket for path in paths
+                    for websocket in self.connected.get(path, set())]
+                if not connections:
+                    return state
+
+                with metrics.timer('websocket.send'):
+                    messages = self.__send(connections, event, input_data,
+                                           state, seq)
+                    for message in messages:
+                        module_logger.info(
+                            "Sending data to '%s': %s", path, message)
+            metrics.count('websocket.messages', len(connections))
+            for message in messages:
+                metrics.observe('websocket.message_bytes', len(message),
+                                unit='B')
         except Exception as e:
             module_logger.exception("message")
 
         return state
 
-    def sendData2WS(self, websocket, event, input_data, state=''):
+    def sendData2WS(self, websocket, event, input_data, state='', seq=None):
         if not state:
             state = str(uuid4())
 
         if isinstance(websocket, list):
             for item in websocket:
-                self.sendData2WS(item, event, input_data, state)
+                self.sendData2WS(item, event, input_data, state, seq)
             return
         try:
-            data = dict()
-            data['event'] = event
-            data['data'] = input_data
-            data['state'] = state
-            module_logger.info("Sending data: %s" % data)
-            coro = websocket.send(json.dumps(data))
-            asyncio.run_coroutine_threadsafe(coro, self.__loop)
+            with metrics.timer('websocket.send'):
+                message = self.__send([websocket], event, input_data,
+                                      state, seq)[0]
+                module_logger.info("Sending data: %s", message)
+            metrics.count('websocket.messages')
+            metrics.observe('websocket.message_bytes', len(message),
+                            unit='B')
         except Exception as e:
             module_logger.exception("message")
 
         return state
+
+    def __send(self, connections, event, input_data, state, seq=None):
+        """Encode a message once per encoding and send it.
+
+        Returns the encoded messages.
+        """
+        messages = dict()
+        for websocket in connections:
+            compact = websocket in self.compact
+            message = messages.get(compact)
+            if message is None:
+                if compact:
+                    message = encoding.encodeCompact(
+                        event, input_data, state, seq)
+                else:
+                    message = encoding.encode(event, input_data, state, seq)
+                messages[compact] = message
+            self.__write(websocket, message)
+        return list(messages.values())
+
+    def __write(self, websocket, message):
+        """Queue an encoded message in the order of the calls."""
+        coro = websocket.send(message)
+        asyncio.run_coroutine_threadsafe(coro, self.__loop)
@@ -2,7 +2,6 @@
 import logging
 import os
 
-import markdown2
 from PyQt5.QtCore import QSettings, Qt
 from PyQt5.QtGui import QIcon, QPalette
 from PyQt5.QtWidgets import (QAction, QApplication, QCheckBox, QComboBox,
@@ -17,6 +16,7 @@ from hwctool.settings.client_config import ClientConfig
 from hwctool.view.subBrowserSources import SubwindowBrowserSources
 from hwctool.view.subConnections import SubwindowConnections
 from hwctool.view.subMarkdown import SubwindowMarkdown
+from hwctool.view.subMetrics import SubwindowMetrics
 from hwctool.view.subStyles import SubwindowStyles
 from hwctool.view.widgets import LedIndicator, MonitoredLineEdit, ProfileMenu
 
@@ -95,6 +95,7 @@ class MainWindow(QMainWindow):
 
     def showAbout(self):
         """Show subwindow with about info."""
+        import markdown2
         html = markdown2.markdown_path(
             hwctool.settings.getResFile("about.md"))
 
@@ -183,6 +184,11 @@ class MainWindow(QMainWindow):
                 hwctool.settings.getAbsPath(hwctool.settings.getLogDir())))
             infoMenu.addAction(myAct)
 
+            myAct = QAction(QIcon(hwctool.settings.getResFile(
+                'settings.png')), _('Performance Metrics'), self)
+            myAct.triggered.connect(self.openMetricsDialog)
+            infoMenu.addAction(myAct)
+
             infoMenu.addSeparator()
 
             websiteAct = QAction(
@@ -227,6 +233,8 @@ class MainWindow(QMainWindow):
                      'intro')})
         srcs.append({'name': _('Score'),
                      'file': 'score.html'})
+        srcs.append({'name': _('Map Icons'),
+                     'file': 'mapicons.html'})
 
         act = QAction(QIcon(hwctool.settings.getResFile(
             'folder.png')), _('Open Folder'), self)
@@ -241,21 +249,19 @@ class MainWindow(QMainWindow):
             if sub:
                 for icon in sub:
                     mySubMenu = QMenu(icon['name'], self)
-                    icon['file'] = os.path.join(
-                        hwctool.settings.casting_html_dir, icon['file'])
                     act = QAction(QIcon(hwctool.settings.getResFile(
                         'html.png')), _('Open in Browser'), self)
                     act.triggered.connect(
                         lambda x,
                         file=icon['file']: self.controller.openURL(
-                            hwctool.settings.getAbsPath(file)))
+                            hwctool.settings.getBrowserSourceURL(file)))
                     mySubMenu.addAction(act)
                     act = QAction(QIcon(hwctool.settings.getResFile(
                         'copy.png')), _('Copy URL to Clipboard'), self)
                     act.triggered.connect(
                         lambda x, file=icon['file']:
                         QApplication.clipboard().setText(
-                            hwctool.settings.getAbsPath(file)))
+                            hwctool.settings.getBrowserSourceURL(file)))
                     mySubMenu.addAction(act)
                     if icon.get('settings', None) is not None:
                         act = QAction(QIcon(hwctool.settings.getResFile(
@@ -264,21 +270,19 @@ class MainWindow(QMainWindow):
                         mySubMenu.addAction(act)
                     myMenu.addMenu(mySubMenu)
             else:
-                src['file'] = os.path.join(
-                    hwctool.settings.casting_html_dir, src['file'])
                 act = QAction(QIcon(hwctool.settings.getResFile(
                     'html.png')), _('Open in Browser'), self)
                 act.triggered.connect(
                     lambda x,
                     file=src['file']: self.controller.openURL(
-                        hwctool.settings.getAbsPath(file)))
+                        hwctool.settings.getBrowserSourceURL(file)))
                 myMenu.addAction(act)
                 act = QAction(QIcon(hwctool.settings.getResFile(
                     'copy.png')), _('Copy URL to Clipboard'), self)
                 act.triggered.connect(
                     lambda x, file=src['file']:
                     QApplication.clipboard().setText(
-                        hwctool.settings.getAbsPath(file)))
+                        hwctool.settings.getBrowserSourceURL(file)))
                 myMenu.addAction(act)
 
             if src.get('settings', None) is not None:
@@ -339,6 +343,12 @@ class MainWindow(QMainWindow):
             hwctool.settings.getResFile("../CHANGELOG.md"))
         self.mysubwindows['changelog'].show()
 
+    def openMetricsDialog(self):
+        """Open subwindow with performance metrics."""
+        self.mysubwindows['metrics'] = SubwindowMetrics()
+        self.mysubwindows['metrics'].createWindow(self)
+        self.mysubwindows['metrics'].show()
+
     def changeLanguage(self, language):
         """Change the language."""
         hwctool.settings.config.parser.set("SCT", "language", language)
@@ -794,7 +804,7 @@ class MainWindow(QMainWindow):
         """Handle click to reset the score."""
         try:
             self.statusBar().showMessage(_('Resetting Score...'))
-            with self.tlock:
+            with self.tlock, self.controller.matchData.transaction():
                 for set_idx in range(self.max_no_sets):
                     self.sl_score[set_idx].setValue(0)
                     self.controller.matchData.setMapScore(
@@ -815,7 +825,8 @@ class MainWindow(QMainWindow):
                 self.statusBar().showMessage(_('Updating Score...'))
                 with self.tlock:
                     self.sl_score[idx].setValue(score)
-                    self.controller.matchData.setMapScore(idx, score, True)
+                    if self.controller.setMapScore(idx, score, allkill):
+                        self.controller.updateForms()
                     if not self.controller.resetWarning():
                         self.statusBar().showMessage('')
                 return True
@@ -835,8 +846,9 @@ class MainWindow(QMainWindow):
             if self.tlock.trigger():
                 if set_idx == -1:
                     self.controller.matchData.setMyTeam(value)
-                else:
-                    self.controller.matchData.setMapScore(set_idx, value, True)
+                elif self.controller.setMapScore(set_idx, value):
+                    with self.tlock:
+                        self.controller.updateForms()
         except Exception as e:
             module_logger.exception("message")
 
@@ -847,14 +859,15 @@ class MainWindow(QMainWindow):
         try:
             player = self.le_player[team_idx][player_idx].text().strip()
             race = self.cb_race[team_idx][player_idx].currentText()
-            if(player_idx == 0 and self.controller.matchData.getSolo()):
-                for p_idx in range(1, self.max_no_sets):
-                    self.le_player[team_idx][p_idx].setText(player)
-                    self.player_changed(team_idx, p_idx)
-            self.controller.historyManager.insertPlayer(player, race)
-            self.controller.matchData.setPlayer(
-                team_idx, player_idx,
-                self.le_player[team_idx][player_idx].text())
+            with self.controller.matchData.transaction():
+                if(player_idx == 0 and self.controller.matchData.getSolo()):
+                    for p_idx in range(1, self.max_no_sets):
+                        self.le_player[team_idx][p_idx].setText(player)
+                        self.player_changed(team_idx, p_idx)
+                self.controller.historyManager.insertPlayer(player, race)
+                self.controller.matchData.setPlayer(
+                    team_idx, player_idx,
+                    self.le_player[team_idx][player_idx].text())
 
             if race == "Random":
                 new_race = self.controller.historyManager.getRace(player)
@@ -883,12 +896,13 @@ class MainWindow(QMainWindow):
         try:
             if(player_idx == 0 and self.controller.matchData.getSolo()):
                 race = self.cb_race[team_idx][0].currentText()
-                for player_idx in range(1, self.max_no_sets):
-                    index = self.cb_race[team_idx][player_idx].findText(
-                        race, Qt.MatchFixedString)
-                    if index >= 0:
-                        self.cb_race[team_idx][player_idx].setCurrentIndex(
-                            index)
+                with self.controller.matchData.transaction():
+                    for player_idx in range(1, self.max_no_sets):
+                        index = self.cb_race[team_idx][player_idx].findText(
+                            race, Qt.MatchFixedString)
+                        if index >= 0:
+                            self.cb_race[team_idx][
+                                player_idx].setCurrentIndex(index)
 
         except Exception as e:
             module_logger.exception("message")
@@ -1,15 +1,18 @@
 """Show connections settings sub window."""
 import logging
+from uuid import uuid4
 
 import keyboard
 from PyQt5.QtCore import QPoint, QSize, Qt
 from PyQt5.QtGui import QIcon, QKeySequence
 from PyQt5.QtWidgets import (QCheckBox, QComboBox, QDoubleSpinBox, QFormLayout,
-                             QGroupBox, QHBoxLayout, QLabel, QMessageBox,
+                             QGroupBox, QHBoxLayout, QLabel, QLineEdit,
+                             QMessageBox,
                              QPushButton, QShortcut, QSizePolicy, QSlider,
                              QSpacerItem, QTabWidget, QVBoxLayout, QWidget)
 
 import hwctool.settings
+import hwctool.tasks.control
 from hwctool.view.widgets import HotkeyLayout, StyleComboBox
 
 # create logger
@@ -64,11 +67,14 @@ class SubwindowBrowserSources(QWidget):
         self.tabs = QTabWidget()
 
         self.createFormGroupIntro()
+        self.createFormGroupControl()
 
         # Add tabs
         self.tabs.addTab(self.formGroupIntro, _("Intros"))
+        self.tabs.addTab(self.formGroupControl, _("Remote Control"))
         table = dict()
         table['intro'] = 0
+        table['control'] = 1
         self.tabs.setCurrentIndex(table.get(tab, -1))
 
     def addHotkey(self, ident, label):
@@ -124,13 +130,10 @@ class SubwindowBrowserSources(QWidget):
 
         box = QGroupBox(_("Style"))
         layout = QHBoxLayout()
-        styleqb = StyleComboBox(
-            hwctool.settings.casting_html_dir + "/src/css/intro",
-            "intro")
+        styleqb = StyleComboBox("intro")
         styleqb.connect2WS(self.controller, 'intro')
         button = QPushButton(_("Show in Browser"))
-        button.clicked.connect(lambda: self.openHTML(
-            hwctool.settings.casting_html_dir + "/intro.html"))
+        button.clicked.connect(lambda: self.openHTML("intro.html"))
         layout.addWidget(styleqb, 2)
         layout.addWidget(button, 1)
         box.setLayout(layout)
@@ -310,6 +313,70 @@ class SubwindowBrowserSources(QWidget):
             0, 0, QSizePolicy.Minimum, QSizePolicy.Expanding))
         self.formGroupIntro.setLayout(mainLayout)
 
+    def createFormGroupControl(self):
+        """Create forms for the remote control."""
+        self.formGroupControl = QWidget()
+        mainLayout = QVBoxLayout()
+
+        box = QGroupBox(_("Remote Control"))
+        layout = QFormLayout()
+
+        self.cb_control_active = QCheckBox()
+        self.cb_control_active.setChecked(
+            hwctool.settings.config.parser.getboolean("Control", "active"))
+        self.cb_control_active.stateChanged.connect(self.changed)
+        label = QLabel(_("Activate Remote Control:") + " ")
+        label.setMinimumWidth(120)
+        layout.addRow(label, self.cb_control_active)
+
+        self.cb_control_remote = QCheckBox()
+        self.cb_control_remote.setChecked(
+            hwctool.settings.config.parser.getboolean("Control", "remote"))
+        self.cb_control_remote.setToolTip(
+            _('Takes effect after a restart of the tool.'))
+        self.cb_control_remote.stateChanged.connect(self.changed)
+        layout.addRow(QLabel(_("Allow other machines:") + " "),
+                      self.cb_control_remote)
+
+        container = QHBoxLayout()
+        self.le_control_token = QLineEdit()
+        self.le_control_token.setReadOnly(True)
+        self.le_control_token.setAlignment(Qt.AlignCenter)
+        self.le_control_token.setEchoMode(QLineEdit.PasswordEchoOnEdit)
+        self.le_control_token.setText(
+            hwctool.settings.config.parser.get("Control", "token"))
+        container.addWidget(self.le_control_token)
+        button = QPushButton(_('New'))
+        button.setFixedWidth(100)
+        button.clicked.connect(self.newControlToken)
+        container.addWidget(button)
+        layout.addRow(QLabel(_("Access-Token:") + " "), container)
+
+        port = int(hwctool.settings.profileManager.currentID(), 16)
+        text = _("Send commands via HTTP, e.g.,"
+                 " http://localhost:{port}/control/score?set=1&value=-1"
+                 "&token=TOKEN, or as JSON (lists for batches) via a"
+                 " websocket connection to ws://localhost:{port}/control."
+                 " Available commands: {commands}.")
+        label = QLabel(text.format(
+            port=port,
+            commands=', '.join(hwctool.tasks.control.valid_commands)))
+        label.setAlignment(Qt.AlignJustify)
+        label.setWordWrap(True)
+        label.setMargin(5)
+        layout.addRow(label)
+
+        box.setLayout(layout)
+        mainLayout.addWidget(box)
+        mainLayout.addItem(QSpacerItem(
+            0, 0, QSizePolicy.Minimum, QSizePolicy.Expanding))
+        self.formGroupControl.setLayout(mainLayout)
+
+    def newControlToken(self):
+        """Generate a new token for the remote control."""
+        self.le_control_token.setText(uuid4().hex)
+        self.changed()
+
     def createButtonGroup(self):
         """Create buttons."""
         try:
@@ -367,10 +434,17 @@ class SubwindowBrowserSources(QWidget):
             "Intros", "tts_pitch", str(self.sb_tts_pitch.value()))
         hwctool.settings.config.parser.set(
             "Intros", "tts_rate", str(self.sb_tts_rate.value()))
+        hwctool.settings.config.parser.set(
+            "Control", "active", str(self.cb_control_active.isChecked()))
+        hwctool.settings.config.parser.set(
+            "Control", "remote", str(self.cb_control_remote.isChecked()))
+        hwctool.settings.config.parser.set(
+            "Control", "token", self.le_control_token.text().strip())
+        self.controller.updatePlayerIntros()
 
     def openHTML(self, file):
         """Open file in browser."""
-        self.controller.openURL(hwctool.settings.getAbsPath(file))
+        self.controller.openURL(hwctool.settings.getBrowserSourceURL(file))
 
     def saveCloseWindow(self):
         """Save and close window."""
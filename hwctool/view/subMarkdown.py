@@ -2,7 +2,6 @@
 import logging
 import re
 
-import markdown2
 from PyQt5.QtCore import QPoint, QSize
 from PyQt5.QtGui import QIcon
 from PyQt5.QtWidgets import (QGridLayout, QPushButton, QSizePolicy,
@@ -53,6 +52,7 @@ class SubwindowMarkdown(QWidget):
         self.viewer.setMinimumHeight(400)
         self.viewer.setOpenExternalLinks(True)
         # self.viewer.setAlignment(Qt.AlignJustify)
+        import markdown2
         html = markdown2.markdown_path(
             hwctool.settings.getAbsPath(markdown))
         p = re.compile(r'<img.*?/>')
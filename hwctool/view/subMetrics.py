@@ -0,0 +1,137 @@
+"""Show performance metrics sub window."""
+import logging
+
+from PyQt5.QtCore import QPoint, QSize, QTimer
+from PyQt5.QtGui import QIcon
+from PyQt5.QtWidgets import (QAbstractItemView, QCheckBox, QGridLayout,
+                             QHeaderView, QLabel, QPushButton, QSizePolicy,
+                             QSpacerItem, QTableWidget, QTableWidgetItem,
+                             QWidget)
+
+import hwctool.settings
+import hwctool.tasks.metrics as metrics
+
+# create logger
+module_logger = logging.getLogger('hwctool.view.subMetrics')
+
+
+class SubwindowMetrics(QWidget):
+    """Show performance metrics sub window."""
+
+    def createWindow(self, mainWindow):
+        """Create performance metrics sub window."""
+        super().__init__(None)
+        self.setWindowIcon(
+            QIcon(hwctool.settings.getResFile('settings.png')))
+        self.mainWindow = mainWindow
+        self.controller = mainWindow.controller
+
+        self.cb_active = QCheckBox(_('Collect performance metrics'))
+        self.cb_active.setChecked(metrics.isEnabled())
+        self.cb_active.stateChanged.connect(self.toggleMetrics)
+        self.label_file = QLabel()
+        self.label_file.setWordWrap(True)
+        self.createTable()
+
+        mainLayout = QGridLayout()
+        mainLayout.addWidget(self.cb_active, 0, 0, 1, 4)
+        mainLayout.addWidget(self.table, 1, 0, 1, 4)
+        mainLayout.addWidget(self.label_file, 2, 0, 1, 4)
+        mainLayout.addItem(QSpacerItem(
+            0, 0, QSizePolicy.Expanding,
+            QSizePolicy.Minimum), 3, 0)
+        resetButton = QPushButton(_("&Reset"))
+        resetButton.clicked.connect(self.reset)
+        mainLayout.addWidget(resetButton, 3, 1)
+        exportButton = QPushButton(_("&Export"))
+        exportButton.clicked.connect(self.export)
+        mainLayout.addWidget(exportButton, 3, 2)
+        closeButton = QPushButton(_("&OK"))
+        closeButton.clicked.connect(self.close)
+        mainLayout.addWidget(closeButton, 3, 3)
+        self.setLayout(mainLayout)
+
+        self.setWindowTitle(_("Performance Metrics"))
+
+        self.resize(QSize(int(mainWindow.size().width() * 0.9),
+                          self.sizeHint().height()))
+        relativeChange = QPoint(mainWindow.size().width() // 2,
+                                mainWindow.size().height() // 3)\
+            - QPoint(self.size().width() // 2,
+                     self.size().height() // 3)
+        self.move(mainWindow.pos() + relativeChange)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(1000)
+        self.refresh()
+
+    def createTable(self):
+        """Create the table of the metrics."""
+        self.table = QTableWidget(0, 7)
+        self.table.setHorizontalHeaderLabels(
+            [_('Metric'), _('Count'), _('Mean'), _('Median'),
+             _('99th Percentile'), _('Maximum'), _('Total')])
+        self.table.horizontalHeader().setSectionResizeMode(
+            0, QHeaderView.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setMinimumHeight(300)
+
+    def formatValue(self, value, unit):
+        """Format a value of a histogram."""
+        if unit == 's':
+            return '{:.3f} ms'.format(value * 1000)
+        elif unit == 'B':
+            return '{:.0f} B'.format(value)
+        return '{:g}'.format(value)
+
+    def refresh(self):
+        """Show the current metrics."""
+        snapshot = metrics.snapshot()
+        rows = []
+        for name, summary in sorted(snapshot['histograms'].items()):
+            unit = summary['unit']
+            rows.append([name, str(summary['count'])] +
+                        [self.formatValue(summary[key], unit) for key in
+                         ['mean', 'p50', 'p99', 'max', 'total']])
+        for name, value in sorted(snapshot['counters'].items()):
+            rows.append([name, str(value), '', '', '', '', ''])
+
+        self.table.setRowCount(len(rows))
+        for row, values in enumerate(rows):
+            for column, value in enumerate(values):
+                self.table.setItem(row, column, QTableWidgetItem(value))
+
+        if metrics.isEnabled():
+            self.label_file.setText(
+                _('Exported every {} seconds to {}').format(
+                    hwctool.settings.config.parser.getint(
+                        "Metrics", "interval"),
+                    metrics.getFile()))
+        else:
+            self.label_file.setText(_('The collection is disabled.'))
+
+    def toggleMetrics(self):
+        """Enable or disable the collection of metrics."""
+        self.controller.setMetrics(self.cb_active.isChecked())
+        self.refresh()
+
+    def reset(self):
+        """Clear all metrics."""
+        metrics.reset()
+        self.refresh()
+
+    def export(self):
+        """Write the metrics to the json file."""
+        try:
+            metrics.export()
+            self.controller.displayWarning(
+                _('Exported metrics to {}.').format(metrics.getFile()))
+        except Exception as e:
+            module_logger.exception("message")
+
+    def closeEvent(self, event):
+        """Handle close event."""
+        self.timer.stop()
+        event.accept()
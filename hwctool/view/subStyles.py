@@ -97,13 +97,10 @@ class SubwindowStyles(QWidget):
 
         try:
             container = QHBoxLayout()
-            self.qb_scoreStyle = StyleComboBox(
-                hwctool.settings.casting_html_dir + "/src/css/score",
-                "score")
+            self.qb_scoreStyle = StyleComboBox("score")
             self.qb_scoreStyle.connect2WS(self.controller, 'score')
             button = QPushButton(_("Show in Browser"))
-            button.clicked.connect(lambda: self.openHTML(
-                hwctool.settings.casting_html_dir + "/score.html"))
+            button.clicked.connect(lambda: self.openHTML("score.html"))
             container.addWidget(self.qb_scoreStyle)
             container.addWidget(button)
             layout.addRow(QLabel(_("Score:")), container)
@@ -112,24 +109,33 @@ class SubwindowStyles(QWidget):
 
         try:
             container = QHBoxLayout()
-            self.qb_introStyle = StyleComboBox(
-                hwctool.settings.casting_html_dir + "/src/css/intro",
-                "intro")
+            self.qb_introStyle = StyleComboBox("intro")
             self.qb_introStyle.connect2WS(self.controller, 'intro')
             button = QPushButton(_("Show in Browser"))
-            button.clicked.connect(lambda: self.openHTML(
-                hwctool.settings.casting_html_dir + "/intro.html"))
+            button.clicked.connect(lambda: self.openHTML("intro.html"))
             container.addWidget(self.qb_introStyle)
             container.addWidget(button)
             layout.addRow(QLabel(_("Intros:")), container)
         except Exception as e:
             module_logger.exception("message")
 
+        try:
+            container = QHBoxLayout()
+            self.qb_mapiconsStyle = StyleComboBox("mapicons")
+            self.qb_mapiconsStyle.connect2WS(self.controller, 'mapicons')
+            button = QPushButton(_("Show in Browser"))
+            button.clicked.connect(lambda: self.openHTML("mapicons.html"))
+            container.addWidget(self.qb_mapiconsStyle)
+            container.addWidget(button)
+            layout.addRow(QLabel(_("Map Icons:")), container)
+        except Exception as e:
+            module_logger.exception("message")
+
         self.styleBox.setLayout(layout)
 
     def openHTML(self, file):
         """Open file in browser."""
-        self.controller.openURL(hwctool.settings.getAbsPath(file))
+        self.controller.openURL(hwctool.settings.getBrowserSourceURL(file))
 
     def createColorBox(self):
         """Create box for color selection."""
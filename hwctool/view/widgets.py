@@ -1,12 +1,9 @@
 """Define PyQt5 widgets."""
 import logging
 import os
-import re
 import time
 
-import humanize
 import keyboard
-import requests
 from PyQt5.QtCore import (QMimeData, QPoint, QPointF, QSettings, QSize, Qt,
                           pyqtProperty, pyqtSignal)
 from PyQt5.QtGui import (QBrush, QColor, QDrag, QIcon, QKeySequence, QPainter,
@@ -26,6 +23,7 @@ import hwctool.matchdata
 import hwctool.settings.config
 import hwctool.tasks.updater
 from hwctool.settings.client_config import ClientConfig
+from hwctool.tasks.downloader import DownloadManager
 from hwctool.tasks.tasksthread import TasksThread
 
 # create logger
@@ -91,35 +89,49 @@ class MonitoredLineEdit(QLineEdit):
 class StyleComboBox(QComboBox):
     """Define combo box to change the styles."""
 
-    def __init__(self, style_dir, scope):
+    def __init__(self, scope):
         """Init combo box to change the styles."""
         super().__init__()
 
-        self.__style_dir = style_dir
         self.__scope = scope
-        style_dir = hwctool.settings.getAbsPath(style_dir)
-        default = hwctool.settings.config.parser.get("Style", self.__scope)
-
-        for fname in os.listdir(style_dir):
-            full_fname = os.path.join(style_dir, fname)
-            if os.path.isfile(full_fname):
-                label = re.search(
-                    '^(.+)\.css$', fname).group(1)
-                if ' ' in label:
-                    os.rename(full_fname, os.path.join(
-                        style_dir, label.replace(' ', '-') + '.css'))
-                label = label.replace('-', ' ')
-                self.addItem(label)
-
-        index = self.findText(default.replace('-', ' '), Qt.MatchFixedString)
+        self.setIconSize(QSize(48, 24))
+        self.loadStyles(hwctool.settings.config.parser.get(
+            "Style", self.__scope))
+        hwctool.settings.styles.changed.connect(self.stylesChanged)
+
+        self.currentIndexChanged.connect(self.save)
+
+    def loadStyles(self, current):
+        """Fill the combo box with the styles of the registry."""
+        self.blockSignals(True)
+        self.clear()
+        for style in hwctool.settings.styles.getStyles(self.__scope):
+            if style['preview']:
+                self.addItem(QIcon(hwctool.settings.images.getThumbnail(
+                    style['preview'])), style['label'], style['name'])
+            else:
+                self.addItem(style['label'], style['name'])
+            if style['fonts']:
+                self.setItemData(
+                    self.count() - 1,
+                    _('Fonts: {}').format(', '.join(style['fonts'])),
+                    Qt.ToolTipRole)
+
+        index = self.findData(current.replace(' ', '-'))
+        if index < 0:
+            index = self.findData("Default")
         if index >= 0:
             self.setCurrentIndex(index)
-        else:
-            index = self.findText("Default", Qt.MatchFixedString)
-            if index >= 0:
-                self.setCurrentIndex(index)
+        self.blockSignals(False)
 
-        self.currentIndexChanged.connect(self.save)
+    def stylesChanged(self, scope):
+        """Update the styles if the registry has changed."""
+        if scope != self.__scope:
+            return
+        current = self.currentData()
+        self.loadStyles(current if current else "Default")
+        if self.currentData() != current:
+            self.currentIndexChanged.emit(self.currentIndex())
 
     def connect2WS(self, controller, path):
         self.currentIndexChanged.connect(
@@ -127,13 +139,11 @@ class StyleComboBox(QComboBox):
             self.applyWS(controller, path))
 
     def applyWS(self, controller, path):
-        controller.websocketThread.changeStyle(
-            path, self.currentText().replace(' ', '-'))
+        controller.websocketThread.changeStyle(path, self.currentData())
 
     def save(self):
         hwctool.settings.config.parser.set(
-            "Style", self.__scope,
-            self.currentText().replace(' ', '-'))
+            "Style", self.__scope, self.currentData())
 
         # def apply(self, controller, file):
         #     """Apply the changes to the css files."""
@@ -143,31 +153,28 @@ class StyleComboBox(QComboBox):
         #     shutil.copy(new_file, hwctool.settings.getAbsPath(file))
 
 
-class MapDownloader(QProgressDialog):
-    """Map logo downloader dialog."""
+class AssetDownloader(QProgressDialog):
+    """Define a progress dialog for background downloads."""
 
-    def __init__(self, mainWindow, map_name, url):
+    def __init__(self, mainWindow, title):
         """Init progress dialog."""
         super().__init__(mainWindow)
-        self.setWindowModality(Qt.ApplicationModal)
-        self.progress = 0
-
-        self.url = url
-        base, ext = os.path.splitext(url)
-        ext = ext.split("?")[0].lower()
-        map = map_name.strip().replace(" ", "_") + ext
-        mapdir = hwctool.settings.getAbsPath(hwctool.settings.casting_html_dir)
-        if ext not in ['.jpg', '.png']:
-            raise ValueError('Not supported image format.')
-        self.file_name = os.path.normpath(
-            os.path.join(mapdir, "src/img/maps", map))
-
-        self.setWindowTitle(_("Map Downloader"))
-        self.setLabelText(
-            _("Downloading {}".format(self.file_name)))
-        self.setCancelButton(None)
-        self.setRange(0, 100)
+        self.setWindowModality(Qt.NonModal)
+        self.setWindowTitle(title)
+        self.setLabelText(_("Downloading..."))
+        self.setRange(0, 1000)
         self.setValue(self.minimum())
+        self.setAutoClose(False)
+        self.setAutoReset(False)
+
+        self.names = dict()
+        self.errors = []
+        self.manager = DownloadManager()
+        self.manager.progress.connect(self.setProgress)
+        self.manager.finished.connect(self.downloadFinished)
+        self.manager.failed.connect(self.downloadFailed)
+        self.manager.allFinished.connect(self.allFinished)
+        self.canceled.connect(self.manager.cancel)
 
         self.resize(QSize(
             int(mainWindow.size().width() * 0.8), self.sizeHint().height()))
@@ -177,35 +184,66 @@ class MapDownloader(QProgressDialog):
                      self.size().height() // 3)
         self.move(mainWindow.pos() + relativeChange)
 
+    def addDownload(self, url, file, name, sha256=None):
+        """Queue a download."""
+        module_logger.info("Downloading %s from %s", file, url)
+        id = self.manager.download(url, file, sha256)
+        self.names[id] = name
+        return id
+
     def download(self):
+        """Show the dialog while the downloads run in the background."""
         self.show()
-
-        with open(self.file_name, "wb") as f:
-            module_logger.info("Downloading {} from {}".format(
-                self.file_name, self.url))
-            response = requests.get(self.url, stream=True)
-            total_length = response.headers.get('content-length')
-
-            if total_length is None:  # no content length header
-                f.write(response.content)
-            else:
-                dl = 0
-                total_length = int(total_length)
-                for data in response.iter_content(chunk_size=4096):
-                    dl += len(data)
-                    f.write(data)
-                    done = int(100 * dl / total_length)
-                    self.setProgress(done)
-
         return True
 
-    def setProgress(self, value):
+    def setProgress(self, id, done, total):
         """Set the progress of the bar."""
         try:
-            self.setValue(value)
+            done, total = self.manager.totalProgress()
+            self.setLabelText(_("Downloading {}").format(self.names[id]))
+            if total:
+                self.setValue(int(1000 * done / total))
         except Exception as e:
             module_logger.exception("message")
 
+    def downloadFinished(self, id, file):
+        """Handle a finished download."""
+        pass
+
+    def downloadFailed(self, id, error):
+        """Handle a failed download."""
+        self.errors.append("{}: {}".format(self.names[id], error))
+
+    def allFinished(self):
+        """Close the dialog and report errors."""
+        self.manager.shutdown()
+        self.close()
+        if self.errors:
+            QMessageBox.warning(self.parent(), self.windowTitle(),
+                                "\n".join(self.errors))
+
+
+class MapDownloader(AssetDownloader):
+    """Map downloader dialog."""
+
+    def __init__(self, mainWindow, maps):
+        """Init progress dialog for a list of (map name, url) pairs."""
+        super().__init__(mainWindow, _("Map Downloader"))
+        mapdir = hwctool.settings.assets.getDir('maps')
+        for map_name, url in maps:
+            ext = os.path.splitext(url.split("?")[0])[1].lower()
+            if ext not in ['.jpg', '.png']:
+                raise ValueError('Not supported image format.')
+            map = map_name.strip().replace(" ", "_") + ext
+            file_name = os.path.normpath(os.path.join(mapdir, map))
+            self.addDownload(url, file_name, map_name.strip())
+
+    def downloadFinished(self, id, file):
+        """Add the downloaded map."""
+        hwctool.settings.assets.update('maps')
+        if self.names[id] not in hwctool.settings.maps:
+            hwctool.settings.maps.append(self.names[id])
+
 
 class HotkeyLayout(QHBoxLayout):
 
@@ -318,63 +356,24 @@ class HotkeyRecorder(QProgressDialog):
         self.thread.deactivateTask('hotkey')
 
 
-class LogoDownloader(QProgressDialog):
+class LogoDownloader(AssetDownloader):
     """Define logo downloader dialog."""
 
-    def __init__(self, controller, mainWindow, url):
-        """Init progress dialog."""
-        super().__init__()
-        self.setWindowModality(Qt.ApplicationModal)
-        self.progress = 0
-
-        self.logo = controller.logoManager.newLogo()
-        self.url = url
-        self.file_name = self.logo.fromURL(self.url, False)
-
-        self.setWindowTitle(_("Logo Downloader"))
-        self.setLabelText(
-            _("Downloading {}".format(self.file_name)))
-        self.setCancelButton(None)
-        self.setRange(0, 100)
-        self.setValue(self.minimum())
-
-        self.resize(QSize(
-            int(mainWindow.size().width() * 0.8), self.sizeHint().height()))
-        relativeChange = QPoint(mainWindow.size().width() // 2,
-                                mainWindow.size().height() // 3)\
-            - QPoint(self.size().width() // 2,
-                     self.size().height() // 3)
-        self.move(mainWindow.pos() + relativeChange)
-
-    def download(self):
-        self.show()
-
-        with open(self.file_name, "wb") as f:
-            module_logger.info("Downloading {}".format(self.file_name))
-            response = requests.get(self.url, stream=True)
-            total_length = response.headers.get('content-length')
-
-            if total_length is None:  # no content length header
-                f.write(response.content)
-            else:
-                dl = 0
-                total_length = int(total_length)
-                for data in response.iter_content(chunk_size=4096):
-                    dl += len(data)
-                    f.write(data)
-                    done = int(100 * dl / total_length)
-                    self.setProgress(done)
+    def __init__(self, mainWindow, urls):
+        """Init progress dialog for a list of urls."""
+        super().__init__(mainWindow, _("Logo Downloader"))
+        logodir = hwctool.settings.assets.getDir('logos')
+        for url in urls:
+            name = os.path.basename(url.split("?")[0])
+            ext = os.path.splitext(name)[1]
+            if ext.lower() not in ['.jpg', '.jpeg', '.png']:
+                raise ValueError('Not supported image format.')
+            file_name = os.path.normpath(os.path.join(logodir, name))
+            self.addDownload(url, file_name, name)
 
-        self.close()
-
-        return self.logo
-
-    def setProgress(self, value):
-        """Set the progress of the bar."""
-        try:
-            self.setValue(value)
-        except Exception as e:
-            module_logger.exception("message")
+    def downloadFinished(self, id, file):
+        """Add the downloaded logo."""
+        hwctool.settings.assets.update('logos')
 
 
 class ToolUpdater(QProgressDialog):
@@ -413,6 +412,7 @@ class ToolUpdater(QProgressDialog):
     def setProgress(self, data):
         """Set the progress of the bar."""
         # TODO: What is the data structure in case of a patch?
+        import humanize
         try:
             text = _('Downloading a new version: Total file size {},'
                      ' Time remaining {}.')
@@ -825,12 +825,9 @@ class InitialUpdater(QProgressDialog):
     def run(self):
         """Run the initial process."""
         try:
-            from hwctool.settings.client_config import ClientConfig
-            from hwctool.tasks.updater import extractData
-            from pyupdater.client import Client
-            client = Client(ClientConfig())
+            from hwctool.tasks.updater import createClient, extractData
+            client = createClient(self.setProgress)
             client.refresh()
-            client.add_progress_hook(self.setProgress)
 
             channel = hwctool.tasks.updater.getChannel()
             lib_update = client.update_check(
@@ -855,7 +852,8 @@ class InitialUpdater(QProgressDialog):
     def setProgress(self, data):
         """Set the progress of the bar."""
         # TODO: What is the data structure in case of a patch?
-        module_logger.info("Progress {}".format(data))
+        module_logger.debug("Progress %s", data)
+        import humanize
         try:
             text = _('Downloading required files:'
                      ' Total file size {}, Time remaining {}.')
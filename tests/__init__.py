@@ -0,0 +1,21 @@
+"""Tests of the casting tool.
+
+The tool runs on a temporary profile without a display.
+"""
+import atexit
+import builtins
+import os
+import shutil
+import sys
+import tempfile
+
+basedir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+home = tempfile.mkdtemp()
+atexit.register(shutil.rmtree, home, True)
+os.environ['HOME'] = home
+os.environ['XDG_DATA_HOME'] = os.path.join(home, 'data')
+builtins.__dict__.setdefault('_', lambda string: string)
+sys.modules['__main__'].__file__ = os.path.join(
+    basedir, 'HaloWarsCastingTool.py')
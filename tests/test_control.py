@@ -0,0 +1,31 @@
+"""Test the parsing of remote control commands."""
+import unittest
+
+import hwctool.settings
+from hwctool.tasks import control
+
+hwctool.settings.loadSettings()
+
+
+class ParseCommandTest(unittest.TestCase):
+
+    def test_score(self):
+        self.assertEqual(
+            control.parseCommands({'command': 'score', 'set': '2',
+                                   'value': '-1'}),
+            [{'command': 'score', 'set_idx': 1, 'value': -1}])
+
+    def test_invalid_score(self):
+        for value in [None, [], {}, True, 2, '1.5', 'win']:
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    control.parseCommands({'command': 'score', 'set': 1,
+                                           'value': value})
+
+    def test_invalid_batch(self):
+        with self.assertRaises(ValueError):
+            control.parseCommands([{'command': 'swap'}, None])
+
+
+if __name__ == '__main__':
+    unittest.main()
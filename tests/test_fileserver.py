@@ -0,0 +1,38 @@
+"""Test the caching headers of the file server."""
+import os
+import unittest
+
+import hwctool.settings
+from hwctool.tasks.fileserver import FileServer
+
+hwctool.settings.loadSettings()
+
+
+class CacheControlTest(unittest.TestCase):
+
+    def getCacheControl(self, path):
+        file = os.path.join(hwctool.settings.getAbsPath(
+            hwctool.settings.casting_html_dir), path)
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+        with open(file, 'wb') as f:
+            f.write(b'data')
+        status, headers, body = FileServer().processRequest(
+            '/' + path, dict())
+        return dict(headers)['Cache-Control']
+
+    def test_hashed(self):
+        for path in ['src/img/cache/0123456789abcdef-640x360.webp',
+                     'src/img/cache/races-atlas-0123456789abcdef.webp',
+                     'src/js/score.0123abcd.js']:
+            with self.subTest(path=path):
+                self.assertIn('immutable', self.getCacheControl(path))
+
+    def test_not_hashed(self):
+        for path in ['src/img/cache/races-atlas.json',
+                     'src/img/maps/Deadbeef.png', 'score.html']:
+            with self.subTest(path=path):
+                self.assertEqual(self.getCacheControl(path), 'no-cache')
+
+
+if __name__ == '__main__':
+    unittest.main()
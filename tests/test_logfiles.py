@@ -0,0 +1,71 @@
+"""Test the sampling of the log records."""
+import logging
+import queue
+import unittest
+
+from hwctool.settings.logfiles import LazyQueueHandler, SamplingFilter
+
+
+class ListHandler(logging.Handler):
+    """Keep the records like a second handler of the logger."""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class SamplingFilterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.queue = queue.Queue()
+        self.handler = LazyQueueHandler(self.queue)
+        self.handler.addFilter(SamplingFilter(rate=2, interval=60))
+        self.other = ListHandler()
+        self.logger = logging.getLogger('tests.logfiles')
+        self.logger.propagate = False
+        self.logger.setLevel(logging.DEBUG)
+        self.logger.addHandler(self.handler)
+        self.logger.addHandler(self.other)
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+        self.logger.removeHandler(self.other)
+
+    def log(self, idx):
+        self.logger.info('Message %d', idx)
+
+    def test_dropped(self):
+        for idx in range(5):
+            self.log(idx)
+        self.assertEqual(self.queue.qsize(), 2)
+        # Start the next interval.
+        windows = self.handler.filters[0]._SamplingFilter__windows
+        for window in windows.values():
+            window[0] -= 60
+        self.log(5)
+        messages = [self.queue.get().msg for idx in range(3)]
+        self.assertEqual(messages[:2], ['Message 0', 'Message 1'])
+        self.assertEqual(messages[2],
+                         'Message 5 [3 similar messages dropped]')
+        # The records of the other handlers are left unchanged.
+        messages = [record.getMessage() for record in self.other.records]
+        self.assertEqual(messages,
+                         ['Message {}'.format(idx) for idx in range(6)])
+
+    def test_call_site(self):
+        for idx in range(3):
+            self.logger.info('Formatted {}'.format(idx))
+            self.logger.info('Other {}'.format(idx))
+        self.assertEqual(self.queue.qsize(), 4)
+
+    def test_warning(self):
+        for idx in range(5):
+            self.logger.warning('Warning %d', idx)
+        self.assertEqual(self.queue.qsize(), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
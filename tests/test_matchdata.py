@@ -0,0 +1,51 @@
+"""Test the transactions of the match data."""
+import threading
+import unittest
+
+import hwctool.settings
+from hwctool.matchdata import matchData
+
+hwctool.settings.loadSettings()
+
+
+class TransactionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.match = matchData(None)
+        self.match.setCustom(3)
+
+    def test_nested(self):
+        with self.match.transaction() as outer:
+            with self.match.transaction() as inner:
+                self.match.setLeague('League')
+            self.assertIs(inner, outer)
+            self.match.setMapScore(0, 1, overwrite=True)
+        self.assertIn('league', outer)
+        self.assertIn('score', outer)
+
+    def test_threads(self):
+        opened = threading.Event()
+        changed = threading.Event()
+        changes = dict()
+
+        def other():
+            with self.match.transaction() as other:
+                changes['other'] = other
+                opened.set()
+                changed.wait(5)
+                self.match.setMapScore(1, 1, overwrite=True)
+
+        thread = threading.Thread(target=other)
+        thread.start()
+        opened.wait(5)
+        with self.match.transaction() as own:
+            self.match.setLeague('League')
+            changed.set()
+            thread.join(5)
+        self.assertEqual(own.keys, {'league'})
+        self.assertIn('score', changes['other'])
+        self.assertNotIn('league', changes['other'])
+
+
+if __name__ == '__main__':
+    unittest.main()